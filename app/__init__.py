@@ -18,6 +18,10 @@ def create_app(config_name=None):
                 template_folder='../templates',
                 static_folder='../static')
     
+    # Money columns are Decimal: send them to the client as JSON numbers
+    from app.utils.money import MoneyJSONProvider
+    app.json = MoneyJSONProvider(app)
+    
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
@@ -1,9 +1,20 @@
+import json
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from sqlalchemy import literal
+from app.models import Appointment, AppointmentSeries, Patient
+from app.utils.conditional import conditional, table_version
 
 appointments_bp = Blueprint('appointments', __name__)
 
+def _calendar_version():
+    """Appointments, series (virtual occurrences) and patient names; the default view moves with today"""
+    return table_version(Appointment) + table_version(AppointmentSeries) + table_version(Patient) + [
+        literal(datetime.now().date().isoformat())
+    ]
+
 @appointments_bp.route('/', methods=['GET', 'POST'])
+@conditional(_calendar_version)
 def manage_appointments():
     """Manage appointments - GET to retrieve, POST to create"""
     from app.services import appointment_service
@@ -22,21 +33,24 @@ def manage_appointments():
         end_date = request.args.get('end_date')
         
         if patient_id:
-            appointments = appointment_service.get_appointments_by_patient(patient_id)
+            appointments = [
+                a.to_dict() for a in appointment_service.get_appointments_by_patient(patient_id)
+            ]
         elif date:
             date_obj = datetime.fromisoformat(date).date()
-            appointments = appointment_service.get_appointments_by_date(date_obj)
+            appointments = appointment_service.get_calendar_entries(date_obj, date_obj)
         elif start_date and end_date:
             start = datetime.fromisoformat(start_date).date()
             end = datetime.fromisoformat(end_date).date()
-            appointments = appointment_service.get_appointments_range(start, end)
+            appointments = appointment_service.get_calendar_entries(start, end)
         else:
             # Default to today's appointments
-            appointments = appointment_service.get_appointments_by_date(datetime.now().date())
+            today = datetime.now().date()
+            appointments = appointment_service.get_calendar_entries(today, today)
         
         return jsonify({
             'status': 'success',
-            'appointments': [a.to_dict() for a in appointments]
+            'appointments': appointments
         })
     
     elif request.method == 'POST':
@@ -69,7 +83,11 @@ def manage_appointment(appointment_id):
     
     if request.method == 'GET':
         appointment = appointment_service.get_appointment(appointment_id)
-        if not appointment:
+        appointment_data = (
+            appointment.to_dict() if appointment
+            else appointment_service.get_occurrence(appointment_id)
+        )
+        if not appointment_data:
             return jsonify({
                 'status': 'error',
                 'message': 'Rendez-vous non trouvé'
@@ -77,7 +95,7 @@ def manage_appointment(appointment_id):
         
         return jsonify({
             'status': 'success',
-            'appointment': appointment.to_dict()
+            'appointment': appointment_data
         })
     
     elif request.method == 'PUT':
@@ -242,4 +260,183 @@ def get_daily_statistics(date):
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 400
\ No newline at end of file
+        }), 400
+
+@appointments_bp.route('/calendar-summary', methods=['GET'])
+def get_calendar_summary():
+    """Get per-day statistics for a week or month view"""
+    from app.services import appointment_service
+    
+    if appointment_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Appointment service not initialized'
+        }), 500
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if not start_date or not end_date:
+            return jsonify({
+                'status': 'error',
+                'message': 'Dates de début et de fin requises'
+            }), 400
+        
+        start = datetime.fromisoformat(start_date).date()
+        end = datetime.fromisoformat(end_date).date()
+        
+        if end < start:
+            return jsonify({
+                'status': 'error',
+                'message': 'La date de fin doit suivre la date de début'
+            }), 400
+        
+        summary = appointment_service.get_calendar_summary(start, end)
+        
+        return jsonify({
+            'status': 'success',
+            'summary': summary
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+
+@appointments_bp.route('/series', methods=['POST'])
+def create_series():
+    """Create a recurring appointment series"""
+    from app.services import appointment_service
+    
+    if appointment_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Appointment service not initialized'
+        }), 500
+    
+    try:
+        data = request.json
+        series = appointment_service.create_series(data)
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Série de rendez-vous créée avec succès',
+            'series': series.to_dict()
+        }), 201
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@appointments_bp.route('/series/<series_id>', methods=['GET', 'DELETE'])
+def manage_series(series_id):
+    """Get or cancel a recurring appointment series"""
+    from app.services import appointment_service
+    
+    if appointment_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Appointment service not initialized'
+        }), 500
+    
+    if request.method == 'GET':
+        series = appointment_service.get_series(series_id)
+    else:
+        series = appointment_service.cancel_series(series_id)
+    
+    if not series:
+        return jsonify({
+            'status': 'error',
+            'message': 'Série de rendez-vous non trouvée'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'series': series.to_dict()
+    })
+
+@appointments_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """Get schedule changes newer than ?since=<id> (catch-up for feed clients)"""
+    from app.services import change_feed_service
+    
+    if change_feed_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Change feed service not initialized'
+        }), 500
+    
+    try:
+        since = request.args.get('since')
+        if since is None:
+            return jsonify({
+                'status': 'success',
+                'events': [],
+                'last_id': change_feed_service.latest_id()
+            })
+        
+        since = int(since)
+        if change_feed_service.has_gap(since):
+            return jsonify({
+                'status': 'error',
+                'message': 'Historique des changements incomplet, rechargez le calendrier',
+                'last_id': change_feed_service.latest_id()
+            }), 410
+        
+        events = change_feed_service.get_events(since)
+        
+        return jsonify({
+            'status': 'success',
+            'events': events,
+            'last_id': events[-1]['id'] if events else since
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@appointments_bp.route('/changes/stream', methods=['GET'])
+def stream_changes():
+    """Server-sent events stream of schedule changes (resumes from Last-Event-ID)"""
+    from app.services import change_feed_service
+    
+    if change_feed_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Change feed service not initialized'
+        }), 500
+    
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    last_id = int(since) if since else change_feed_service.latest_id()
+    
+    def generate():
+        nonlocal last_id
+        yield 'retry: 3000\n\n'
+        
+        if since and change_feed_service.has_gap(last_id):
+            # The client missed events we no longer have: it must reload its view
+            last_id = change_feed_service.latest_id()
+            yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+        
+        while True:
+            events = change_feed_service.wait_for_events(last_id, timeout=15)
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            
+            for change in events:
+                last_id = change['id']
+                yield f"id: {last_id}\nevent: change\ndata: {json.dumps(change)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
\ No newline at end of file
@@ -1,10 +1,15 @@
+import csv
+import io
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
 from app.services import financial_service, pdf_service
+from app.models import Invoice, Devis, DentalPricing, Patient
+from app.utils.conditional import conditional, table_version
 
 financial_bp = Blueprint('financial', __name__)
 
 @financial_bp.route('/invoices', methods=['GET', 'POST'])
+@conditional(lambda: table_version(Invoice) + table_version(Patient))
 def manage_invoices():
     """Manage invoices"""
     from app.services import financial_service
@@ -45,6 +50,36 @@ def manage_invoices():
                 'message': str(e)
             }), 400
 
+@financial_bp.route('/invoices/batch', methods=['POST'])
+def create_invoices_batch():
+    """Create many invoices at once (end-of-month billing)"""
+    from app.services import financial_service
+    if financial_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        data = request.json or {}
+        batch = data.get('invoices')
+        if not isinstance(batch, list) or not batch:
+            return jsonify({'status': 'error', 'message': 'Liste de factures requise'}), 400
+        
+        results = financial_service.create_invoices(batch)
+        created = sum(1 for result in results if result['status'] == 'created')
+        
+        return jsonify({
+            'status': 'success' if created else 'error',
+            'message': f"{created} factures créées, {len(results) - created} en erreur",
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 201 if created else 400
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
 @financial_bp.route('/invoices/<invoice_id>', methods=['GET', 'DELETE'])
 def manage_invoice(invoice_id):
     """Manage specific invoice"""
@@ -57,21 +92,22 @@ def manage_invoice(invoice_id):
 @financial_bp.route('/invoices/<invoice_id>/download', methods=['GET'])
 def download_invoice_pdf(invoice_id):
     """Download invoice as PDF"""
+    from app.services import pdf_service
+    if pdf_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
     try:
-        # TODO: Get invoice from database
-        # For now, using mock data
-        invoice_data = {
-            'invoice_number': 'INV-2024-001',
-            'issue_date': datetime.now().strftime('%d/%m/%Y'),
-            'due_date': (datetime.now() + timedelta(days=30)).strftime('%d/%m/%Y'),
-            'patient_name': 'John Doe',
-            'items': [],
-            'subtotal': 0,
-            'tax_amount': 0,
-            'total_amount': 0,
-            'paid_amount': 0,
-            'balance_due': 0
-        }
+        invoice = Invoice.query.get(invoice_id)
+        if invoice is None:
+            return jsonify({'status': 'error', 'message': 'Facture introuvable'}), 404
+        
+        # to_dict carries the VAT rates and the 5-centime rounding printed on the PDF
+        invoice_data = invoice.to_dict()
+        invoice_data.update({
+            'issue_date': invoice.issue_date.strftime('%d/%m/%Y'),
+            'due_date': invoice.due_date.strftime('%d/%m/%Y') if invoice.due_date else '',
+            'items': [item.to_dict() for item in invoice.items]
+        })
         
         pdf_path = pdf_service.generate_invoice_pdf(invoice_data)
         
@@ -89,6 +125,7 @@ def download_invoice_pdf(invoice_id):
         }), 500
 
 @financial_bp.route('/devis', methods=['GET', 'POST'])
+@conditional(lambda: table_version(Devis) + table_version(Patient))
 def manage_devis():
     """Manage devis (quotes)"""
     from app.services import financial_service
@@ -263,6 +300,10 @@ def get_financial_dashboard():
 @financial_bp.route('/revenue-forecast', methods=['GET'])
 def get_revenue_forecast():
     """Get revenue forecast"""
+    from app.services import financial_service
+    if financial_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
     try:
         months = int(request.args.get('months', 6))
         forecast = financial_service.get_revenue_forecast(months)
@@ -271,7 +312,258 @@ def get_revenue_forecast():
             'status': 'success',
             'forecast': forecast
         })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/receivables/aging', methods=['GET'])
+def get_ar_aging():
+    """Outstanding balances by days past due: ?as_of=YYYY-MM-DD&limit=100 (patients owing most)"""
+    from app.services import financial_service
+    if financial_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        as_of = request.args.get('as_of')
+        aging = financial_service.get_ar_aging(
+            as_of=datetime.fromisoformat(as_of).date() if as_of else None,
+            limit=min(max(int(request.args.get('limit', 100)), 1), 1000)
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'aging': aging
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/receivables/aging.csv', methods=['GET'])
+def export_ar_aging():
+    """Stream the aging of every patient owing money as CSV: ?as_of=YYYY-MM-DD"""
+    from app.services import financial_service
+    from app.services.financial_service import AGING_BUCKETS
+    if financial_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        as_of = request.args.get('as_of')
+        as_of = datetime.fromisoformat(as_of).date() if as_of else datetime.utcnow().date()
+        rows = financial_service.iter_ar_aging(as_of)
+        first = next(rows, None)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    columns = ['patient_id', 'patient_name', 'invoices', 'oldest_due_date',
+               *(key for key, _, _ in AGING_BUCKETS), 'total']
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        if first is not None:
+            writer.writerow([first[column] for column in columns])
+            for count, row in enumerate(rows, start=1):
+                writer.writerow([row[column] for column in columns])
+                # Flush in chunks rather than row by row
+                if count % 1000 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=creances_{as_of.isoformat()}.csv'}
+    )
+
+@financial_bp.route('/billing-runs', methods=['POST'])
+def start_billing_run():
+    """Invoice completed appointments of a period in the background (default: last month)"""
+    from app.services import billing_service
+    if billing_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        data = request.json or {}
+        if data.get('start_date'):
+            start_date = datetime.fromisoformat(data['start_date']).date()
+        else:
+            start_date = (datetime.now().replace(day=1) - timedelta(days=1)).replace(day=1).date()
+        
+        if data.get('end_date'):
+            end_date = datetime.fromisoformat(data['end_date']).date()
+        else:
+            next_month = start_date.replace(day=28) + timedelta(days=4)
+            end_date = next_month - timedelta(days=next_month.day)
+        
+        if start_date > end_date:
+            raise ValueError("La date de début doit précéder la date de fin")
+        
+        run = billing_service.start_run(
+            current_app._get_current_object(), start_date, end_date, dry_run=bool(data.get('dry_run'))
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Facturation lancée',
+            'run': run
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/billing-runs/<run_id>', methods=['GET'])
+def get_billing_run(run_id):
+    """Progress and report of a billing run"""
+    from app.services import billing_service
+    if billing_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    run = billing_service.get_run(run_id)
+    if not run:
+        return jsonify({'status': 'error', 'message': 'Facturation non trouvée'}), 404
+    
+    return jsonify({
+        'status': 'success',
+        'run': run
+    })
+
+@financial_bp.route('/invoices/recompute-tax', methods=['POST'])
+def recompute_invoice_tax():
+    """Recompute VAT and totals of the invoices of a period with the current tax rules"""
+    from app.services import tax_service, revenue_rollup_service
+    if tax_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        data = request.json or {}
+        report = tax_service.recompute_invoices(
+            datetime.fromisoformat(data['start_date']).date(),
+            datetime.fromisoformat(data['end_date']).date(),
+            dry_run=bool(data.get('dry_run')),
+            rollup_service=revenue_rollup_service
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'message': f"{report['changed']} factures sur {report['invoices']} recalculées",
+            'report': report
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/reconciliation', methods=['POST'])
+def reconcile_bank_file():
+    """Book the credits of a camt.054 or V11 bank file upload (file=..., or the raw body)"""
+    from app.services import reconciliation_service
+    if reconciliation_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        filename = upload.filename if upload else None
+        fmt = request.args.get('format') or ('v11' if (filename or '').lower().endswith('.v11') else 'camt')
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        
+        report = reconciliation_service.reconcile(
+            upload.stream if upload else request.stream, fmt, filename=filename, dry_run=dry_run
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'message': f"{report['matched']} paiements comptabilisés, {report['unmatched']} à vérifier",
+            'report': report
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/reconciliation/unmatched', methods=['GET'])
+def get_unmatched_payments():
+    """Bank credits waiting for review (status=open|resolved|dismissed, limit, offset)"""
+    from app.services import reconciliation_service
+    if reconciliation_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        result = reconciliation_service.list_unmatched(
+            status=request.args.get('status', 'open'),
+            limit=min(max(int(request.args.get('limit', 100)), 1), 1000),
+            offset=max(int(request.args.get('offset', 0)), 0)
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'total': result['total'],
+            'unmatched_payments': result['items']
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/reconciliation/unmatched/<item_id>/resolve', methods=['POST'])
+def resolve_unmatched_payment(item_id):
+    """Book a reviewed bank credit on an invoice ({invoice_id, amount in CHF for foreign currencies})"""
+    from app.services import reconciliation_service
+    if reconciliation_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        data = request.json or {}
+        payment = reconciliation_service.resolve_unmatched(item_id, data['invoice_id'], amount=data.get('amount'))
         
+        return jsonify({
+            'status': 'success',
+            'message': 'Paiement comptabilisé',
+            'payment': payment.to_dict()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@financial_bp.route('/reconciliation/unmatched/<item_id>/dismiss', methods=['POST'])
+def dismiss_unmatched_payment(item_id):
+    """Close a reviewed bank credit without booking it"""
+    from app.services import reconciliation_service
+    if reconciliation_service is None:
+        return jsonify({'status': 'error', 'message': 'Service not initialized'}), 500
+    
+    try:
+        item = reconciliation_service.dismiss_unmatched(item_id)
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Paiement classé',
+            'unmatched_payment': item.to_dict()
+        })
+    
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -279,6 +571,7 @@ def get_revenue_forecast():
         }), 400
 
 @financial_bp.route('/pricing', methods=['GET'])
+@conditional(lambda: table_version(DentalPricing))
 def get_pricing():
     """Get dental pricing data"""
     from app.services import financial_service
@@ -305,6 +598,10 @@ def get_pricing():
         }), 400
 
 @financial_bp.route('/pricing/<tarmed_code>', methods=['GET'])
+@conditional(
+    lambda tarmed_code: table_version(DentalPricing, DentalPricing.tarmed_code == tarmed_code),
+    last_modified=True
+)
 def get_pricing_by_code(tarmed_code):
     """Get specific pricing by TARMED code"""
     pricing = financial_service.get_pricing_by_code(tarmed_code)
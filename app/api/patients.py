@@ -1,8 +1,12 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.models import Patient
+from app.utils.conditional import conditional, private_response, table_version
 
 patients_bp = Blueprint('patients', __name__)
 
 @patients_bp.route('/', methods=['GET', 'POST'])
+@conditional(lambda: table_version(Patient))
 def manage_patients():
     """Manage patients - GET to retrieve, POST to create"""
     from app.services import patient_service
@@ -14,10 +18,14 @@ def manage_patients():
         }), 500
     
     if request.method == 'GET':
-        # Search functionality
+        # Search functionality; limit caps the ranked matches here
         search_query = request.args.get('search')
         if search_query:
-            patients = patient_service.search_patients(search_query)
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+            patients = patient_service.search_patients(search_query, limit)
+        elif any(arg in request.args for arg in ('limit', 'cursor', 'fields')):
+            # Keyset-paginated, projected listing (streamed)
+            return list_patients_page()
         else:
             patients = patient_service.get_all_patients()
         
@@ -43,7 +51,125 @@ def manage_patients():
                 'message': str(e)
             }), 400
 
+def list_patients_page():
+    """Stream one page of patients as JSON: ?limit=&cursor=&fields=id,last_name,..."""
+    from app.services import patient_service
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 5000)
+        fields = request.args.get('fields')
+        rows, page = patient_service.iter_patients_page(
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            fields=fields.split(',') if fields else None
+        )
+        first = next(rows, None)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    def generate():
+        yield '{"status": "success", "patients": ['
+        if first is not None:
+            yield json.dumps(first)
+            for row in rows:
+                yield ',' + json.dumps(row)
+        yield '], "next_cursor": ' + json.dumps(page['next_cursor']) + '}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@patients_bp.route('/import', methods=['POST'])
+def import_patients():
+    """Bulk import patients from a CSV or JSON Lines upload (file=..., or the raw body)"""
+    from app.services import patient_import_service
+    
+    if patient_import_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Patient import service not initialized'
+        }), 500
+    
+    try:
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        filename = upload.filename if upload else ''
+        fmt = request.args.get('format') or ('jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'csv')
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        
+        report = patient_import_service.import_stream(
+            upload.stream if upload else request.stream, fmt, dry_run=dry_run
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'message': f"{report['imported']} patients importés",
+            'report': report
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@patients_bp.route('/duplicates', methods=['GET'])
+def find_duplicate_patients():
+    """List likely duplicate patient pairs (min_score, limit)"""
+    from app.services import patient_dedupe_service
+    
+    if patient_dedupe_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Patient dedupe service not initialized'
+        }), 500
+    
+    try:
+        min_score = request.args.get('min_score', type=float)
+        limit = request.args.get('limit', 200, type=int)
+        duplicates = patient_dedupe_service.find_duplicates(min_score=min_score, limit=limit)
+        
+        return jsonify({
+            'status': 'success',
+            'duplicates': duplicates
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@patients_bp.route('/merge', methods=['POST'])
+def merge_patients():
+    """Merge duplicate patients into one (keep_id, merge_ids)"""
+    from app.services import patient_dedupe_service
+    
+    if patient_dedupe_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Patient dedupe service not initialized'
+        }), 500
+    
+    try:
+        data = request.json
+        result = patient_dedupe_service.merge_patients(data['keep_id'], data['merge_ids'])
+        
+        return jsonify({
+            'status': 'success',
+            'message': f"{len(result['merged_ids'])} dossier(s) fusionné(s)",
+            'merge': result
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
 @patients_bp.route('/<patient_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional(lambda patient_id: table_version(Patient, Patient.id == patient_id), last_modified=True,
+             private=lambda: request.args.get('include') == 'sensitive')
 def manage_patient(patient_id):
     """Manage individual patient - GET to view, PUT to update, DELETE to remove"""
     from app.services import patient_service
@@ -55,7 +181,9 @@ def manage_patient(patient_id):
         }), 500
     
     if request.method == 'GET':
-        patient = patient_service.get_patient(patient_id)
+        # Encrypted medical fields are only decrypted on explicit request (?include=sensitive)
+        include_sensitive = request.args.get('include') == 'sensitive'
+        patient = patient_service.get_patient(patient_id, include_sensitive)
         if not patient:
             return jsonify({
                 'status': 'error',
@@ -64,7 +192,7 @@ def manage_patient(patient_id):
         
         return jsonify({
             'status': 'success',
-            'patient': patient.to_dict()
+            'patient': patient.to_dict(include_sensitive)
         })
     
     elif request.method == 'PUT':
@@ -104,6 +232,77 @@ def manage_patient(patient_id):
             'message': 'Patient supprimé avec succès'
         })
 
+@patients_bp.route('/<patient_id>/overview', methods=['GET'])
+def get_patient_overview(patient_id):
+    """Get the patient chart (sections=appointments,treatment_plans,invoices,devis,statistics;
+    include=sensitive adds the encrypted medical fields)"""
+    from app.services import patient_service
+    
+    if patient_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Patient service not initialized'
+        }), 500
+    
+    try:
+        sections = [s for s in request.args.get('sections', '').split(',') if s]
+        include_sensitive = request.args.get('include') == 'sensitive'
+        etag = patient_service.get_overview_etag(patient_id, sections, include_sensitive=include_sensitive)
+        if etag is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Patient non trouvé'
+            }), 404
+        
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            overview = patient_service.get_patient_overview(patient_id, sections, include_sensitive=include_sensitive)
+            response = jsonify({
+                'status': 'success',
+                'overview': overview
+            })
+        
+        response.set_etag(etag)
+        if include_sensitive:
+            private_response(response)
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+@patients_bp.route('/statistics', methods=['GET'])
+def get_patients_statistics():
+    """Get statistics for several patients (ids=comma-separated list)"""
+    from app.services import patient_service
+    
+    if patient_service is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Patient service not initialized'
+        }), 500
+    
+    patient_ids = [pid for pid in request.args.get('ids', '').split(',') if pid]
+    if not patient_ids:
+        return jsonify({
+            'status': 'error',
+            'message': 'Paramètre ids requis'
+        }), 400
+    
+    if len(patient_ids) > 1000:
+        return jsonify({
+            'status': 'error',
+            'message': 'Maximum 1000 patients par requête'
+        }), 400
+    
+    return jsonify({
+        'status': 'success',
+        'statistics': patient_service.get_patients_statistics(patient_ids)
+    })
+
 @patients_bp.route('/<patient_id>/statistics', methods=['GET'])
 def get_patient_statistics(patient_id):
     """Get statistics for a patient"""
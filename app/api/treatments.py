@@ -1,9 +1,22 @@
 from flask import Blueprint, request, jsonify, send_file
+from app import db
 from app.services import treatment_service, pdf_service, powerpoint_service
+from app.models import TreatmentPlan, Patient
+from app.utils.conditional import conditional, table_version
 
 treatments_bp = Blueprint('treatments', __name__)
 
+def _plan_version(plan_id):
+    """The plan row and its patient (serialized as patient_name)"""
+    patient_id = db.session.query(TreatmentPlan.patient_id).filter(
+        TreatmentPlan.id == plan_id
+    ).scalar_subquery()
+    return table_version(TreatmentPlan, TreatmentPlan.id == plan_id) + table_version(
+        Patient, Patient.id == patient_id
+    )
+
 @treatments_bp.route('/', methods=['GET', 'POST'])
+@conditional(lambda: table_version(TreatmentPlan) + table_version(Patient))
 def manage_treatment_plans():
     """Manage treatment plans"""
     if request.method == 'GET':
@@ -41,6 +54,7 @@ def manage_treatment_plans():
             }), 400
 
 @treatments_bp.route('/<plan_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional(_plan_version, last_modified=True)
 def manage_treatment_plan(plan_id):
     """Manage specific treatment plan"""
     if request.method == 'GET':
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,6 +25,28 @@ class Config:
     # API settings
     API_RATE_LIMIT = os.environ.get('API_RATE_LIMIT', '100/hour')
     
+    # Calendar per-day summaries are cached in each worker for this many seconds
+    CALENDAR_SUMMARY_TTL = int(os.environ.get('CALENDAR_SUMMARY_TTL', 60))
+    
+    # Pricing rows are cached in each worker for this many seconds (commits clear it locally)
+    PRICING_CACHE_TTL = int(os.environ.get('PRICING_CACHE_TTL', 300))
+    
+    # Schedule change feed: 'memory' (single worker) or 'database' (shared journal table)
+    CHANGE_FEED_BACKEND = os.environ.get('CHANGE_FEED_BACKEND', 'memory')
+    
+    # VAT rules as a JSON list of {rate, valid_from, valid_to, category}; unset uses the Swiss standard rates
+    VAT_RULES = json.loads(os.environ['VAT_RULES']) if os.environ.get('VAT_RULES') else None
+    
+    # Invoice/devis numbers reserved per worker at once; 1 keeps numbering gapless
+    DOCUMENT_NUMBER_BLOCK_SIZE = int(os.environ.get('DOCUMENT_NUMBER_BLOCK_SIZE', 1))
+    
+    # Soft-deleted patients are purged by a background job: check interval and how long tombstones are kept
+    PATIENT_PURGE_INTERVAL = int(os.environ.get('PATIENT_PURGE_INTERVAL', 300))
+    PATIENT_PURGE_GRACE_SECONDS = int(os.environ.get('PATIENT_PURGE_GRACE_SECONDS', 0))
+    
+    # Fernet keys for encrypted patient fields, comma-separated (first encrypts, all decrypt)
+    FIELD_ENCRYPTION_KEYS = os.environ.get('FIELD_ENCRYPTION_KEYS')
+    
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
@@ -42,6 +65,9 @@ class ProductionConfig(Config):
     def init_app(cls, app):
         Config.init_app(app)
         
+        if not app.config.get('FIELD_ENCRYPTION_KEYS'):
+            app.logger.warning('FIELD_ENCRYPTION_KEYS not set: sensitive fields use a key derived from SECRET_KEY')
+        
         # Log to stderr
         import logging
         from logging import StreamHandler
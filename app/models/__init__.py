@@ -1,14 +1,20 @@
-from app.models.patient import Patient
-from app.models.appointment import Appointment
+from app.models.types import EncryptedText, Money
+from app.models.patient import Patient, SENSITIVE_FIELDS
+from app.models.appointment import Appointment, AppointmentSeries
 from app.models.treatment import TreatmentPlan
-from app.models.financial import Invoice, InvoiceItem, Payment, Devis, DevisItem, PaymentPlan, ScheduledPayment
-from app.models.schedule import ScheduleBlock
+from app.models.financial import (
+    Invoice, InvoiceItem, Payment, Devis, DevisItem, PaymentPlan, ScheduledPayment, RevenueRollup,
+    DocumentSequence, UnmatchedPayment
+)
+from app.models.schedule import ScheduleBlock, ScheduleChange
 from app.models.pricing import DentalPricing
 from app.models.education import PatientEducation
 
 __all__ = [
-    'Patient', 'Appointment', 'TreatmentPlan',
+    'Patient', 'Appointment', 'AppointmentSeries', 'TreatmentPlan',
     'Invoice', 'InvoiceItem', 'Payment', 'Devis', 'DevisItem',
-    'PaymentPlan', 'ScheduledPayment', 'ScheduleBlock',
-    'DentalPricing', 'PatientEducation'
+    'PaymentPlan', 'ScheduledPayment', 'RevenueRollup', 'DocumentSequence',
+    'UnmatchedPayment',
+    'ScheduleBlock', 'ScheduleChange',
+    'DentalPricing', 'PatientEducation', 'EncryptedText', 'Money', 'SENSITIVE_FIELDS'
 ]
\ No newline at end of file
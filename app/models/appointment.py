@@ -1,8 +1,17 @@
-from datetime import datetime
+import calendar
+import json
+from datetime import datetime, date, timedelta
 from app import db
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        db.Index('ix_appointments_date_time', 'appointment_date', 'appointment_time'),
+        db.Index('ix_appointments_patient_date', 'patient_id', 'appointment_date'),
+        db.Index('ix_appointments_plan_status', 'treatment_plan_id', 'status'),
+        db.Index('ix_appointments_series_date', 'series_id', 'series_date'),
+        db.Index('ix_appointments_invoice_id', 'invoice_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
@@ -15,11 +24,15 @@ class Appointment(db.Model):
     room = db.Column(db.String(50))
     notes = db.Column(db.Text)
     treatment_plan_id = db.Column(db.String(36), db.ForeignKey('treatment_plans.id'))
+    series_id = db.Column(db.String(36), db.ForeignKey('appointment_series.id'))
+    series_date = db.Column(db.Date)  # Occurrence this row materializes, even if moved since
+    invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'))  # Set once billed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     treatment_plan = db.relationship('TreatmentPlan', backref='appointments')
+    series = db.relationship('AppointmentSeries', backref='appointments')
     
     def to_dict(self):
         return {
@@ -35,6 +48,8 @@ class Appointment(db.Model):
             'room': self.room,
             'notes': self.notes,
             'treatment_plan_id': self.treatment_plan_id,
+            'series_id': self.series_id,
+            'invoice_id': self.invoice_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -46,4 +61,148 @@ class Appointment(db.Model):
         return None
     
     def __repr__(self):
-        return f'<Appointment {self.id} - {self.patient.full_name if self.patient else "No Patient"}>'
\ No newline at end of file
+        return f'<Appointment {self.id} - {self.patient.full_name if self.patient else "No Patient"}>'
+
+class AppointmentSeries(db.Model):
+    """Recurring appointments stored as one RRULE-style row.
+    
+    Occurrences are expanded on demand for the queried window; an occurrence
+    only becomes an Appointment row (with series_id/series_date) once edited.
+    """
+    __tablename__ = 'appointment_series'
+    __table_args__ = (
+        db.Index('ix_appointment_series_window', 'start_date', 'last_date'),
+    )
+    
+    FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+    
+    id = db.Column(db.String(36), primary_key=True)
+    patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
+    start_date = db.Column(db.Date, nullable=False)
+    appointment_time = db.Column(db.Time, nullable=False)
+    duration_minutes = db.Column(db.Integer, default=60)
+    treatment_type = db.Column(db.String(200))
+    doctor = db.Column(db.String(100), default='Dr.')
+    room = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+    treatment_plan_id = db.Column(db.String(36), db.ForeignKey('treatment_plans.id'))
+    frequency = db.Column(db.String(20), nullable=False, default='WEEKLY')
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    occurrence_count = db.Column(db.Integer)
+    until_date = db.Column(db.Date)
+    last_date = db.Column(db.Date)  # Derived from count/until, NULL for open-ended series
+    exception_dates = db.Column(db.Text)  # JSON list of ISO dates removed from the series
+    status = db.Column(db.String(50), default='active')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def rrule(self):
+        parts = [f"FREQ={self.frequency}", f"INTERVAL={self.interval}"]
+        if self.occurrence_count:
+            parts.append(f"COUNT={self.occurrence_count}")
+        if self.until_date:
+            parts.append(f"UNTIL={self.until_date.strftime('%Y%m%d')}")
+        return ';'.join(parts)
+    
+    @property
+    def exceptions(self):
+        return {date.fromisoformat(d) for d in json.loads(self.exception_dates or '[]')}
+    
+    def add_exception(self, day):
+        self.exception_dates = json.dumps(sorted(d.isoformat() for d in self.exceptions | {day}))
+    
+    def nth_date(self, n):
+        """Date of the n-th occurrence (0-based), ignoring count, until and exceptions"""
+        if self.frequency == 'DAILY':
+            return self.start_date + timedelta(days=n * self.interval)
+        if self.frequency == 'WEEKLY':
+            return self.start_date + timedelta(weeks=n * self.interval)
+        
+        # Monthly: same day of month, clamped to the month length (31 -> 30/28...)
+        months = self.start_date.month - 1 + n * self.interval
+        year = self.start_date.year + months // 12
+        month = months % 12 + 1
+        day = min(self.start_date.day, calendar.monthrange(year, month)[1])
+        return date(year, month, day)
+    
+    def compute_last_date(self):
+        """Last occurrence date implied by count/until, or None if open-ended"""
+        candidates = []
+        if self.occurrence_count:
+            candidates.append(self.nth_date(self.occurrence_count - 1))
+        if self.until_date:
+            candidates.append(self.until_date)
+        return min(candidates) if candidates else None
+    
+    def occurrence_dates(self, start, end):
+        """Yield the occurrence dates that fall within [start, end]"""
+        if self.last_date and self.last_date < end:
+            end = self.last_date
+        if end < self.start_date:
+            return
+        
+        # Jump straight to the first occurrence that can reach the window
+        if self.frequency == 'MONTHLY':
+            months = (start.year - self.start_date.year) * 12 + start.month - self.start_date.month
+            n = max(months // self.interval, 0)
+        else:
+            step = self.interval * (7 if self.frequency == 'WEEKLY' else 1)
+            n = max((start - self.start_date).days // step, 0)
+        
+        exceptions = self.exceptions
+        while self.occurrence_count is None or n < self.occurrence_count:
+            day = self.nth_date(n)
+            if day > end:
+                break
+            if day >= start and day not in exceptions:
+                yield day
+            n += 1
+    
+    def occurrence_id(self, day):
+        return f"{self.id}:{day.isoformat()}"
+    
+    def occurrence_dict(self, day, patient_name=None):
+        """Serialize a virtual occurrence in the same shape as Appointment.to_dict"""
+        return {
+            'id': self.occurrence_id(day),
+            'patient_id': self.patient_id,
+            'patient_name': patient_name,
+            'appointment_date': day.isoformat(),
+            'appointment_time': self.appointment_time.isoformat() if self.appointment_time else None,
+            'duration_minutes': self.duration_minutes,
+            'treatment_type': self.treatment_type,
+            'status': 'scheduled',
+            'doctor': self.doctor,
+            'room': self.room,
+            'notes': self.notes,
+            'treatment_plan_id': self.treatment_plan_id,
+            'series_id': self.id,
+            'is_virtual': True,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'patient_id': self.patient_id,
+            'patient_name': self.patient.full_name if self.patient else None,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'appointment_time': self.appointment_time.isoformat() if self.appointment_time else None,
+            'duration_minutes': self.duration_minutes,
+            'treatment_type': self.treatment_type,
+            'doctor': self.doctor,
+            'room': self.room,
+            'notes': self.notes,
+            'treatment_plan_id': self.treatment_plan_id,
+            'rrule': self.rrule,
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'exception_dates': sorted(d.isoformat() for d in self.exceptions),
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<AppointmentSeries {self.id} {self.rrule}>'
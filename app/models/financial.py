@@ -1,18 +1,32 @@
 from datetime import datetime
+from decimal import Decimal
 from app import db
+from app.models.types import Money
+
+def _tax_rates(tax_breakdown) -> list:
+    """VAT rates of a stored per-rate breakdown, highest first"""
+    return [Decimal(line['rate']) for line in tax_breakdown or []]
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_patient_status', 'patient_id', 'status'),
+        db.Index('ix_invoices_issue_date', 'issue_date'),
+        db.Index('ix_invoices_status_due_date', 'status', 'due_date', 'patient_id', 'total_amount', 'paid_amount'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
     issue_date = db.Column(db.Date, nullable=False)
     due_date = db.Column(db.Date)
-    subtotal = db.Column(db.Float, default=0.0)
-    tax_amount = db.Column(db.Float, default=0.0)
-    total_amount = db.Column(db.Float, default=0.0)
-    paid_amount = db.Column(db.Float, default=0.0)
+    subtotal = db.Column(Money, default=0)
+    tax_amount = db.Column(Money, default=0)
+    # 5-centime rounding of the total, and the VAT per rate (TaxService.compute)
+    rounding_amount = db.Column(Money, default=0)
+    tax_breakdown = db.Column(db.JSON)
+    total_amount = db.Column(Money, default=0)
+    paid_amount = db.Column(Money, default=0)
     status = db.Column(db.String(50), default='pending')
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -36,6 +50,8 @@ class Invoice(db.Model):
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'subtotal': self.subtotal,
             'tax_amount': self.tax_amount,
+            'rounding_amount': self.rounding_amount,
+            'tax_rates': _tax_rates(self.tax_breakdown),
             'total_amount': self.total_amount,
             'paid_amount': self.paid_amount,
             'balance_due': self.balance_due,
@@ -53,8 +69,8 @@ class InvoiceItem(db.Model):
     description = db.Column(db.Text, nullable=False)
     tarmed_code = db.Column(db.String(20))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, nullable=False)
-    total_price = db.Column(db.Float, nullable=False)
+    unit_price = db.Column(Money, nullable=False)
+    total_price = db.Column(Money, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -70,11 +86,19 @@ class InvoiceItem(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_payment_date', 'payment_date'),
+        db.Index('ix_payments_reference_number', 'reference_number'),
+        # A bank credit is booked once, even by two imports of the same file at the same time
+        db.Index('uq_payments_bank_reference', 'reference_number', unique=True,
+                 sqlite_where=db.text("payment_method = 'bank_transfer'"),
+                 postgresql_where=db.text("payment_method = 'bank_transfer'")),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'))
     payment_date = db.Column(db.Date, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     payment_method = db.Column(db.String(50))
     reference_number = db.Column(db.String(100))
     notes = db.Column(db.Text)
@@ -94,15 +118,21 @@ class Payment(db.Model):
 
 class Devis(db.Model):
     __tablename__ = 'devis'
+    __table_args__ = (
+        db.Index('ix_devis_patient_id', 'patient_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     devis_number = db.Column(db.String(50), unique=True, nullable=False)
     patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
     issue_date = db.Column(db.Date, nullable=False)
     validity_date = db.Column(db.Date)
-    subtotal = db.Column(db.Float, default=0.0)
-    tax_amount = db.Column(db.Float, default=0.0)
-    total_amount = db.Column(db.Float, default=0.0)
+    subtotal = db.Column(Money, default=0)
+    tax_amount = db.Column(Money, default=0)
+    # 5-centime rounding of the total, and the VAT per rate (TaxService.compute)
+    rounding_amount = db.Column(Money, default=0)
+    tax_breakdown = db.Column(db.JSON)
+    total_amount = db.Column(Money, default=0)
     status = db.Column(db.String(50), default='draft')
     treatment_plan_id = db.Column(db.String(36), db.ForeignKey('treatment_plans.id'))
     notes = db.Column(db.Text)
@@ -123,6 +153,8 @@ class Devis(db.Model):
             'validity_date': self.validity_date.isoformat() if self.validity_date else None,
             'subtotal': self.subtotal,
             'tax_amount': self.tax_amount,
+            'rounding_amount': self.rounding_amount,
+            'tax_rates': _tax_rates(self.tax_breakdown),
             'total_amount': self.total_amount,
             'status': self.status,
             'treatment_plan_id': self.treatment_plan_id,
@@ -139,8 +171,8 @@ class DevisItem(db.Model):
     description = db.Column(db.Text, nullable=False)
     tarmed_code = db.Column(db.String(20))
     quantity = db.Column(db.Float, default=1.0)
-    unit_price = db.Column(db.Float, nullable=False)
-    total_price = db.Column(db.Float, nullable=False)
+    unit_price = db.Column(Money, nullable=False)
+    total_price = db.Column(Money, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -160,7 +192,7 @@ class PaymentPlan(db.Model):
     id = db.Column(db.String(36), primary_key=True)
     patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
     invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'))
-    total_amount = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(Money, nullable=False)
     installments = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(50), default='active')
     notes = db.Column(db.Text)
@@ -186,11 +218,14 @@ class PaymentPlan(db.Model):
 
 class ScheduledPayment(db.Model):
     __tablename__ = 'scheduled_payments'
+    __table_args__ = (
+        db.Index('ix_scheduled_payments_status_due_date', 'status', 'due_date'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     payment_plan_id = db.Column(db.String(36), db.ForeignKey('payment_plans.id'))
     due_date = db.Column(db.Date, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     status = db.Column(db.String(50), default='pending')
     payment_id = db.Column(db.String(36), db.ForeignKey('payments.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -209,4 +244,98 @@ class ScheduledPayment(db.Model):
             'payment_id': self.payment_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class RevenueRollup(db.Model):
+    """Daily totals of invoices, payments, scheduled payments and devis.
+    
+    One row per (day, source, status, payment_method); status and
+    payment_method are '' where they do not apply. Kept up to date from the
+    ORM flush by RevenueRollupService.
+    """
+    __tablename__ = 'revenue_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'source', 'status', 'payment_method', name='uq_revenue_rollups_bucket'),
+        db.Index('ix_revenue_rollups_source_day', 'source', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    source = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(50), nullable=False, default='')
+    payment_method = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(Money, nullable=False, default=0)
+    paid_amount = db.Column(Money, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'source': self.source,
+            'status': self.status,
+            'payment_method': self.payment_method,
+            'count': self.count,
+            'amount': self.amount,
+            'paid_amount': self.paid_amount
+        }
+
+class DocumentSequence(db.Model):
+    """Last number handed out for a document series (invoice, devis) in a year"""
+    __tablename__ = 'document_sequences'
+    
+    name = db.Column(db.String(20), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'year': self.year,
+            'last_value': self.last_value
+        }
+
+class UnmatchedPayment(db.Model):
+    """Bank credit that reconciliation could not apply, queued for manual review.
+    
+    reason says why (no_reference, invalid_reference, no_open_invoice,
+    ambiguous_reference, overpayment, currency, reversal); invoice_id is
+    the invoice the reference pointed to, if any. Resolving an entry books
+    the payment on an invoice, dismissing it books nothing.
+    """
+    __tablename__ = 'unmatched_payments'
+    __table_args__ = (
+        db.Index('ix_unmatched_payments_status_booking_date', 'status', 'booking_date'),
+        db.Index('uq_unmatched_payments_bank_reference', 'bank_reference', unique=True),
+    )
+    
+    id = db.Column(db.String(36), primary_key=True)
+    source_file = db.Column(db.String(255))
+    bank_reference = db.Column(db.String(100))
+    reference = db.Column(db.String(50))
+    amount = db.Column(Money, nullable=False)
+    currency = db.Column(db.String(3), default='CHF')
+    booking_date = db.Column(db.Date)
+    debtor_name = db.Column(db.String(200))
+    reason = db.Column(db.String(50), nullable=False)
+    invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'))
+    status = db.Column(db.String(20), default='open')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source_file': self.source_file,
+            'bank_reference': self.bank_reference,
+            'reference': self.reference,
+            'amount': self.amount,
+            'currency': self.currency,
+            'booking_date': self.booking_date.isoformat() if self.booking_date else None,
+            'debtor_name': self.debtor_name,
+            'reason': self.reason,
+            'invoice_id': self.invoice_id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+        }
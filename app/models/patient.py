@@ -1,8 +1,18 @@
 from datetime import datetime
 from app import db
+from app.models.types import EncryptedText
+
+# Encrypted, deferred columns returned only when explicitly requested
+SENSITIVE_FIELDS = ('medical_history', 'allergies', 'insurance_info')
 
 class Patient(db.Model):
     __tablename__ = 'patients'
+    __table_args__ = (
+        # Keyset pagination order of the patient list
+        db.Index('ix_patients_name_id', 'last_name', 'first_name', 'id'),
+        # Freshness check of the search index: MAX(updated_at)
+        db.Index('ix_patients_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     first_name = db.Column(db.String(100), nullable=False)
@@ -11,23 +21,27 @@ class Patient(db.Model):
     phone = db.Column(db.String(20))
     birth_date = db.Column(db.Date)
     address = db.Column(db.Text)
-    medical_history = db.Column(db.Text)
-    allergies = db.Column(db.Text)
+    # Sensitive fields: encrypted at rest and only loaded (and decrypted) on access
+    medical_history = db.deferred(db.Column(EncryptedText), group='sensitive')
+    allergies = db.deferred(db.Column(EncryptedText), group='sensitive')
     emergency_contact = db.Column(db.Text)
-    insurance_info = db.Column(db.Text)
+    insurance_info = db.deferred(db.Column(EncryptedText), group='sensitive')
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Soft delete tombstone; the purge job removes the patient and its records later
+    deleted_at = db.Column(db.DateTime, index=True)
     
     # Relationships
     appointments = db.relationship('Appointment', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
+    appointment_series = db.relationship('AppointmentSeries', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     treatment_plans = db.relationship('TreatmentPlan', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     invoices = db.relationship('Invoice', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     devis = db.relationship('Devis', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     education_documents = db.relationship('PatientEducation', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_sensitive=False):
+        data = {
             'id': self.id,
             'first_name': self.first_name,
             'last_name': self.last_name,
@@ -35,14 +49,26 @@ class Patient(db.Model):
             'phone': self.phone,
             'birth_date': self.birth_date.isoformat() if self.birth_date else None,
             'address': self.address,
-            'medical_history': self.medical_history,
-            'allergies': self.allergies,
             'emergency_contact': self.emergency_contact,
-            'insurance_info': self.insurance_info,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if include_sensitive:
+            data.update({field: getattr(self, field) for field in SENSITIVE_FIELDS})
+        return data
+    
+    @classmethod
+    def active(cls):
+        """Query of the patients that are not soft-deleted"""
+        return cls.query.filter(cls.deleted_at.is_(None))
+    
+    @classmethod
+    def deleted_ids(cls):
+        """IDs of the soft-deleted patients, the complement of active(), for NOT IN filters on
+        their rows; read from the deleted_at index instead of listing every active patient"""
+        return cls.query.filter(cls.deleted_at.isnot(None)).with_entities(cls.id)
     
     @property
     def full_name(self):
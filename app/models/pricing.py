@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.models.types import Money
 
 class DentalPricing(db.Model):
     __tablename__ = 'dental_pricing'
@@ -9,7 +10,7 @@ class DentalPricing(db.Model):
     description_fr = db.Column(db.Text, nullable=False)
     description_de = db.Column(db.Text)
     category = db.Column(db.String(100))
-    base_price = db.Column(db.Float, nullable=False)
+    base_price = db.Column(Money, nullable=False)
     unit = db.Column(db.String(50))
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from app import db
 
@@ -5,7 +6,7 @@ class ScheduleBlock(db.Model):
     __tablename__ = 'schedule_blocks'
     
     id = db.Column(db.String(36), primary_key=True)
-    block_date = db.Column(db.Date, nullable=False)
+    block_date = db.Column(db.Date, nullable=False, index=True)
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     block_type = db.Column(db.String(50), nullable=False)  # 'unavailable', 'vacation', 'meeting', etc.
@@ -26,4 +27,25 @@ class ScheduleBlock(db.Model):
         }
     
     def __repr__(self):
-        return f'<ScheduleBlock {self.block_type} on {self.block_date}>'
\ No newline at end of file
+        return f'<ScheduleBlock {self.block_type} on {self.block_date}>'
+
+class ScheduleChange(db.Model):
+    """Change-feed journal shared by workers when CHANGE_FEED_BACKEND is 'database'"""
+    __tablename__ = 'schedule_changes'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity = db.Column(db.String(50), nullable=False)  # 'appointment', 'series', 'schedule_block'
+    entity_id = db.Column(db.String(100), nullable=False)
+    action = db.Column(db.String(50), nullable=False)  # 'created', 'moved', 'status_changed', ...
+    payload = db.Column(db.Text)  # JSON of the changed fields
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'action': self.action,
+            'changes': json.loads(self.payload) if self.payload else {},
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -3,6 +3,9 @@ from app import db
 
 class TreatmentPlan(db.Model):
     __tablename__ = 'treatment_plans'
+    __table_args__ = (
+        db.Index('ix_treatment_plans_patient_status', 'patient_id', 'status'),
+    )
     
     id = db.Column(db.String(36), primary_key=True)
     patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'))
@@ -0,0 +1,69 @@
+import base64
+import hashlib
+from cryptography.fernet import Fernet, MultiFernet
+from flask import current_app, g, has_app_context, has_request_context
+from app import db
+from app.utils.money import from_centimes, to_centimes
+
+# Marks encrypted values; rows written before encryption was enabled stay readable
+ENCRYPTED_PREFIX = 'enc:'
+
+_ciphers = {}
+
+def field_cipher() -> MultiFernet:
+    """Cipher built from FIELD_ENCRYPTION_KEYS (first key encrypts, all keys decrypt).
+    
+    Cached on flask.g for the current request, and per key set otherwise.
+    Without configured keys one is derived from SECRET_KEY, which is only
+    suitable for development.
+    """
+    if has_request_context() and 'field_cipher' in g:
+        return g.field_cipher
+    
+    keys = current_app.config.get('FIELD_ENCRYPTION_KEYS') if has_app_context() else None
+    if not keys:
+        secret = current_app.config['SECRET_KEY'] if has_app_context() else ''
+        keys = base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()).decode()
+    
+    cipher = _ciphers.get(keys)
+    if cipher is None:
+        cipher = MultiFernet([Fernet(key.strip()) for key in keys.split(',') if key.strip()])
+        _ciphers[keys] = cipher
+    
+    if has_request_context():
+        g.field_cipher = cipher
+    return cipher
+
+class EncryptedText(db.TypeDecorator):
+    """Text column encrypted at rest with Fernet (AES-128-CBC + HMAC-SHA256)"""
+    impl = db.Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or value == '':
+            return value
+        return ENCRYPTED_PREFIX + field_cipher().encrypt(value.encode()).decode()
+    
+    def process_result_value(self, value, dialect):
+        if not value or not value.startswith(ENCRYPTED_PREFIX):
+            return value
+        return field_cipher().decrypt(value[len(ENCRYPTED_PREFIX):].encode()).decode()
+
+class Money(db.TypeDecorator):
+    """CHF amount stored as integer centimes, read back as a Decimal.
+    
+    SUM() over the column stays exact in SQL, and aggregates of the column
+    come back as Decimal amounts too.
+    """
+    impl = db.BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        return to_centimes(value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        return from_centimes(value)
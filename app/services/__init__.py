@@ -1,27 +1,52 @@
 from app.services.patient_service import PatientService
+from app.services.patient_search_service import PatientSearchService
+from app.services.patient_import_service import PatientImportService
+from app.services.patient_dedupe_service import PatientDedupeService
+from app.services.patient_purge_service import PatientPurgeService
 from app.services.appointment_service import AppointmentService
 from app.services.treatment_service import TreatmentService
 from app.services.financial_service import FinancialService
+from app.services.revenue_rollup_service import RevenueRollupService
+from app.services.document_sequence_service import DocumentSequenceService
+from app.services.billing_service import BillingService
+from app.services.tax_service import TaxService
+from app.services.payment_reconciliation_service import PaymentReconciliationService
 from app.services.ai_service import AIService
 from app.services.rag_service import RAGService
 from app.services.pdf_service import PDFService
 from app.services.powerpoint_service import PowerPointService
+from app.services.change_feed_service import ChangeFeedService
+from app.utils.cache import register_cache_invalidation
 
 # Service instances
 patient_service = None
+patient_search_service = None
+patient_import_service = None
+patient_dedupe_service = None
+patient_purge_service = None
 appointment_service = None
 treatment_service = None
 financial_service = None
+revenue_rollup_service = None
+document_sequence_service = None
+tax_service = None
+billing_service = None
+reconciliation_service = None
 ai_service = None
 rag_service = None
 pdf_service = None
 powerpoint_service = None
+change_feed_service = None
 
 def init_services(app):
     """Initialize all services with app context"""
-    global patient_service, appointment_service, treatment_service
-    global financial_service, ai_service, rag_service
-    global pdf_service, powerpoint_service
+    global patient_service, patient_search_service, patient_import_service
+    global patient_dedupe_service, patient_purge_service
+    global appointment_service, treatment_service
+    global financial_service, revenue_rollup_service, document_sequence_service, billing_service, tax_service
+    global reconciliation_service
+    global ai_service, rag_service
+    global pdf_service, powerpoint_service, change_feed_service
     
     # Initialize RAG system first as others depend on it
     rag_service = RAGService()
@@ -31,21 +56,67 @@ def init_services(app):
     ai_service = AIService(rag_service)
     
     # Initialize other services
-    patient_service = PatientService()
-    appointment_service = AppointmentService()
+    patient_search_service = PatientSearchService()
+    revenue_rollup_service = RevenueRollupService()
+    patient_purge_service = PatientPurgeService(
+        rollup_service=revenue_rollup_service,
+        interval_seconds=app.config['PATIENT_PURGE_INTERVAL'],
+        grace_seconds=app.config['PATIENT_PURGE_GRACE_SECONDS']
+    )
+    patient_service = PatientService(
+        search_service=patient_search_service, purge_service=patient_purge_service
+    )
+    patient_import_service = PatientImportService(search_service=patient_search_service)
+    patient_dedupe_service = PatientDedupeService(search_service=patient_search_service)
+    appointment_service = AppointmentService(
+        summary_ttl_seconds=app.config['CALENDAR_SUMMARY_TTL']
+    )
     treatment_service = TreatmentService()
-    financial_service = FinancialService()
+    document_sequence_service = DocumentSequenceService(block_size=app.config['DOCUMENT_NUMBER_BLOCK_SIZE'])
+    tax_service = TaxService(
+        rules=app.config['VAT_RULES'],
+        category_cache_ttl=app.config['PRICING_CACHE_TTL']
+    )
+    financial_service = FinancialService(
+        sequence_service=document_sequence_service,
+        rollup_service=revenue_rollup_service,
+        tax_service=tax_service,
+        pricing_cache_ttl=app.config['PRICING_CACHE_TTL']
+    )
+    billing_service = BillingService(financial_service=financial_service)
+    reconciliation_service = PaymentReconciliationService(
+        financial_service=financial_service, rollup_service=revenue_rollup_service
+    )
     pdf_service = PDFService()
     powerpoint_service = PowerPointService()
     
+    # Schedule change feed hooks into the session, so it sees every write
+    change_feed_service = ChangeFeedService(backend=app.config['CHANGE_FEED_BACKEND'])
+    change_feed_service.register()
+    
+    # Revenue rollups follow every flushed invoice, payment and devis
+    revenue_rollup_service.register()
+    
+    # Commits drop request-scoped and per-worker object caches
+    register_cache_invalidation()
+    
+    if not app.testing:
+        patient_purge_service.start(app)
+    
     app.logger.info("All services initialized successfully")
 
 __all__ = [
-    'PatientService', 'AppointmentService', 'TreatmentService',
-    'FinancialService', 'AIService', 'RAGService',
-    'PDFService', 'PowerPointService',
+    'PatientService', 'PatientSearchService', 'PatientImportService', 'PatientDedupeService',
+    'PatientPurgeService',
+    'AppointmentService', 'TreatmentService',
+    'FinancialService', 'RevenueRollupService', 'DocumentSequenceService',
+    'BillingService', 'TaxService', 'PaymentReconciliationService', 'AIService', 'RAGService',
+    'PDFService', 'PowerPointService', 'ChangeFeedService',
     'init_services',
-    'patient_service', 'appointment_service', 'treatment_service',
-    'financial_service', 'ai_service', 'rag_service',
-    'pdf_service', 'powerpoint_service'
+    'patient_service', 'patient_search_service', 'patient_import_service', 'patient_dedupe_service',
+    'patient_purge_service',
+    'appointment_service', 'treatment_service',
+    'financial_service', 'revenue_rollup_service', 'document_sequence_service',
+    'billing_service', 'tax_service', 'reconciliation_service', 'ai_service', 'rag_service',
+    'pdf_service', 'powerpoint_service', 'change_feed_service'
 ]
\ No newline at end of file
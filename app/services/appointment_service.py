@@ -1,12 +1,30 @@
 import uuid
 from datetime import datetime, timedelta, time
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Appointment, Patient, ScheduleBlock
+from app.models import Appointment, AppointmentSeries, Patient, ScheduleBlock
+from app.utils.cache import LRUCache
+
+SUMMARY_STATUSES = ('scheduled', 'completed', 'cancelled', 'no_show')
+
+# Longest range of one calendar summary request, and days kept in the summary cache
+MAX_SUMMARY_DAYS = 366
+SUMMARY_CACHE_DAYS = 2 * MAX_SUMMARY_DAYS
+
+# Cancelled series still expand up to the day before their cancellation
+EXPANDED_SERIES_STATUSES = ('active', 'cancelled')
 
 class AppointmentService:
     """Service for managing appointment operations"""
     
+    def __init__(self, summary_ttl_seconds: int = 60):
+        # Per-day calendar summaries, dropped by this service's own writes; the
+        # TTL bounds how long writes of other workers go unseen
+        self._day_summaries = LRUCache(maxsize=SUMMARY_CACHE_DAYS, ttl_seconds=summary_ttl_seconds)
+        self._summary_generation = 0
+    
     def create_appointment(self, data: Dict) -> Appointment:
         """Create a new appointment"""
         appointment = Appointment(
@@ -25,36 +43,55 @@ class AppointmentService:
         
         db.session.add(appointment)
         db.session.commit()
+        self._invalidate_summaries(appointment.appointment_date)
         return appointment
     
     def get_appointment(self, appointment_id: str) -> Optional[Appointment]:
         """Get an appointment by ID"""
         return Appointment.query.get(appointment_id)
     
+    def get_calendar_entries(self, start_date: datetime.date, end_date: datetime.date) -> List[Dict]:
+        """Serialized appointments and virtual series occurrences for a date range"""
+        entries = [a.to_dict() for a in self.get_appointments_range(start_date, end_date)]
+        entries.extend(self.expand_series(start_date, end_date))
+        entries.sort(key=lambda e: (e['appointment_date'], e['appointment_time'] or ''))
+        return entries
+    
     def get_appointments_by_date(self, date: datetime.date) -> List[Appointment]:
         """Get all appointments for a specific date"""
-        return Appointment.query.filter_by(appointment_date=date).order_by(Appointment.appointment_time).all()
+        return Appointment.query.options(
+            joinedload(Appointment.patient).load_only(Patient.first_name, Patient.last_name)
+        ).filter(
+            Appointment.appointment_date == date, Appointment.patient_id.notin_(Patient.deleted_ids())
+        ).order_by(Appointment.appointment_time).all()
     
     def get_appointments_by_patient(self, patient_id: str) -> List[Appointment]:
         """Get all appointments for a patient"""
-        return Appointment.query.filter_by(patient_id=patient_id).order_by(
+        return Appointment.query.filter(
+            Appointment.patient_id == patient_id, Appointment.patient_id.notin_(Patient.deleted_ids())
+        ).order_by(
             Appointment.appointment_date.desc(), 
             Appointment.appointment_time.desc()
         ).all()
     
     def get_appointments_range(self, start_date: datetime.date, end_date: datetime.date) -> List[Appointment]:
         """Get appointments within a date range"""
-        return Appointment.query.filter(
+        return Appointment.query.options(
+            joinedload(Appointment.patient).load_only(Patient.first_name, Patient.last_name)
+        ).filter(
             Appointment.appointment_date >= start_date,
-            Appointment.appointment_date <= end_date
+            Appointment.appointment_date <= end_date,
+            Appointment.patient_id.notin_(Patient.deleted_ids())
         ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
     
     def update_appointment(self, appointment_id: str, data: Dict) -> Optional[Appointment]:
-        """Update an appointment"""
-        appointment = self.get_appointment(appointment_id)
+        """Update an appointment, materializing it first if it is a series occurrence"""
+        appointment = self._resolve_appointment(appointment_id)
         if not appointment:
             return None
         
+        previous_date = appointment.appointment_date
+        
         # Update fields
         if 'appointment_date' in data:
             appointment.appointment_date = datetime.fromisoformat(data['appointment_date']).date()
@@ -67,33 +104,52 @@ class AppointmentService:
         
         appointment.updated_at = datetime.utcnow()
         db.session.commit()
+        self._invalidate_summaries(previous_date, appointment.appointment_date)
         return appointment
     
     def delete_appointment(self, appointment_id: str) -> bool:
-        """Delete an appointment"""
-        appointment = self.get_appointment(appointment_id)
+        """Delete an appointment, or remove an occurrence from its series"""
+        appointment = self._resolve_appointment(appointment_id)
         if not appointment:
             return False
         
+        if appointment in db.session.new:
+            # Virtual occurrence: nothing to delete, just exclude the date
+            db.session.expunge(appointment)
+            self.get_series(appointment.series_id).add_exception(appointment.series_date)
+            db.session.commit()
+            self._invalidate_summaries(appointment.series_date)
+            return True
+        
+        # Keep a deleted occurrence from reappearing as a virtual one
+        if appointment.series:
+            appointment.series.add_exception(appointment.series_date)
+        
+        appointment_date = appointment.appointment_date
         db.session.delete(appointment)
         db.session.commit()
+        self._invalidate_summaries(appointment_date)
         return True
     
     def reschedule_appointment(self, appointment_id: str, new_date: datetime.date, new_time: time) -> Optional[Appointment]:
         """Reschedule an appointment"""
-        appointment = self.get_appointment(appointment_id)
+        appointment = self._resolve_appointment(appointment_id)
         if not appointment:
             return None
         
         # Check if new slot is available
-        if not self.is_slot_available(new_date, new_time, appointment.duration_minutes, appointment_id):
+        if not self.is_slot_available(new_date, new_time, appointment.duration_minutes, appointment.id):
+            if self._parse_occurrence_id(appointment_id):
+                db.session.rollback()  # Discard the occurrence materialized above
             return None
         
+        previous_date = appointment.appointment_date
         appointment.appointment_date = new_date
         appointment.appointment_time = new_time
         appointment.updated_at = datetime.utcnow()
         
         db.session.commit()
+        self._invalidate_summaries(previous_date, new_date)
         return appointment
     
     def is_slot_available(self, date: datetime.date, start_time: time, duration_minutes: int, 
@@ -101,29 +157,15 @@ class AppointmentService:
         """Check if a time slot is available"""
         end_time = (datetime.combine(date, start_time) + timedelta(minutes=duration_minutes)).time()
         
-        # Check for schedule blocks
-        blocks = ScheduleBlock.query.filter_by(block_date=date).all()
-        for block in blocks:
-            if self._times_overlap(start_time, end_time, block.start_time, block.end_time):
-                return False
-        
-        # Check for existing appointments
-        appointments = self.get_appointments_by_date(date)
-        for apt in appointments:
-            if exclude_appointment_id and apt.id == exclude_appointment_id:
-                continue
-            
-            apt_end_time = (datetime.combine(date, apt.appointment_time) + 
-                           timedelta(minutes=apt.duration_minutes)).time()
-            
-            if self._times_overlap(start_time, end_time, apt.appointment_time, apt_end_time):
-                return False
-        
-        return True
+        return not any(
+            self._times_overlap(start_time, end_time, busy_start, busy_end)
+            for busy_start, busy_end in self._busy_intervals(date, exclude_appointment_id)
+        )
     
     def find_available_slots(self, date: datetime.date, duration_minutes: int = 60) -> List[Dict]:
         """Find available time slots for a given date"""
         available_slots = []
+        busy = self._busy_intervals(date)
         
         # Office hours (customize as needed)
         office_start = time(8, 0)
@@ -134,7 +176,9 @@ class AppointmentService:
         end_time = datetime.combine(date, office_end)
         
         while current_time + timedelta(minutes=duration_minutes) <= end_time:
-            if self.is_slot_available(date, current_time.time(), duration_minutes):
+            slot_start = current_time.time()
+            slot_end = (current_time + timedelta(minutes=duration_minutes)).time()
+            if not any(self._times_overlap(slot_start, slot_end, b_start, b_end) for b_start, b_end in busy):
                 available_slots.append({
                     'time': current_time.time().isoformat(),
                     'duration': duration_minutes
@@ -171,16 +215,271 @@ class AppointmentService:
     
     def get_daily_statistics(self, date: datetime.date) -> Dict:
         """Get statistics for a specific day"""
-        appointments = self.get_appointments_by_date(date)
+        return dict(self.get_calendar_summary(date, date)[date.isoformat()])
+    
+    def get_calendar_summary(self, start_date: datetime.date, end_date: datetime.date) -> Dict[str, Dict]:
+        """Get per-day status counts and booked minutes for a date range (at most MAX_SUMMARY_DAYS)"""
+        if (end_date - start_date).days >= MAX_SUMMARY_DAYS:
+            raise ValueError(f"Le résumé du calendrier couvre au plus {MAX_SUMMARY_DAYS} jours")
         
-        return {
-            'total_appointments': len(appointments),
-            'scheduled': len([a for a in appointments if a.status == 'scheduled']),
-            'completed': len([a for a in appointments if a.status == 'completed']),
-            'cancelled': len([a for a in appointments if a.status == 'cancelled']),
-            'no_show': len([a for a in appointments if a.status == 'no_show']),
-            'total_duration_minutes': sum(a.duration_minutes for a in appointments)
-        }
+        days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+        
+        summaries = {}
+        missing = []
+        for day in days:
+            cached = self._day_summaries.get(day)
+            if cached is not None:
+                summaries[day] = cached
+            else:
+                missing.append(day)
+        
+        if missing:
+            generation = self._summary_generation
+            fresh = {day: self._empty_summary() for day in missing}
+            
+            rows = db.session.query(
+                Appointment.appointment_date,
+                Appointment.status,
+                func.count(Appointment.id),
+                func.coalesce(func.sum(Appointment.duration_minutes), 0)
+            ).filter(
+                Appointment.appointment_date >= missing[0],
+                Appointment.appointment_date <= missing[-1],
+                Appointment.patient_id.notin_(Patient.deleted_ids())
+            ).group_by(Appointment.appointment_date, Appointment.status).all()
+            
+            for day, status, count, minutes in rows:
+                summary = fresh.get(day)
+                if summary is None:
+                    continue
+                summary['total_appointments'] += count
+                summary['total_duration_minutes'] += minutes
+                if status in SUMMARY_STATUSES:
+                    summary[status] += count
+            
+            for series, day in self._series_occurrences(missing[0], missing[-1]):
+                summary = fresh.get(day)
+                if summary is None:
+                    continue
+                summary['total_appointments'] += 1
+                summary['scheduled'] += 1
+                summary['total_duration_minutes'] += series.duration_minutes or 0
+            
+            # Only cache if no appointment was written while we were querying
+            if generation == self._summary_generation:
+                for day, summary in fresh.items():
+                    self._day_summaries.set(day, summary)
+            summaries.update(fresh)
+        
+        return {day.isoformat(): summaries[day] for day in days}
+    
+    def create_series(self, data: Dict) -> AppointmentSeries:
+        """Create a recurring appointment series (a single row, whatever its length)"""
+        rule = self._parse_rrule(data.get('rrule', ''))
+        until = rule.get('UNTIL', data.get('until_date'))
+        count = rule.get('COUNT', data.get('occurrence_count'))
+        
+        series = AppointmentSeries(
+            id=str(uuid.uuid4()),
+            patient_id=data['patient_id'],
+            start_date=datetime.fromisoformat(data['start_date']).date(),
+            appointment_time=datetime.fromisoformat(data['appointment_time']).time(),
+            duration_minutes=data.get('duration_minutes', 60),
+            treatment_type=data.get('treatment_type'),
+            doctor=data.get('doctor', 'Dr.'),
+            room=data.get('room'),
+            notes=data.get('notes'),
+            treatment_plan_id=data.get('treatment_plan_id'),
+            frequency=rule.get('FREQ', data.get('frequency', 'WEEKLY')).upper(),
+            interval=int(rule.get('INTERVAL', data.get('interval', 1))),
+            occurrence_count=int(count) if count else None,
+            until_date=datetime.fromisoformat(until).date() if until else None,
+            status='active'
+        )
+        
+        if series.frequency not in AppointmentSeries.FREQUENCIES:
+            raise ValueError(f"Fréquence non supportée: {series.frequency}")
+        if series.interval < 1:
+            raise ValueError("L'intervalle doit être positif")
+        
+        series.last_date = series.compute_last_date()
+        
+        db.session.add(series)
+        db.session.commit()
+        self._invalidate_summaries()
+        return series
+    
+    def get_series(self, series_id: str) -> Optional[AppointmentSeries]:
+        """Get an appointment series by ID"""
+        return AppointmentSeries.query.get(series_id)
+    
+    def cancel_series(self, series_id: str) -> Optional[AppointmentSeries]:
+        """Stop a series from today on; past and materialized occurrences are kept"""
+        series = self.get_series(series_id)
+        if not series:
+            return None
+        
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        series.until_date = min(series.until_date or yesterday, yesterday)
+        series.last_date = series.compute_last_date()
+        series.status = 'cancelled'
+        series.updated_at = datetime.utcnow()
+        db.session.commit()
+        self._invalidate_summaries()
+        return series
+    
+    def expand_series(self, start_date: datetime.date, end_date: datetime.date) -> List[Dict]:
+        """Serialize the virtual series occurrences within a date range"""
+        return [
+            series.occurrence_dict(day, series.patient.full_name if series.patient else None)
+            for series, day in self._series_occurrences(start_date, end_date, with_patient=True)
+        ]
+    
+    def get_occurrence(self, occurrence_id: str) -> Optional[Dict]:
+        """Serialize a single virtual occurrence by its '<series_id>:<date>' ID"""
+        occurrence = self._parse_occurrence_id(occurrence_id)
+        if not occurrence:
+            return None
+        
+        day = occurrence[1]
+        for series, occurrence_day in self._series_occurrences(day, day, with_patient=True):
+            if series.id == occurrence[0]:
+                return series.occurrence_dict(day, series.patient.full_name if series.patient else None)
+        return None
+    
+    def _series_occurrences(self, start_date: datetime.date, end_date: datetime.date,
+                            with_patient: bool = False) -> List[Tuple[AppointmentSeries, datetime.date]]:
+        """Expand series over a window, skipping occurrences materialized as rows"""
+        query = AppointmentSeries.query.filter(
+            AppointmentSeries.status.in_(EXPANDED_SERIES_STATUSES),
+            AppointmentSeries.start_date <= end_date,
+            or_(AppointmentSeries.last_date.is_(None), AppointmentSeries.last_date >= start_date),
+            AppointmentSeries.patient_id.notin_(Patient.deleted_ids())
+        )
+        if with_patient:
+            query = query.options(
+                joinedload(AppointmentSeries.patient).load_only(Patient.first_name, Patient.last_name)
+            )
+        
+        series_list = query.all()
+        if not series_list:
+            return []
+        
+        materialized = set(db.session.query(Appointment.series_id, Appointment.series_date).filter(
+            Appointment.series_id.in_([series.id for series in series_list]),
+            Appointment.series_date >= start_date,
+            Appointment.series_date <= end_date
+        ).all())
+        
+        return [
+            (series, day)
+            for series in series_list
+            for day in series.occurrence_dates(start_date, end_date)
+            if (series.id, day) not in materialized
+        ]
+    
+    def _resolve_appointment(self, appointment_id: str) -> Optional[Appointment]:
+        """Get an appointment, materializing a virtual series occurrence (uncommitted)"""
+        occurrence = self._parse_occurrence_id(appointment_id)
+        if not occurrence:
+            return self.get_appointment(appointment_id)
+        
+        series_id, day = occurrence
+        existing = Appointment.query.filter_by(series_id=series_id, series_date=day).first()
+        if existing:
+            return existing
+        
+        series = self.get_series(series_id)
+        if (not series or series.status not in EXPANDED_SERIES_STATUSES
+                or day not in series.occurrence_dates(day, day)):
+            return None
+        
+        appointment = Appointment(
+            id=str(uuid.uuid4()),
+            patient_id=series.patient_id,
+            appointment_date=day,
+            appointment_time=series.appointment_time,
+            duration_minutes=series.duration_minutes,
+            treatment_type=series.treatment_type,
+            status='scheduled',
+            doctor=series.doctor,
+            room=series.room,
+            notes=series.notes,
+            treatment_plan_id=series.treatment_plan_id,
+            series_id=series.id,
+            series_date=day
+        )
+        db.session.add(appointment)
+        return appointment
+    
+    def _parse_occurrence_id(self, appointment_id: str) -> Optional[Tuple[str, datetime.date]]:
+        """Split a virtual occurrence ID '<series_id>:<YYYY-MM-DD>'"""
+        series_id, separator, day = appointment_id.rpartition(':')
+        if not separator:
+            return None
+        try:
+            return series_id, datetime.fromisoformat(day).date()
+        except ValueError:
+            return None
+    
+    def _parse_rrule(self, rrule: str) -> Dict:
+        """Parse the FREQ/INTERVAL/COUNT/UNTIL subset of an RFC 5545 RRULE"""
+        rule = {}
+        for part in filter(None, rrule.upper().replace('RRULE:', '').split(';')):
+            key, _, value = part.partition('=')
+            if key not in ('FREQ', 'INTERVAL', 'COUNT', 'UNTIL'):
+                raise ValueError(f"Règle de récurrence non supportée: {part}")
+            rule[key] = value
+        
+        if 'UNTIL' in rule:
+            rule['UNTIL'] = datetime.strptime(rule['UNTIL'][:8], '%Y%m%d').date().isoformat()
+        return rule
+    
+    def _busy_intervals(self, date: datetime.date,
+                        exclude_appointment_id: Optional[str] = None) -> List[Tuple[time, time]]:
+        """Blocked and booked (start, end) times on a date, series occurrences included"""
+        busy = [
+            (block.start_time, block.end_time)
+            for block in ScheduleBlock.query.filter_by(block_date=date).all()
+        ]
+        
+        # Only the columns needed for the overlap test
+        appointments = db.session.query(
+            Appointment.id, Appointment.appointment_time, Appointment.duration_minutes
+        ).filter(
+            Appointment.appointment_date == date, Appointment.patient_id.notin_(Patient.deleted_ids())
+        ).all()
+        occurrences = [
+            (series.occurrence_id(day), series.appointment_time, series.duration_minutes)
+            for series, day in self._series_occurrences(date, date)
+        ]
+        
+        for apt_id, apt_time, apt_duration in appointments + occurrences:
+            if exclude_appointment_id and apt_id == exclude_appointment_id:
+                continue
+            apt_end_time = (datetime.combine(date, apt_time) + timedelta(minutes=apt_duration)).time()
+            busy.append((apt_time, apt_end_time))
+        
+        return busy
+    
+    def _empty_summary(self) -> Dict:
+        """Zeroed statistics for a day without appointments"""
+        summary = {'total_appointments': 0}
+        summary.update({status: 0 for status in SUMMARY_STATUSES})
+        summary['total_duration_minutes'] = 0
+        return summary
+    
+    def invalidate_calendar_cache(self):
+        """Drop all cached day summaries (after bulk writes made outside this service)"""
+        self._invalidate_summaries()
+    
+    def _invalidate_summaries(self, *dates: datetime.date):
+        """Drop cached day summaries after an appointment write (all of them if no dates)"""
+        self._summary_generation += 1
+        if not dates:
+            self._day_summaries.clear()
+        for day in dates:
+            self._day_summaries.delete(day)
     
     def _times_overlap(self, start1: time, end1: time, start2: time, end2: time) -> bool:
         """Check if two time ranges overlap"""
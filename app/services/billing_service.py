@@ -0,0 +1,247 @@
+import re
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import bindparam, func
+from app import db
+from app.models import Appointment, DentalPricing, Patient
+from app.services.change_feed_service import record_bulk_changes
+from app.utils.normalizers import fold_text
+
+logger = logging.getLogger(__name__)
+
+# A TARMED code typed into the treatment type, e.g. "4.0210 Détartrage"
+TARMED_CODE = re.compile(r'\b\d\.\d{4}\b')
+
+# Billing runs whose status stays available after they finish
+MAX_KEPT_RUNS = 50
+
+class PricingIndex:
+    """In-memory lookup of active pricing from an appointment's treatment type.
+    
+    Resolution order: a TARMED code in the text, the exact description, the
+    exact category (lowest code of the category), then the first description
+    starting with the text. Accents and case are ignored.
+    """
+    
+    def __init__(self, pricings: List[DentalPricing]):
+        self.by_code = {}
+        self.by_description = {}
+        self.by_category = {}
+        self._descriptions = []
+        for pricing in sorted(pricings, key=lambda p: p.tarmed_code):
+            description = fold_text(pricing.description_fr)
+            self.by_code[pricing.tarmed_code] = pricing
+            self.by_description.setdefault(description, pricing)
+            self.by_category.setdefault(fold_text(pricing.category), pricing)
+            self._descriptions.append((description, pricing))
+        self._resolved = {}
+    
+    def resolve(self, treatment_type: Optional[str]) -> Optional[DentalPricing]:
+        if not treatment_type:
+            return None
+        if treatment_type in self._resolved:
+            return self._resolved[treatment_type]
+        
+        match = TARMED_CODE.search(treatment_type)
+        pricing = self.by_code.get(match.group()) if match else None
+        name = fold_text(treatment_type)
+        if pricing is None and name:
+            pricing = (
+                self.by_description.get(name)
+                or self.by_category.get(name)
+                or next((p for description, p in self._descriptions if description.startswith(name)), None)
+            )
+        
+        self._resolved[treatment_type] = pricing
+        return pricing
+
+class BillingService:
+    """Invoices completed appointments.
+    
+    A run scans completed appointments without an invoice in a date range,
+    prices them from an in-memory TARMED index and bills each patient once.
+    Patients are processed in chunks: each chunk's invoices are inserted in
+    bulk and its appointments stamped with their invoice_id in the same
+    transaction. Stamped appointments are never billed again, so a run that
+    stopped midway is resumed by starting it again.
+    """
+    
+    def __init__(self, financial_service, chunk_size: int = 200):
+        self.financial_service = financial_service
+        self.chunk_size = chunk_size
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def start_run(self, app, start_date: date, end_date: date, dry_run: bool = False) -> Dict:
+        """Start a run in a background thread; returns its initial status"""
+        run = {
+            'id': str(uuid.uuid4()),
+            'status': 'running',
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'dry_run': dry_run,
+            'started_at': datetime.utcnow().isoformat(),
+            'finished_at': None,
+            'report': None,
+            'error': None
+        }
+        with self._lock:
+            self._runs[run['id']] = run
+            while len(self._runs) > MAX_KEPT_RUNS:
+                self._runs.popitem(last=False)
+        
+        thread = threading.Thread(
+            target=self._run_in_background, args=(app, run['id'], start_date, end_date, dry_run),
+            name='billing-run', daemon=True
+        )
+        thread.start()
+        return self.get_run(run['id'])
+    
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Status and progress report of a background run"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            return dict(run) if run else None
+    
+    def run(self, start_date: date, end_date: date, dry_run: bool = False,
+            progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Bill every completed, unbilled appointment between start_date and end_date"""
+        if start_date > end_date:
+            raise ValueError("La date de début doit précéder la date de fin")
+        
+        report = {
+            'patients': 0, 'appointments': 0, 'billed_appointments': 0,
+            'invoices': 0, 'total_amount': Decimal('0.00'), 'unpriced': {}, 'errors': []
+        }
+        index = PricingIndex(DentalPricing.query.filter_by(active=True).all())
+        unbilled = (
+            Appointment.status == 'completed',
+            Appointment.invoice_id.is_(None),
+            Appointment.appointment_date.between(start_date, end_date),
+            Patient.deleted_at.is_(None)
+        )
+        
+        patient_ids = [row[0] for row in db.session.query(Appointment.patient_id).join(
+            Patient, Patient.id == Appointment.patient_id
+        ).filter(*unbilled).distinct().order_by(Appointment.patient_id)]
+        notes = f"Rendez-vous du {start_date:%d.%m.%Y} au {end_date:%d.%m.%Y}"
+        
+        for start in range(0, len(patient_ids), self.chunk_size):
+            chunk = patient_ids[start:start + self.chunk_size]
+            rows = db.session.query(
+                Appointment.id, Appointment.patient_id, Appointment.appointment_date, Appointment.treatment_type
+            ).join(Patient, Patient.id == Appointment.patient_id).filter(
+                *unbilled, Appointment.patient_id.in_(chunk)
+            ).order_by(Appointment.patient_id, Appointment.appointment_date, Appointment.appointment_time).all()
+            
+            self._bill_chunk(rows, index, notes, report, dry_run)
+            report['patients'] += len(chunk)
+            if progress:
+                progress(report)
+        
+        logger.info(f"Billing run {start_date} - {end_date}{' [dry run]' if dry_run else ''}: "
+                    f"{report['invoices']} invoices for {report['billed_appointments']} appointments, "
+                    f"{sum(report['unpriced'].values())} without pricing")
+        return report
+    
+    def _bill_chunk(self, rows, index: PricingIndex, notes: str, report: Dict, dry_run: bool):
+        entries = OrderedDict()
+        for appointment_id, patient_id, appointment_date, treatment_type in rows:
+            report['appointments'] += 1
+            pricing = index.resolve(treatment_type)
+            if pricing is None:
+                key = treatment_type or ''
+                report['unpriced'][key] = report['unpriced'].get(key, 0) + 1
+                continue
+            
+            entry = entries.setdefault(patient_id, {
+                'patient_id': patient_id, 'items': [], 'notes': notes, 'appointment_ids': []
+            })
+            entry['items'].append({
+                'description': f"{pricing.description_fr} ({appointment_date:%d.%m.%Y})",
+                'tarmed_code': pricing.tarmed_code,
+                'quantity': 1,
+                'unit_price': pricing.base_price
+            })
+            entry['appointment_ids'].append(appointment_id)
+        
+        batch = list(entries.values())
+        if not batch:
+            return
+        
+        if dry_run:
+            for entry in batch:
+                report['invoices'] += 1
+                report['billed_appointments'] += len(entry['appointment_ids'])
+                report['total_amount'] += self.financial_service.calculate_totals(entry['items'])['total_amount']
+            return
+        
+        try:
+            results = self.financial_service.create_invoices(batch, commit=False)
+            stamps = []
+            created = []
+            for entry, result in zip(batch, results):
+                if result['status'] != 'created':
+                    report['errors'].append({'patient_id': entry['patient_id'], 'message': result['message']})
+                    continue
+                
+                created.append(result)
+                stamps.extend({'appointment_id': appointment_id, 'stamp': result['invoice_id']}
+                              for appointment_id in entry['appointment_ids'])
+            
+            if stamps:
+                # One executemany; rows billed meanwhile by a concurrent run are left alone...
+                table = Appointment.__table__
+                db.session.execute(
+                    table.update().where(
+                        table.c.id == bindparam('appointment_id'), table.c.invoice_id.is_(None)
+                    ).values(invoice_id=bindparam('stamp'), updated_at=datetime.utcnow()),
+                    stamps
+                )
+                
+                # ...and make the whole chunk roll back
+                stamped = db.session.query(func.count(Appointment.id)).filter(
+                    Appointment.invoice_id.in_([result['invoice_id'] for result in created])
+                ).scalar()
+                if stamped != len(stamps):
+                    raise RuntimeError("Rendez-vous déjà facturés par une autre exécution")
+                
+                for result, entry in zip(results, batch):
+                    if result['status'] == 'created':
+                        record_bulk_changes(db.session, Appointment, entry['appointment_ids'], 'updated',
+                                            {'invoice_id': result['invoice_id']})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        report['invoices'] += len(created)
+        report['billed_appointments'] += len(stamps)
+        report['total_amount'] += sum(result['total_amount'] for result in created)
+    
+    def _run_in_background(self, app, run_id: str, start_date: date, end_date: date, dry_run: bool):
+        def progress(report):
+            with self._lock:
+                if run_id in self._runs:
+                    self._runs[run_id]['report'] = {**report, 'unpriced': dict(report['unpriced']),
+                                                    'errors': list(report['errors'])}
+        
+        with app.app_context():
+            try:
+                report = self.run(start_date, end_date, dry_run=dry_run, progress=progress)
+                progress(report)
+                status, error = 'completed', None
+            except Exception as e:
+                logger.error(f"Billing run {run_id} failed: {str(e)}", exc_info=True)
+                status, error = 'failed', str(e)
+            finally:
+                db.session.remove()
+        
+        with self._lock:
+            if run_id in self._runs:
+                self._runs[run_id].update(status=status, error=error, finished_at=datetime.utcnow().isoformat())
@@ -0,0 +1,242 @@
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Optional
+from sqlalchemy import event, inspect
+from app import db
+from app.models import Appointment, AppointmentSeries, ScheduleBlock, ScheduleChange
+
+logger = logging.getLogger(__name__)
+
+# Models whose writes are published, and the name clients see them under
+TRACKED_ENTITIES = {
+    Appointment: 'appointment',
+    AppointmentSeries: 'series',
+    ScheduleBlock: 'schedule_block',
+}
+
+class ChangeFeedService:
+    """Publishes compact schedule change events to subscribed clients.
+    
+    Events are captured from the ORM flush, so every ORM write path is
+    covered, and published once the transaction commits; Core bulk writes
+    report theirs with record_bulk_changes. With the 'memory' backend
+    events live in a ring buffer local to the worker; with the 'database'
+    backend they are journaled in schedule_changes in the same transaction,
+    so every worker can serve every change.
+    """
+    
+    def __init__(self, backend: str = 'memory', buffer_size: int = 1000,
+                 poll_interval: float = 1.0, retention_hours: int = 24):
+        if backend not in ('memory', 'database'):
+            raise ValueError(f"Unknown change feed backend: {backend}")
+        
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.retention_hours = retention_hours
+        self._events = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._commits_since_prune = 0
+        self._condition = threading.Condition()
+    
+    def register(self):
+        """Attach the flush/commit hooks to the application session"""
+        for name, listener in (('after_flush', _collect_changes),
+                               ('after_commit', _publish_changes),
+                               ('after_soft_rollback', _discard_changes)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+    
+    def latest_id(self) -> int:
+        """ID of the most recent event, used as the starting point of a new subscriber"""
+        if self.backend == 'database':
+            return db.session.query(db.func.max(ScheduleChange.id)).scalar() or 0
+        return self._last_id
+    
+    def has_gap(self, after_id: int) -> bool:
+        """True if events after after_id were dropped (buffer overflow, pruning or restart)"""
+        if self.backend == 'database':
+            oldest, latest = db.session.query(
+                db.func.min(ScheduleChange.id), db.func.max(ScheduleChange.id)
+            ).one()
+        else:
+            with self._condition:
+                oldest = self._events[0]['id'] if self._events else None
+                latest = self._last_id
+        
+        return after_id > (latest or 0) or (oldest is not None and after_id < oldest - 1)
+    
+    def get_events(self, after_id: int, limit: int = 500) -> List[Dict]:
+        """Events newer than after_id, oldest first"""
+        if self.backend == 'database':
+            changes = ScheduleChange.query.filter(ScheduleChange.id > after_id).order_by(
+                ScheduleChange.id
+            ).limit(limit).all()
+            return [change.to_dict() for change in changes]
+        
+        with self._condition:
+            return [e for e in self._events if e['id'] > after_id][:limit]
+    
+    def wait_for_events(self, after_id: int, timeout: float = 15.0) -> List[Dict]:
+        """Block until events newer than after_id exist or the timeout expires"""
+        deadline = datetime.utcnow() + timedelta(seconds=timeout)
+        
+        if self.backend == 'memory':
+            with self._condition:
+                while True:
+                    events = [e for e in self._events if e['id'] > after_id]
+                    remaining = (deadline - datetime.utcnow()).total_seconds()
+                    if events or remaining <= 0:
+                        return events
+                    self._condition.wait(remaining)
+        
+        while True:
+            events = self.get_events(after_id)
+            remaining = (deadline - datetime.utcnow()).total_seconds()
+            if events or remaining <= 0:
+                return events
+            
+            # End the read transaction so the next poll sees other workers' commits
+            db.session.rollback()
+            
+            # Local commits wake us immediately; other workers are picked up by polling
+            with self._condition:
+                self._condition.wait(min(remaining, self.poll_interval))
+    
+    def publish(self, events: List[Dict]):
+        """Make committed events visible to subscribers"""
+        with self._condition:
+            if self.backend == 'memory':
+                for e in events:
+                    self._last_id += 1
+                    e['id'] = self._last_id
+                    self._events.append(e)
+            self._condition.notify_all()
+        
+        if self.backend == 'database':
+            self._commits_since_prune += 1
+            if self._commits_since_prune >= 500:
+                self._commits_since_prune = 0
+                self.prune()
+    
+    def prune(self) -> int:
+        """Delete journaled events older than the retention window"""
+        if self.backend != 'database':
+            return 0
+        
+        cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                ScheduleChange.__table__.delete().where(ScheduleChange.created_at < cutoff)
+            )
+        
+        logger.info(f"Pruned {result.rowcount} schedule changes older than {cutoff}")
+        return result.rowcount
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+def _describe(obj, entity: str, action: str) -> Optional[Dict]:
+    """Turn a flushed object into a compact change event (None if nothing relevant changed)"""
+    event_data = {'entity': entity, 'entity_id': obj.id, 'action': action, 'changes': {}}
+    state = inspect(obj)
+    columns = [attr.key for attr in state.mapper.column_attrs]
+    
+    if action == 'deleted':
+        return event_data
+    
+    if action == 'created':
+        event_data['changes'] = {
+            key: _serialize(getattr(obj, key)) for key in columns
+            if key not in ('notes', 'created_at', 'updated_at')
+        }
+        return event_data
+    
+    for key in columns:
+        if key == 'updated_at':
+            continue
+        history = state.attrs[key].history
+        if history.has_changes():
+            event_data['changes'][key] = _serialize(history.added[0] if history.added else None)
+    
+    if not event_data['changes']:
+        return None
+    
+    changed = event_data['changes'].keys()
+    if {'appointment_date', 'appointment_time', 'block_date', 'start_time', 'end_time'} & changed:
+        event_data['action'] = 'moved'
+    elif 'status' in changed:
+        event_data['action'] = 'status_changed'
+    return event_data
+
+def _collect_changes(session, flush_context):
+    """after_flush: record events for tracked objects (history is still available here)"""
+    events = []
+    for action, objects in (('created', session.new), ('updated', session.dirty),
+                            ('deleted', session.deleted)):
+        for obj in objects:
+            entity = TRACKED_ENTITIES.get(type(obj))
+            described = _describe(obj, entity, action) if entity else None
+            if described:
+                events.append(described)
+    
+    _record(session, events)
+
+def record_bulk_changes(session, model, entity_ids: List[str], action: str, changes: Optional[Dict] = None):
+    """Record events for rows written with Core statements, which the flush hooks never see.
+    
+    Call it in the transaction of the write; the events are published on its
+    commit like any other. changes applies to every row.
+    """
+    entity = TRACKED_ENTITIES[model]
+    _record(session, [
+        {'entity': entity, 'entity_id': entity_id, 'action': action,
+         'changes': {key: _serialize(value) for key, value in (changes or {}).items()}}
+        for entity_id in entity_ids
+    ])
+
+def _record(session, events: List[Dict]):
+    """Journal events in the current transaction (database backend) and queue them for the commit"""
+    if not events:
+        return
+    
+    from app.services import change_feed_service
+    if change_feed_service is not None and change_feed_service.backend == 'database':
+        now = datetime.utcnow()
+        session.connection().execute(ScheduleChange.__table__.insert(), [
+            {
+                'entity': e['entity'],
+                'entity_id': e['entity_id'],
+                'action': e['action'],
+                'payload': json.dumps(e['changes']),
+                'created_at': now
+            }
+            for e in events
+        ])
+    
+    session.info.setdefault('schedule_changes', []).extend(events)
+
+def _publish_changes(session):
+    """after_commit: hand the transaction's events to the broker"""
+    events = session.info.pop('schedule_changes', None)
+    if not events:
+        return
+    
+    from app.services import change_feed_service
+    if change_feed_service is None:
+        return
+    
+    now = datetime.utcnow().isoformat()
+    for e in events:
+        e.setdefault('created_at', now)
+    change_feed_service.publish(events)
+
+def _discard_changes(session, previous_transaction):
+    """after_soft_rollback: events of a rolled back transaction are never published"""
+    if not session.in_transaction():
+        session.info.pop('schedule_changes', None)
@@ -0,0 +1,100 @@
+import re
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Invoice, Devis, DocumentSequence
+
+logger = logging.getLogger(__name__)
+
+# Numbered document series: the column holding the number and its per-year prefix
+SEQUENCES = {
+    'invoice': (Invoice.invoice_number, '{year}-'),
+    'devis': (Devis.devis_number, 'D{year}-'),
+}
+
+class DocumentSequenceService:
+    """Allocates invoice and devis numbers from one counter row per series and year.
+    
+    With block_size=1 (the default) the counter is incremented in the
+    caller's transaction: the row lock serializes concurrent creations until
+    commit and a rollback gives the number back, so numbers stay gapless.
+    With a larger block_size each worker reserves that many numbers at once
+    in its own transaction, which removes the contention at the cost of gaps
+    (unused numbers of a block are lost when the worker restarts) and of
+    numbers no longer following creation order across workers.
+    """
+    
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(1, block_size)
+        self._blocks = {}
+        self._lock = threading.Lock()
+    
+    def next_number(self, name: str, year: Optional[int] = None) -> str:
+        """Next formatted number of a series, e.g. '2025-0042'"""
+        return self.allocate(name, 1, year)[0]
+    
+    def allocate(self, name: str, count: int, year: Optional[int] = None) -> List[str]:
+        """Reserve count consecutive numbers of a series"""
+        if name not in SEQUENCES:
+            raise ValueError(f"Unknown document sequence: {name}")
+        
+        year = year or datetime.utcnow().year
+        if self.block_size > 1:
+            values = self._take_from_block(name, year, count)
+        else:
+            last = self._increment(db.session, name, year, count)
+            values = range(last - count + 1, last + 1)
+        
+        prefix = SEQUENCES[name][1].format(year=year)
+        return [f"{prefix}{value:04d}" for value in values]
+    
+    def _take_from_block(self, name: str, year: int, count: int) -> range:
+        with self._lock:
+            block = self._blocks.get((name, year))
+            if block is None or block.stop - block.start < count:
+                size = max(count, self.block_size)
+                with db.engine.begin() as connection:
+                    last = self._increment(connection, name, year, size)
+                block = range(last - size + 1, last + 1)
+            
+            self._blocks[(name, year)] = block[count:]
+            return block[:count]
+    
+    def _increment(self, executor, name: str, year: int, count: int) -> int:
+        """Atomically add count to the counter (a session or a connection); returns the new last value"""
+        table = DocumentSequence.__table__
+        criteria = (table.c.name == name, table.c.year == year)
+        increment = table.update().where(*criteria).values(last_value=table.c.last_value + count)
+        
+        if not executor.execute(increment).rowcount:
+            self._create(executor, name, year)
+            executor.execute(increment)
+        
+        # The UPDATE holds the row lock until commit, so this reads our own increment
+        return executor.execute(select(table.c.last_value).where(*criteria)).scalar()
+    
+    def _create(self, executor, name: str, year: int):
+        """Start a year's counter after the highest number already issued"""
+        column, prefix = SEQUENCES[name]
+        prefix = prefix.format(year=year)
+        
+        last_value = 0
+        for (number,) in executor.execute(select(column).where(column.like(f"{prefix}%"))):
+            match = re.fullmatch(r'\d+', number[len(prefix):])
+            if match:
+                last_value = max(last_value, int(match.group()))
+        
+        try:
+            with executor.begin_nested():
+                executor.execute(DocumentSequence.__table__.insert().values(
+                    name=name, year=year, last_value=last_value
+                ))
+        except IntegrityError:
+            # Created meanwhile by a concurrent transaction
+            pass
+        
+        logger.info(f"Started {name} numbering for {year} after {last_value}")
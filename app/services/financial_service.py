@@ -1,26 +1,54 @@
 import uuid
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, List, Dict, Optional
 from app import db
-from sqlalchemy import or_
+from sqlalchemy import and_, case, func, literal, literal_column, or_, select, type_coerce, union_all
+from sqlalchemy.orm import joinedload
 from app.models import (
     Invoice, InvoiceItem, Payment, Devis, DevisItem, 
-    PaymentPlan, ScheduledPayment, DentalPricing
+    PaymentPlan, ScheduledPayment, DentalPricing, Patient, RevenueRollup, Appointment, Money
+)
+from app.services.document_sequence_service import DocumentSequenceService
+from app.services.tax_service import TaxService, stored_breakdown
+from app.utils.cache import LRUCache, detached_copy, request_cached
+from app.utils.money import split_amount, to_money
+
+# Longest revenue forecast, in months
+MAX_FORECAST_MONTHS = 24
+
+# Most invoices accepted by one batch billing request
+MAX_BATCH_INVOICES = 2000
+
+# Invoices with a balance left to collect
+OUTSTANDING_STATUSES = ('pending', 'partial', 'overdue')
+
+# Receivables aging buckets: (key, first and last day past due); None is open-ended
+AGING_BUCKETS = (
+    ('current', None, 0),
+    ('days_1_30', 1, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
 )
 
 class FinancialService:
     """Service for managing financial operations"""
     
+    def __init__(self, sequence_service=None, rollup_service=None, tax_service=None,
+                 pricing_cache_ttl: int = 300):
+        self.sequence_service = sequence_service or DocumentSequenceService()
+        self.rollup_service = rollup_service
+        self.tax_service = tax_service or TaxService()
+        
+        # Pricing rows change rarely: keep detached copies per worker
+        self._pricing_cache = LRUCache(models=(DentalPricing,), ttl_seconds=pricing_cache_ttl)
+    
     def create_invoice(self, patient_id: str, items: List[Dict], notes: Optional[str] = None) -> Invoice:
         """Create a new invoice with items"""
         # Generate invoice number
         invoice_number = self._generate_invoice_number()
         
-        # Calculate totals
-        subtotal = sum(item['quantity'] * item['unit_price'] for item in items)
-        tax_amount = subtotal * 0.077  # Swiss VAT 7.7%
-        total_amount = subtotal + tax_amount
-        
         # Create invoice
         invoice = Invoice(
             id=str(uuid.uuid4()),
@@ -28,42 +56,100 @@ class FinancialService:
             patient_id=patient_id,
             issue_date=datetime.utcnow().date(),
             due_date=(datetime.utcnow() + timedelta(days=30)).date(),
-            subtotal=subtotal,
-            tax_amount=tax_amount,
-            total_amount=total_amount,
+            **self.calculate_totals(items),
             status='pending',
             notes=notes
         )
         
         db.session.add(invoice)
+        db.session.flush()
         
-        # Add invoice items
-        for item in items:
-            invoice_item = InvoiceItem(
-                id=str(uuid.uuid4()),
-                invoice_id=invoice.id,
-                description=item['description'],
-                tarmed_code=item.get('tarmed_code'),
-                quantity=item['quantity'],
-                unit_price=item['unit_price'],
-                total_price=item['quantity'] * item['unit_price']
-            )
-            db.session.add(invoice_item)
+        # Add invoice items in one batched INSERT
+        db.session.bulk_insert_mappings(InvoiceItem, self._item_rows(items, invoice_id=invoice.id))
         
         db.session.commit()
         return invoice
     
+    def create_invoices(self, batch: List[Dict], commit: bool = True) -> List[Dict]:
+        """Create many invoices in one transaction; returns one result per entry, in order.
+        
+        Each entry is {'patient_id', 'items', 'notes'}. Invalid entries are
+        reported and skipped; the others are numbered from one block and
+        inserted with one bulk INSERT for headers and one for items. With
+        commit=False the caller completes (or rolls back) the transaction.
+        """
+        if len(batch) > MAX_BATCH_INVOICES:
+            raise ValueError(f"Au plus {MAX_BATCH_INVOICES} factures par lot")
+        
+        patient_ids = {entry.get('patient_id') for entry in batch if isinstance(entry, dict)}
+        known = {
+            patient_id for (patient_id,) in db.session.query(Patient.id).filter(
+                Patient.id.in_([pid for pid in patient_ids if isinstance(pid, str)]),
+                Patient.deleted_at.is_(None)
+            )
+        }
+        
+        results = []
+        valid = []
+        for index, entry in enumerate(batch):
+            error = self._batch_entry_error(entry, known)
+            results.append({'index': index, 'status': 'error', 'message': error} if error else None)
+            if not error:
+                valid.append(index)
+        
+        if not valid:
+            return results
+        
+        now = datetime.utcnow()
+        invoice_rows = []
+        item_rows = []
+        numbers = self.sequence_service.allocate('invoice', len(valid))
+        for index, invoice_number in zip(valid, numbers):
+            entry = batch[index]
+            totals = self.calculate_totals(entry['items'])
+            invoice_id = str(uuid.uuid4())
+            invoice_rows.append({
+                'id': invoice_id,
+                'invoice_number': invoice_number,
+                'patient_id': entry['patient_id'],
+                'issue_date': now.date(),
+                'due_date': (now + timedelta(days=30)).date(),
+                **totals,
+                'paid_amount': Decimal('0.00'),
+                'status': 'pending',
+                'notes': entry.get('notes'),
+                'created_at': now,
+                'updated_at': now
+            })
+            item_rows.extend(self._item_rows(entry['items'], invoice_id=invoice_id))
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'invoice_id': invoice_id,
+                'invoice_number': invoice_number,
+                'total_amount': totals['total_amount']
+            }
+        
+        try:
+            db.session.bulk_insert_mappings(Invoice, invoice_rows)
+            db.session.bulk_insert_mappings(InvoiceItem, item_rows)
+            # Bulk inserts skip the flush hooks that maintain the revenue rollups
+            if self.rollup_service is not None:
+                self.rollup_service.add_rows(Invoice, invoice_rows)
+            if commit:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        return results
+    
     def create_devis(self, patient_id: str, items: List[Dict], 
                     treatment_plan_id: Optional[str] = None, notes: Optional[str] = None) -> Devis:
         """Create a new devis (quote)"""
         # Generate devis number
         devis_number = self._generate_devis_number()
         
-        # Calculate totals
-        subtotal = sum(item['quantity'] * item['unit_price'] for item in items)
-        tax_amount = subtotal * 0.077  # Swiss VAT 7.7%
-        total_amount = subtotal + tax_amount
-        
         # Create devis
         devis = Devis(
             id=str(uuid.uuid4()),
@@ -71,43 +157,34 @@ class FinancialService:
             patient_id=patient_id,
             issue_date=datetime.utcnow().date(),
             validity_date=(datetime.utcnow() + timedelta(days=30)).date(),
-            subtotal=subtotal,
-            tax_amount=tax_amount,
-            total_amount=total_amount,
+            **self.calculate_totals(items),
             status='draft',
             treatment_plan_id=treatment_plan_id,
             notes=notes
         )
         
         db.session.add(devis)
+        db.session.flush()
         
-        # Add devis items
-        for item in items:
-            devis_item = DevisItem(
-                id=str(uuid.uuid4()),
-                devis_id=devis.id,
-                description=item['description'],
-                tarmed_code=item.get('tarmed_code'),
-                quantity=item['quantity'],
-                unit_price=item['unit_price'],
-                total_price=item['quantity'] * item['unit_price']
-            )
-            db.session.add(devis_item)
+        # Add devis items in one batched INSERT
+        db.session.bulk_insert_mappings(DevisItem, self._item_rows(items, devis_id=devis.id))
         
         db.session.commit()
         return devis
     
-    def add_payment(self, invoice_id: str, amount: float, payment_method: str = 'cash',
-                   reference_number: Optional[str] = None, notes: Optional[str] = None) -> Payment:
-        """Add a payment to an invoice"""
+    def add_payment(self, invoice_id: str, amount, payment_method: str = 'cash',
+                   reference_number: Optional[str] = None, notes: Optional[str] = None,
+                   payment_date: Optional[date] = None) -> Payment:
+        """Add a payment to an invoice (dated today unless payment_date is given)"""
         invoice = Invoice.query.get(invoice_id)
         if not invoice:
             raise ValueError("Invoice not found")
         
+        amount = to_money(amount)
         payment = Payment(
             id=str(uuid.uuid4()),
             invoice_id=invoice_id,
-            payment_date=datetime.utcnow().date(),
+            payment_date=payment_date or datetime.utcnow().date(),
             amount=amount,
             payment_method=payment_method,
             reference_number=reference_number,
@@ -136,7 +213,7 @@ class FinancialService:
             raise ValueError("Invoice not found")
         
         remaining_balance = invoice.balance_due
-        installment_amount = remaining_balance / installments
+        installment_amounts = split_amount(remaining_balance, installments)
         
         # Create payment plan
         payment_plan = PaymentPlan(
@@ -158,7 +235,7 @@ class FinancialService:
                 id=str(uuid.uuid4()),
                 payment_plan_id=payment_plan.id,
                 due_date=due_date,
-                amount=installment_amount,
+                amount=installment_amounts[i],
                 status='pending'
             )
             db.session.add(scheduled_payment)
@@ -167,23 +244,28 @@ class FinancialService:
         return payment_plan
     
     def get_financial_dashboard(self, start_date: datetime.date, end_date: datetime.date) -> Dict:
-        """Get financial dashboard data"""
-        # Get invoices in date range
-        invoices = Invoice.query.filter(
-            Invoice.issue_date >= start_date,
-            Invoice.issue_date <= end_date
-        ).all()
-        
-        # Calculate metrics
-        total_revenue = sum(inv.total_amount for inv in invoices)
-        paid_revenue = sum(inv.paid_amount for inv in invoices)
-        pending_revenue = total_revenue - paid_revenue
-        
-        # Get payments in date range
-        payments = Payment.query.filter(
-            Payment.payment_date >= start_date,
-            Payment.payment_date <= end_date
-        ).all()
+        """Get financial dashboard data, summed from the daily revenue rollups"""
+        rows = db.session.query(
+            RevenueRollup.source, RevenueRollup.status, RevenueRollup.payment_method,
+            func.sum(RevenueRollup.count), func.sum(RevenueRollup.amount), func.sum(RevenueRollup.paid_amount)
+        ).filter(
+            RevenueRollup.source.in_(('invoice', 'payment')),
+            RevenueRollup.day >= start_date,
+            RevenueRollup.day <= end_date
+        ).group_by(RevenueRollup.source, RevenueRollup.status, RevenueRollup.payment_method).all()
+        
+        invoice_counts = {}
+        total_revenue = paid_revenue = 0
+        payment_rows = []
+        for source, status, payment_method, count, amount, paid_amount in rows:
+            if source == 'invoice':
+                invoice_counts[status] = invoice_counts.get(status, 0) + count
+                total_revenue += amount
+                paid_revenue += paid_amount
+            elif count:
+                payment_rows.append((payment_method, count, amount))
+        
+        by_method = self._group_payments_by_method(payment_rows)
         
         return {
             'period': {
@@ -193,45 +275,209 @@ class FinancialService:
             'revenue': {
                 'total': total_revenue,
                 'paid': paid_revenue,
-                'pending': pending_revenue
+                'pending': total_revenue - paid_revenue
             },
             'invoices': {
-                'total': len(invoices),
-                'paid': len([inv for inv in invoices if inv.status == 'paid']),
-                'pending': len([inv for inv in invoices if inv.status == 'pending']),
-                'partial': len([inv for inv in invoices if inv.status == 'partial'])
+                'total': sum(invoice_counts.values()),
+                'paid': invoice_counts.get('paid', 0),
+                'pending': invoice_counts.get('pending', 0),
+                'partial': invoice_counts.get('partial', 0)
             },
             'payments': {
-                'total': len(payments),
-                'total_amount': sum(p.amount for p in payments),
-                'by_method': self._group_payments_by_method(payments)
+                'total': sum(method['count'] for method in by_method.values()),
+                'total_amount': sum(method['amount'] for method in by_method.values()),
+                'by_method': by_method
             }
         }
     
     def get_revenue_forecast(self, months: int = 6) -> List[Dict]:
-        """Get revenue forecast based on scheduled payments"""
-        forecast = []
+        """Expected revenue per calendar month, starting with the current one, in a single query.
+        
+        Sources: pending scheduled payments (by due date), scheduled
+        appointments valued at their share of the plan's approved devis, and
+        approved devis with no appointment booked yet (by validity date;
+        expired ones are left out, invoiced ones are no longer approved).
+        Payments received are reported as realized revenue.
+        """
+        if not 1 <= months <= MAX_FORECAST_MONTHS:
+            raise ValueError(f"L'horizon de prévision doit être compris entre 1 et {MAX_FORECAST_MONTHS} mois")
+        
+        today = datetime.utcnow().date()
+        first_month = today.replace(day=1)
+        horizon_end = _add_months(first_month, months) - timedelta(days=1)
+        
+        # Approved quotes of each treatment plan, spread over its upcoming appointments
+        plan_devis = db.session.query(
+            Devis.treatment_plan_id.label('plan_id'), func.sum(Devis.total_amount).label('amount')
+        ).filter(Devis.status == 'approved', Devis.treatment_plan_id.isnot(None)).group_by(
+            Devis.treatment_plan_id
+        ).subquery()
+        plan_visits = db.session.query(
+            Appointment.treatment_plan_id.label('plan_id'), func.count(Appointment.id).label('visits')
+        ).filter(
+            Appointment.status == 'scheduled', Appointment.appointment_date >= today,
+            Appointment.treatment_plan_id.isnot(None)
+        ).group_by(Appointment.treatment_plan_id).subquery()
+        
+        devis_day = func.coalesce(Devis.validity_date, Devis.issue_date)
+        sources = union_all(
+            select(
+                literal('scheduled_payments'), ScheduledPayment.due_date,
+                func.count(ScheduledPayment.id), func.sum(ScheduledPayment.amount)
+            ).where(
+                ScheduledPayment.status == 'pending',
+                ScheduledPayment.due_date.between(first_month, horizon_end)
+            ).group_by(ScheduledPayment.due_date),
+            select(
+                literal('appointments'), Appointment.appointment_date, func.count(Appointment.id),
+                # Arithmetic on Money columns is typed as plain centimes
+                func.sum(func.coalesce(type_coerce(plan_devis.c.amount / plan_visits.c.visits, Money), 0))
+            ).select_from(Appointment).outerjoin(
+                plan_devis, plan_devis.c.plan_id == Appointment.treatment_plan_id
+            ).outerjoin(
+                plan_visits, plan_visits.c.plan_id == Appointment.treatment_plan_id
+            ).where(
+                Appointment.status == 'scheduled',
+                Appointment.appointment_date.between(today, horizon_end)
+            ).group_by(Appointment.appointment_date),
+            select(
+                literal('devis'), devis_day, func.count(Devis.id), func.sum(Devis.total_amount)
+            ).where(
+                Devis.status == 'approved',
+                or_(Devis.validity_date.is_(None), Devis.validity_date >= today),
+                devis_day <= horizon_end,
+                or_(Devis.treatment_plan_id.is_(None), Devis.treatment_plan_id.notin_(select(plan_visits.c.plan_id)))
+            ).group_by(devis_day),
+            select(
+                literal('realized'), Payment.payment_date, func.count(Payment.id), func.sum(Payment.amount)
+            ).where(
+                Payment.payment_date.between(first_month, horizon_end)
+            ).group_by(Payment.payment_date)
+        )
         
+        forecast = {}
         for i in range(months):
-            month_start = datetime.utcnow().date().replace(day=1) + timedelta(days=30 * i)
-            month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-            
-            # Get scheduled payments for the month
-            scheduled = ScheduledPayment.query.filter(
-                ScheduledPayment.due_date >= month_start,
-                ScheduledPayment.due_date <= month_end,
-                ScheduledPayment.status == 'pending'
-            ).all()
-            
-            expected_revenue = sum(sp.amount for sp in scheduled)
+            month = _add_months(first_month, i).strftime('%Y-%m')
+            forecast[month] = {
+                'month': month,
+                'expected_revenue': 0,
+                'realized_revenue': 0,
+                'scheduled_payments': 0,
+                'appointments': 0,
+                'devis': 0,
+                'breakdown': {'scheduled_payments': 0, 'appointments': 0, 'devis': 0}
+            }
+        
+        for source, day, count, amount in db.session.execute(sources):
+            month = forecast[max(day, first_month).strftime('%Y-%m')]
+            if source == 'realized':
+                month['realized_revenue'] += amount or 0
+                continue
             
-            forecast.append({
-                'month': month_start.strftime('%Y-%m'),
-                'expected_revenue': expected_revenue,
-                'scheduled_payments': len(scheduled)
-            })
+            month[source] += count
+            month['breakdown'][source] += amount or 0
+            month['expected_revenue'] += amount or 0
+        
+        return list(forecast.values())
+    
+    def get_ar_aging(self, as_of=None, limit: int = 100) -> Dict:
+        """Outstanding balances by days past due, in total and for the `limit` patients owing most.
+        
+        Partial payments are deducted; invoices without a due date count as
+        current. One query groups the outstanding invoices per patient and
+        adds the totals over all patients as window columns.
+        """
+        if limit < 1:
+            raise ValueError("La limite doit être positive")
+        
+        as_of = as_of or datetime.utcnow().date()
+        keys = [key for key, _, _ in AGING_BUCKETS] + ['total']
+        totals = {**dict.fromkeys(keys, Decimal('0.00')), 'invoices': 0, 'patients': 0}
+        
+        patients = []
+        for record in self._aging_rows(as_of, limit=limit, with_totals=True):
+            for key in totals:
+                totals[key] = record.pop(f'all_{key}')
+            patients.append(record)
         
-        return forecast
+        return {
+            'as_of': as_of.isoformat(),
+            'buckets': [key for key, _, _ in AGING_BUCKETS],
+            'totals': totals,
+            'patients': patients
+        }
+    
+    def iter_ar_aging(self, as_of=None) -> Iterator[Dict]:
+        """Aging row of every patient owing money, largest balance first, streamed from the database"""
+        return self._aging_rows(as_of or datetime.utcnow().date())
+    
+    def _aging_rows(self, as_of, limit: Optional[int] = None, with_totals: bool = False) -> Iterator[Dict]:
+        group_key = Invoice.patient_id
+        if db.session.get_bind().dialect.name == 'sqlite':
+            # SQLite would walk ix_invoices_patient_status to skip the sort, with a table
+            # lookup per invoice; a unary + keeps it on the covering status/due date index
+            group_key = literal_column(f"+{Invoice.__tablename__}.patient_id")
+        
+        aging = db.session.query(
+            Invoice.patient_id.label('patient_id'), func.min(Invoice.due_date).label('oldest_due_date'),
+            *self._aging_columns(as_of)
+        ).filter(*self._outstanding_criteria()).group_by(group_key).subquery()
+        
+        ranked = db.session.query(aging)
+        if with_totals:
+            ranked = db.session.query(aging, func.count().over().label('all_patients'), *[
+                func.sum(column).over().label(f'all_{column.name}')
+                for column in aging.c if column.name not in ('patient_id', 'oldest_due_date')
+            ])
+        # Deleted patients are dropped per group rather than per invoice, before the totals
+        ranked = ranked.filter(aging.c.patient_id.notin_(Patient.deleted_ids())).order_by(
+            aging.c.total.desc(), aging.c.patient_id
+        )
+        if limit is not None:
+            ranked = ranked.limit(limit)
+        
+        # Names are joined after grouping and ranking, to the rows kept only
+        ranked = ranked.subquery()
+        query = db.session.query(ranked, Patient.first_name, Patient.last_name).outerjoin(
+            Patient, Patient.id == ranked.c.patient_id
+        ).order_by(ranked.c.total.desc(), ranked.c.patient_id)
+        
+        for row in query.yield_per(1000):
+            record = row._asdict()
+            first_name, last_name = record.pop('first_name'), record.pop('last_name')
+            oldest = record['oldest_due_date']
+            record['patient_name'] = f"{first_name} {last_name}" if last_name else None
+            # SQLite hands back MIN() of a date as text
+            record['oldest_due_date'] = oldest.isoformat() if isinstance(oldest, date) else oldest
+            yield record
+    
+    def _outstanding_criteria(self):
+        return (
+            Invoice.status.in_(OUTSTANDING_STATUSES),
+            Invoice.total_amount > func.coalesce(Invoice.paid_amount, 0)
+        )
+    
+    def _aging_columns(self, as_of) -> List:
+        """One SUM(CASE ...) per aging bucket, then the total balance and invoice count"""
+        due = Invoice.due_date
+        balance = type_coerce(Invoice.total_amount - func.coalesce(Invoice.paid_amount, 0), Money)
+        
+        columns = []
+        for key, first_day, last_day in AGING_BUCKETS:
+            conditions = []
+            if first_day is not None:
+                conditions.append(due <= as_of - timedelta(days=first_day))
+            if last_day is not None:
+                conditions.append(due >= as_of - timedelta(days=last_day))
+            if first_day is None:
+                conditions = [or_(*conditions, due.is_(None))]
+            columns.append(func.coalesce(func.sum(case((and_(*conditions), balance), else_=0)), 0).label(key))
+        
+        return columns + [
+            func.coalesce(func.sum(balance), 0).label('total'),
+            # COUNT(*): the id is not in the covering index
+            func.count().label('invoices')
+        ]
     
     def approve_devis(self, devis_id: str) -> Devis:
         """Approve a devis"""
@@ -264,6 +510,10 @@ class FinancialService:
                 'unit_price': item.unit_price
             })
         
+        # Invoiced quotes leave the revenue forecast; committed with the invoice
+        devis.status = 'invoiced'
+        devis.updated_at = datetime.utcnow()
+        
         # Create invoice
         invoice = self.create_invoice(
             patient_id=devis.patient_id,
@@ -273,9 +523,17 @@ class FinancialService:
         
         return invoice
     
+    @request_cached
     def get_pricing_by_code(self, tarmed_code: str) -> Optional[DentalPricing]:
         """Get pricing information by TARMED code"""
-        return DentalPricing.query.filter_by(tarmed_code=tarmed_code, active=True).first()
+        cached = self._pricing_cache.get(tarmed_code)
+        if cached is not None:
+            return db.session.merge(cached, load=False)
+        
+        pricing = DentalPricing.query.filter_by(tarmed_code=tarmed_code, active=True).first()
+        if pricing is not None:
+            self._pricing_cache.set(tarmed_code, detached_copy(pricing))
+        return pricing
     
     def search_pricing(self, query: str) -> List[DentalPricing]:
         """Search pricing by code or description"""
@@ -291,40 +549,97 @@ class FinancialService:
     
     def _generate_invoice_number(self) -> str:
         """Generate unique invoice number"""
-        year = datetime.utcnow().year
-        count = Invoice.query.filter(
-            Invoice.invoice_number.like(f"{year}-%")
-        ).count() + 1
-        return f"{year}-{count:04d}"
+        return self.sequence_service.next_number('invoice')
     
     def _generate_devis_number(self) -> str:
         """Generate unique devis number"""
-        year = datetime.utcnow().year
-        count = Devis.query.filter(
-            Devis.devis_number.like(f"D{year}-%")
-        ).count() + 1
-        return f"D{year}-{count:04d}"
+        return self.sequence_service.next_number('devis')
     
-    def _group_payments_by_method(self, payments: List[Payment]) -> Dict:
-        """Group payments by method"""
+    def calculate_totals(self, items: List[Dict], on=None) -> Dict:
+        """Invoice or devis total columns of a list of items billed on a day (default today).
+        
+        VAT comes from the tax rules in force that day. The total payable is
+        rounded to 5 centimes; that rounding is kept apart from the tax, so
+        subtotal + tax_amount + rounding_amount == total_amount exactly.
+        tax_breakdown holds the taxable amount and tax of each rate.
+        """
+        totals = self.tax_service.compute(
+            [{'tarmed_code': item.get('tarmed_code'), 'total_price': self._line_total(item)} for item in items], on=on
+        )
+        return {
+            'subtotal': totals['subtotal'],
+            'tax_amount': totals['tax_amount'],
+            'rounding_amount': totals['rounding'],
+            'total_amount': totals['total_amount'],
+            'tax_breakdown': stored_breakdown(totals['breakdown'])
+        }
+    
+    def _line_total(self, item: Dict) -> Decimal:
+        """Quantity times unit price, to the centime"""
+        return to_money(to_money(item['unit_price']) * Decimal(str(item['quantity'])))
+    
+    def _item_rows(self, items: List[Dict], **parent) -> List[Dict]:
+        """Insert mappings for invoice or devis items; parent is invoice_id= or devis_id="""
+        return [
+            {
+                'id': str(uuid.uuid4()),
+                **parent,
+                'description': item['description'],
+                'tarmed_code': item.get('tarmed_code'),
+                'quantity': item['quantity'],
+                'unit_price': to_money(item['unit_price']),
+                'total_price': self._line_total(item)
+            }
+            for item in items
+        ]
+    
+    def _batch_entry_error(self, entry, known_patients: set) -> Optional[str]:
+        """Why a batch entry cannot be invoiced, or None"""
+        if not isinstance(entry, dict):
+            return "Entrée invalide"
+        if entry.get('patient_id') not in known_patients:
+            return f"Patient non trouvé: {entry.get('patient_id')}"
+        
+        items = entry.get('items')
+        if not items or not isinstance(items, list):
+            return "Aucune prestation"
+        for number, item in enumerate(items, start=1):
+            if not isinstance(item, dict) or not item.get('description'):
+                return f"Prestation {number}: description manquante"
+            for field in ('quantity', 'unit_price'):
+                value = item.get(field)
+                if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)) or value < 0:
+                    return f"Prestation {number}: {field} invalide"
+        return None
+    
+    def _group_payments_by_method(self, rows) -> Dict:
+        """Fold (method, count, amount) aggregate rows; NULL and empty methods count as 'unknown'"""
         by_method = {}
-        for payment in payments:
-            method = payment.payment_method or 'unknown'
+        for method, count, amount in rows:
+            method = method or 'unknown'
             if method not in by_method:
                 by_method[method] = {'count': 0, 'amount': 0}
             
-            by_method[method]['count'] += 1
-            by_method[method]['amount'] += payment.amount
+            by_method[method]['count'] += count
+            by_method[method]['amount'] += amount
         
         return by_method
     
     def get_all_invoices(self) -> List[Invoice]:
         """Get all invoices"""
-        return Invoice.query.order_by(Invoice.issue_date.desc()).all()
+        return Invoice.query.options(
+            joinedload(Invoice.patient).load_only(Patient.first_name, Patient.last_name)
+        ).filter(Invoice.patient_id.notin_(Patient.deleted_ids())).order_by(
+            Invoice.issue_date.desc()
+        ).all()
     
     def get_all_devis(self) -> List[Devis]:
         """Get all devis (quotes)"""
-        return Devis.query.order_by(Devis.issue_date.desc()).all()
+        return Devis.query.options(
+            joinedload(Devis.patient).load_only(Patient.first_name, Patient.last_name)
+        ).filter(Devis.patient_id.notin_(Patient.deleted_ids())).order_by(
+            Devis.issue_date.desc()
+        ).all()
     
     def get_all_pricing(self) -> List[DentalPricing]:
         """Get all pricing entries"""
@@ -340,4 +655,10 @@ class FinancialService:
                 DentalPricing.category.like(search)
             ),
             DentalPricing.active == True
-        ).order_by(DentalPricing.tarmed_code).all()
\ No newline at end of file
+        ).order_by(DentalPricing.tarmed_code).all()
+
+
+def _add_months(month_start, months: int):
+    """First day of the month `months` calendar months after month_start"""
+    year, month = divmod(month_start.month - 1 + months, 12)
+    return month_start.replace(year=month_start.year + year, month=month + 1, day=1)
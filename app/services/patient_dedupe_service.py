@@ -0,0 +1,172 @@
+import logging
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Dict, List, Optional
+from app import db
+from app.models import (
+    Patient, Appointment, AppointmentSeries, TreatmentPlan, Invoice, Devis,
+    PaymentPlan, PatientEducation
+)
+from app.utils.normalizers import fold_text, normalize_phone, soundex
+
+logger = logging.getLogger(__name__)
+
+# Tables whose rows follow the kept patient on merge
+PATIENT_OWNED = (
+    Appointment, AppointmentSeries, TreatmentPlan, Invoice, Devis, PaymentPlan, PatientEducation
+)
+
+# Blank fields of the kept patient are filled from the merged records
+MERGEABLE_FIELDS = (
+    'email', 'phone', 'birth_date', 'address', 'medical_history', 'allergies',
+    'emergency_contact', 'insurance_info', 'notes'
+)
+
+# Score contribution of each identifier two records share
+MATCH_WEIGHTS = {'birth_date': 0.25, 'phone': 0.15, 'email': 0.15}
+
+class PatientDedupeService:
+    """Finds and merges duplicate patient records.
+    
+    Candidate pairs come from blocking keys (normalized phone, email, birth
+    date + last name soundex) instead of comparing every pair of patients;
+    each candidate is then scored on name similarity and shared identifiers.
+    """
+    
+    def __init__(self, search_service=None, min_score: float = 0.6, max_block_size: int = 50):
+        self.search_service = search_service
+        self.min_score = min_score
+        self.max_block_size = max_block_size
+    
+    def find_duplicates(self, min_score: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Likely duplicate pairs, highest score first"""
+        min_score = self.min_score if min_score is None else min_score
+        records = {}
+        blocks = defaultdict(list)
+        
+        rows = db.session.query(
+            Patient.id, Patient.first_name, Patient.last_name, Patient.email,
+            Patient.phone, Patient.birth_date
+        ).filter(Patient.deleted_at.is_(None)).yield_per(5000)
+        for row in rows:
+            record = self._record(row)
+            records[record['id']] = record
+            for key in self._blocking_keys(record):
+                blocks[key].append(record['id'])
+        
+        candidates = set()
+        for key, ids in blocks.items():
+            # Shared placeholders (front desk phone, "inconnu@...") say nothing about identity
+            if len(ids) < 2 or len(ids) > self.max_block_size:
+                continue
+            candidates.update(combinations(sorted(ids), 2))
+        
+        duplicates = []
+        for first_id, second_id in candidates:
+            score, reasons = self._score(records[first_id], records[second_id])
+            if score >= min_score:
+                duplicates.append({
+                    'patient_ids': [first_id, second_id],
+                    'score': round(score, 3),
+                    'reasons': reasons,
+                    'patients': [records[first_id]['summary'], records[second_id]['summary']]
+                })
+        
+        duplicates.sort(key=lambda d: d['score'], reverse=True)
+        logger.info(f"Dedupe: {len(records)} patients, {len(candidates)} candidate pairs, "
+                    f"{len(duplicates)} likely duplicates")
+        return duplicates[:limit] if limit else duplicates
+    
+    def merge_patients(self, keep_id: str, merge_ids: List[str]) -> Dict:
+        """Move everything owned by merge_ids to keep_id and delete them, in one transaction"""
+        merge_ids = [pid for pid in dict.fromkeys(merge_ids) if pid != keep_id]
+        if not merge_ids:
+            raise ValueError("Aucun patient à fusionner")
+        
+        keep = Patient.active().filter(Patient.id == keep_id).first()
+        if not keep:
+            raise ValueError("Patient à conserver non trouvé")
+        
+        merged = Patient.active().filter(Patient.id.in_(merge_ids)).order_by(Patient.updated_at.desc()).all()
+        missing = set(merge_ids) - {p.id for p in merged}
+        if missing:
+            raise ValueError(f"Patients non trouvés: {', '.join(sorted(missing))}")
+        
+        try:
+            for field in MERGEABLE_FIELDS:
+                if not getattr(keep, field):
+                    value = next((getattr(p, field) for p in merged if getattr(p, field)), None)
+                    if value:
+                        setattr(keep, field, value)
+            
+            moved = {}
+            for model in PATIENT_OWNED:
+                moved[model.__tablename__] = model.query.filter(
+                    model.patient_id.in_(merge_ids)
+                ).update({model.patient_id: keep_id}, synchronize_session=False)
+            
+            # Bulk delete: the ORM delete-orphan cascade must not touch the moved rows
+            Patient.query.filter(Patient.id.in_(merge_ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        # Loaded objects may still point at the deleted patients
+        db.session.expire_all()
+        if self.search_service is not None:
+            self.search_service.mark_dirty()
+        
+        logger.info(f"Merged patients {merge_ids} into {keep_id}: {moved}")
+        return {'kept_id': keep_id, 'merged_ids': merge_ids, 'moved': moved}
+    
+    def _record(self, row) -> Dict:
+        patient_id, first_name, last_name, email, phone, birth_date = row
+        return {
+            'id': patient_id,
+            'first_name': fold_text(first_name),
+            'last_name': fold_text(last_name),
+            'email': (email or '').strip().lower(),
+            'phone': normalize_phone(phone),
+            'birth_date': birth_date,
+            'summary': {
+                'id': patient_id,
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email,
+                'phone': phone,
+                'birth_date': birth_date.isoformat() if birth_date else None
+            }
+        }
+    
+    def _blocking_keys(self, record: Dict) -> List[tuple]:
+        keys = []
+        if len(record['phone']) >= 9:
+            keys.append(('phone', record['phone']))
+        if record['email']:
+            keys.append(('email', record['email']))
+        if record['birth_date']:
+            keys.append(('birth_date', record['birth_date'], soundex(record['last_name'])))
+        return keys
+    
+    def _score(self, first: Dict, second: Dict):
+        """Half name similarity, half shared identifiers; a different birth date is a strong veto"""
+        name_similarity = SequenceMatcher(
+            None,
+            f"{first['first_name']} {first['last_name']}",
+            f"{second['first_name']} {second['last_name']}"
+        ).ratio()
+        score = 0.5 * name_similarity
+        reasons = [f"nom similaire à {round(name_similarity * 100)}%"]
+        
+        for field, weight in MATCH_WEIGHTS.items():
+            if first[field] and first[field] == second[field]:
+                score += weight
+                reasons.append(f"{field} identique")
+        
+        if first['birth_date'] and second['birth_date'] and first['birth_date'] != second['birth_date']:
+            score -= 0.25
+            reasons.append("date de naissance différente")
+        
+        return min(max(score, 0.0), 1.0), reasons
@@ -0,0 +1,211 @@
+import io
+import csv
+import json
+import uuid
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app import db
+from app.models import Patient
+from app.utils.validators import validate_email, validate_phone, validate_date
+from app.utils.normalizers import fold_text, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# Importable columns and their maximum length (None: free text)
+IMPORT_FIELDS = {
+    'first_name': 100,
+    'last_name': 100,
+    'email': 120,
+    'phone': 20,
+    'birth_date': None,
+    'address': None,
+    'medical_history': None,
+    'allergies': None,
+    'emergency_contact': None,
+    'insurance_info': None,
+    'notes': None,
+}
+
+# Rejected rows listed in a report; the count covers all of them
+MAX_REPORTED_REJECTS = 1000
+
+class PatientImportService:
+    """Bulk import of patients from CSV or JSON Lines.
+    
+    Rows are streamed, validated and deduplicated chunk by chunk, then
+    inserted with bulk_insert_mappings in one transaction per chunk, so a
+    failure loses at most the current chunk.
+    """
+    
+    def __init__(self, search_service=None, chunk_size: int = 1000):
+        self.search_service = search_service
+        self.chunk_size = chunk_size
+    
+    def import_stream(self, stream, fmt: str = 'csv', dry_run: bool = False,
+                      progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Import patients from a text or binary stream; returns a report"""
+        report = {'total': 0, 'imported': 0, 'duplicates': 0, 'rejected': 0, 'rejected_rows': []}
+        known = self._existing_keys()
+        
+        chunk = []
+        for line, row in self._iter_rows(stream, fmt):
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk, known, report, dry_run)
+                chunk = []
+                if progress:
+                    progress(report)
+        
+        if chunk:
+            self._import_chunk(chunk, known, report, dry_run)
+            if progress:
+                progress(report)
+        
+        if report['imported'] and not dry_run and self.search_service is not None:
+            self.search_service.mark_dirty()
+        
+        logger.info(f"Patient import: {report['imported']} imported, {report['duplicates']} duplicates, "
+                    f"{report['rejected']} rejected out of {report['total']}")
+        return report
+    
+    def _iter_rows(self, stream, fmt: str) -> Iterator[Tuple[int, Dict]]:
+        """Yield (line number, raw row) without reading the whole file"""
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        
+        if fmt == 'csv':
+            # Excel exports in fr-CH locales separate columns with ';'
+            header = stream.readline()
+            delimiter = ';' if header.count(';') > header.count(',') else ','
+            reader = csv.DictReader(_chain_line(header, stream), delimiter=delimiter)
+            for row in reader:
+                yield reader.line_num, row
+        elif fmt == 'jsonl':
+            for line, text in enumerate(stream, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except json.JSONDecodeError as e:
+                    row = {'_error': f"JSON invalide: {e.msg}"}
+                yield line, row if isinstance(row, dict) else {'_error': 'Objet JSON attendu'}
+        else:
+            raise ValueError(f"Format d'import inconnu: {fmt}")
+    
+    def _import_chunk(self, chunk: List[Tuple[int, Dict]], known: Dict, report: Dict, dry_run: bool):
+        now = datetime.utcnow()
+        mappings = []
+        # Keys of this chunk join `known` only once its rows are committed
+        pending = {}
+        
+        for line, row in chunk:
+            report['total'] += 1
+            record, errors = self._validate(row)
+            if errors:
+                self._reject(report, line, row, errors)
+                continue
+            
+            if self._is_duplicate(record, known) or self._is_duplicate(record, pending):
+                report['duplicates'] += 1
+                continue
+            
+            self._remember(record, pending)
+            record.update(id=str(uuid.uuid4()), created_at=now, updated_at=now)
+            mappings.append(record)
+        
+        if mappings and not dry_run:
+            try:
+                db.session.bulk_insert_mappings(Patient, mappings)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Patient import chunk failed: {str(e)}")
+                for record in mappings:
+                    self._reject(report, None, record, [f"Erreur d'insertion: {str(e)}"])
+                return
+        
+        for name, markers in pending.items():
+            known.setdefault(name, set()).update(markers)
+        report['imported'] += len(mappings)
+    
+    def _validate(self, row: Dict) -> Tuple[Dict, List[str]]:
+        """Normalize one raw row into Patient columns, collecting every error"""
+        if '_error' in row:
+            return {}, [row['_error']]
+        
+        record = {}
+        for field, max_length in IMPORT_FIELDS.items():
+            value = row.get(field)
+            value = str(value).strip() if value is not None else ''
+            record[field] = value or None
+        
+        errors = []
+        for field in ('first_name', 'last_name'):
+            if not record[field]:
+                errors.append(f"Champ requis manquant: {field}")
+        
+        for field, max_length in IMPORT_FIELDS.items():
+            if max_length and record[field] and len(record[field]) > max_length:
+                errors.append(f"{field} trop long (max {max_length})")
+        
+        if record['email'] and not validate_email(record['email']):
+            errors.append(f"Email invalide: {record['email']}")
+        if record['phone'] and not validate_phone(record['phone']):
+            errors.append(f"Téléphone invalide: {record['phone']}")
+        if record['birth_date']:
+            if validate_date(record['birth_date']):
+                record['birth_date'] = datetime.fromisoformat(record['birth_date']).date()
+            else:
+                errors.append(f"Date de naissance invalide: {record['birth_date']}")
+        
+        return record, errors
+    
+    def _existing_keys(self) -> Dict:
+        """Identity keys of patients already in the database, in one projected query"""
+        known = {}
+        rows = db.session.query(
+            Patient.first_name, Patient.last_name, Patient.birth_date, Patient.email, Patient.phone
+        ).filter(Patient.deleted_at.is_(None)).yield_per(5000)
+        for first_name, last_name, birth_date, email, phone in rows:
+            self._remember({'first_name': first_name, 'last_name': last_name, 'birth_date': birth_date,
+                            'email': email, 'phone': phone}, known)
+        return known
+    
+    def _identity(self, record: Dict) -> Tuple[Tuple, set]:
+        """A folded name, plus the birth date, email and phone that confirm it"""
+        name = (fold_text(record['first_name']), fold_text(record['last_name']))
+        markers = set()
+        if record.get('birth_date'):
+            markers.add(('birth_date', str(record['birth_date'])))
+        if record.get('email'):
+            markers.add(('email', record['email'].lower()))
+        if record.get('phone'):
+            markers.add(('phone', normalize_phone(record['phone'])))
+        return name, markers
+    
+    def _is_duplicate(self, record: Dict, known: Dict) -> bool:
+        """Same name and at least one shared birth date, email or phone (or no markers on both sides)"""
+        name, markers = self._identity(record)
+        if name not in known:
+            return False
+        return bool(markers & known[name]) or (not markers and ('none',) in known[name])
+    
+    def _remember(self, record: Dict, known: Dict):
+        name, markers = self._identity(record)
+        known.setdefault(name, set()).update(markers or {('none',)})
+    
+    def _reject(self, report: Dict, line: Optional[int], row: Dict, errors: List[str]):
+        report['rejected'] += 1
+        if len(report['rejected_rows']) < MAX_REPORTED_REJECTS:
+            report['rejected_rows'].append({
+                'line': line,
+                'name': f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip(),
+                'errors': errors
+            })
+
+
+def _chain_line(first: str, stream) -> Iterator[str]:
+    """Put back the header line read to pick the delimiter"""
+    yield first
+    yield from stream
@@ -0,0 +1,125 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import delete, or_, select, update
+from app import db
+from app.models import (
+    Patient, Appointment, AppointmentSeries, TreatmentPlan, Invoice, InvoiceItem, Payment,
+    Devis, DevisItem, PaymentPlan, ScheduledPayment, PatientEducation, UnmatchedPayment
+)
+from app.services.change_feed_service import record_bulk_changes
+
+logger = logging.getLogger(__name__)
+
+class PatientPurgeService:
+    """Background removal of soft-deleted patients and everything they own.
+    
+    Tombstoned patients are purged in chunks, each chunk in its own
+    transaction, with one set-based DELETE per table (children first) instead
+    of loading every row through the ORM cascade.
+    """
+    
+    def __init__(self, rollup_service=None, chunk_size: int = 200, interval_seconds: int = 300,
+                 grace_seconds: int = 0):
+        self.rollup_service = rollup_service
+        self.chunk_size = chunk_size
+        self.interval_seconds = interval_seconds
+        self.grace_seconds = grace_seconds
+        self._wakeup = threading.Event()
+        self._thread = None
+    
+    def start(self, app):
+        """Run the purge loop in a daemon thread of this worker"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._thread = threading.Thread(target=self._run, args=(app,), name='patient-purge', daemon=True)
+        self._thread.start()
+    
+    def schedule(self):
+        """Wake the purge loop now instead of at the next interval"""
+        self._wakeup.set()
+    
+    def purge(self) -> Dict[str, int]:
+        """Purge every tombstoned patient past the grace period; returns affected rows per table"""
+        totals = {}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+        
+        while True:
+            patient_ids = [row[0] for row in db.session.query(Patient.id).filter(
+                Patient.deleted_at.isnot(None), Patient.deleted_at <= cutoff
+            ).limit(self.chunk_size)]
+            if not patient_ids:
+                break
+            
+            try:
+                for table, count in self._purge_chunk(patient_ids).items():
+                    totals[table] = totals.get(table, 0) + count
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        if totals:
+            # Bulk deletes bypass the services' own cache invalidation
+            from app.services import appointment_service
+            if appointment_service is not None:
+                appointment_service.invalidate_calendar_cache()
+            logger.info(f"Purged deleted patients: {totals}")
+        return totals
+    
+    def _purge_chunk(self, patient_ids: List[str]) -> Dict[str, int]:
+        invoice_ids = select(Invoice.id).where(Invoice.patient_id.in_(patient_ids))
+        devis_ids = select(Devis.id).where(Devis.patient_id.in_(patient_ids))
+        plan_ids = select(PaymentPlan.id).where(or_(
+            PaymentPlan.patient_id.in_(patient_ids), PaymentPlan.invoice_id.in_(invoice_ids)
+        ))
+        
+        # Bulk deletes skip the flush hooks that keep the revenue rollups current
+        if self.rollup_service is not None:
+            self.rollup_service.subtract_where(ScheduledPayment, ScheduledPayment.payment_plan_id.in_(plan_ids))
+            self.rollup_service.subtract_where(Payment, Payment.invoice_id.in_(invoice_ids))
+            self.rollup_service.subtract_where(Invoice, Invoice.patient_id.in_(patient_ids))
+            self.rollup_service.subtract_where(Devis, Devis.patient_id.in_(patient_ids))
+        
+        # Nor do they reach the schedule change feed on their own
+        for model in (Appointment, AppointmentSeries):
+            entity_ids = [row[0] for row in db.session.query(model.id).filter(model.patient_id.in_(patient_ids))]
+            record_bulk_changes(db.session, model, entity_ids, 'deleted')
+        
+        # Children before parents, so foreign keys hold after every statement. Bank
+        # credits queued for review were received all the same: they stay, unlinked
+        statements = [
+            delete(ScheduledPayment).where(ScheduledPayment.payment_plan_id.in_(plan_ids)),
+            delete(PaymentPlan).where(PaymentPlan.id.in_(plan_ids)),
+            delete(Payment).where(Payment.invoice_id.in_(invoice_ids)),
+            delete(InvoiceItem).where(InvoiceItem.invoice_id.in_(invoice_ids)),
+            delete(DevisItem).where(DevisItem.devis_id.in_(devis_ids)),
+            delete(Appointment).where(Appointment.patient_id.in_(patient_ids)),
+            delete(AppointmentSeries).where(AppointmentSeries.patient_id.in_(patient_ids)),
+            update(UnmatchedPayment).where(UnmatchedPayment.invoice_id.in_(invoice_ids)).values(invoice_id=None),
+            delete(Invoice).where(Invoice.patient_id.in_(patient_ids)),
+            delete(Devis).where(Devis.patient_id.in_(patient_ids)),
+            delete(TreatmentPlan).where(TreatmentPlan.patient_id.in_(patient_ids)),
+            delete(PatientEducation).where(PatientEducation.patient_id.in_(patient_ids)),
+            delete(Patient).where(Patient.id.in_(patient_ids), Patient.deleted_at.isnot(None)),
+        ]
+        
+        counts = {}
+        for statement in statements:
+            result = db.session.execute(statement.execution_options(synchronize_session=False))
+            counts[statement.table.name] = result.rowcount
+        return counts
+    
+    def _run(self, app):
+        while True:
+            self._wakeup.wait(self.interval_seconds)
+            self._wakeup.clear()
+            with app.app_context():
+                try:
+                    self.purge()
+                except Exception as e:
+                    logger.error(f"Patient purge failed: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
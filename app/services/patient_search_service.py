@@ -0,0 +1,194 @@
+import re
+import heapq
+import threading
+import time as clock
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from app import db
+from app.models import Patient
+from app.utils.normalizers import fold_text, normalize_phone
+
+# Rows committed up to this long after their updated_at was set are still picked up
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class PatientSearchService:
+    """In-process trigram index for patient typeahead search.
+    
+    Names are indexed as accent-folded word-prefix trigrams, emails as plain
+    trigrams and phones as trigrams of their national digits, each field in its
+    own key space. The index follows the patients table through a cheap
+    (COUNT, MAX(updated_at)) check: changed rows are re-indexed incrementally
+    and soft-deleted ones dropped; hard deletions trigger a rebuild.
+    """
+    
+    def __init__(self, refresh_interval: float = 1.0, min_score: float = 0.5):
+        self.refresh_interval = refresh_interval
+        self.min_score = min_score
+        self._lock = threading.RLock()
+        self._dirty = True
+        self._checked_at = 0.0
+        self._reset()
+    
+    def _reset(self):
+        self._postings = defaultdict(lambda: array('i'))
+        self._docs = []  # doc number -> (patient_id, name gram count, phone) or None once replaced
+        self._doc_by_patient = {}
+        self._indexed_versions = {}  # patient_id -> updated_at of the indexed row
+        self._validator = None
+        self._synced_until = None
+    
+    def mark_dirty(self):
+        """Force a freshness check on the next search (called after local writes)"""
+        self._dirty = True
+    
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Return up to `limit` (patient_id, score) pairs, best match first"""
+        self._ensure_fresh()
+        
+        query = (query or '').strip()
+        digits = re.sub(r'[\s\-\(\)\.\/]', '', query)
+        
+        with self._lock:
+            if len(digits) >= 3 and re.fullmatch(r'\+?\d+', digits):
+                return self._search_phone(query, limit)
+            if '@' in query:
+                return self._rank(['e:' + g for g in self._grams(fold_text(query), pad=False)], limit)
+            
+            grams = []
+            for word in re.findall(r'\w+', fold_text(query)):
+                grams.extend('n:' + g for g in self._grams(word, prefix=True))
+            return self._rank(grams, limit)
+    
+    def rebuild(self):
+        """Reindex every patient from scratch"""
+        with self._lock:
+            self._reset()
+            rows = db.session.query(
+                Patient.id, Patient.first_name, Patient.last_name, Patient.email, Patient.phone, Patient.updated_at
+            ).filter(Patient.deleted_at.is_(None)).yield_per(2000)
+            for *row, updated_at in rows:
+                self._index(*row)
+                self._indexed_versions[row[0]] = updated_at
+            self._validator = self._current_validator()
+            self._synced_until = self._validator[1]
+            self._dirty = False
+    
+    def _ensure_fresh(self):
+        now = clock.monotonic()
+        if not self._dirty and now - self._checked_at < self.refresh_interval:
+            return
+        
+        with self._lock:
+            self._checked_at = now
+            self._dirty = False
+            validator = self._current_validator()
+            # A late commit can carry an updated_at older than MAX(updated_at): keep
+            # looking back over the overlap window until it has passed
+            settled = self._synced_until is None or datetime.utcnow() - self._synced_until >= SYNC_OVERLAP
+            if validator == self._validator and settled:
+                return
+            
+            if self._synced_until is None:
+                self.rebuild()
+                return
+            
+            # Re-index rows touched since the last sync, minus the overlap; rows
+            # already indexed at their current version are skipped
+            changed = db.session.query(
+                Patient.id, Patient.first_name, Patient.last_name, Patient.email, Patient.phone,
+                Patient.deleted_at, Patient.updated_at
+            ).filter(Patient.updated_at >= self._synced_until - SYNC_OVERLAP).all()
+            for *row, deleted_at, updated_at in changed:
+                if self._indexed_versions.get(row[0]) == updated_at:
+                    continue
+                self._indexed_versions[row[0]] = updated_at
+                if deleted_at is None:
+                    self._index(*row)
+                else:
+                    self._unindex(row[0])
+            
+            stale = len(self._docs) - len(self._doc_by_patient)
+            if len(self._doc_by_patient) != validator[0] or stale > len(self._docs) // 4:
+                # Rows were deleted, or too many replaced docs linger in the postings
+                self.rebuild()
+                return
+            
+            self._validator = validator
+            self._synced_until = validator[1]
+    
+    def _current_validator(self):
+        # Tombstoning bumps updated_at; purging tombstones changes neither value
+        return db.session.query(
+            func.count(Patient.id).filter(Patient.deleted_at.is_(None)), func.max(Patient.updated_at)
+        ).one()
+    
+    def _unindex(self, patient_id):
+        previous = self._doc_by_patient.pop(patient_id, None)
+        if previous is not None:
+            self._docs[previous] = None
+    
+    def _index(self, patient_id, first_name, last_name, email, phone):
+        self._unindex(patient_id)
+        
+        doc = len(self._docs)
+        phone_digits = normalize_phone(phone)
+        grams = set()
+        for word in re.findall(r'\w+', fold_text(f"{first_name} {last_name}")):
+            grams.update('n:' + g for g in self._grams(word, prefix=True))
+        name_grams = len(grams)
+        grams.update('e:' + g for g in self._grams(fold_text(email), pad=False))
+        grams.update('p:' + g for g in self._grams(phone_digits, pad=False))
+        
+        for gram in grams:
+            self._postings[gram].append(doc)
+        self._docs.append((patient_id, name_grams, phone_digits))
+        self._doc_by_patient[patient_id] = doc
+    
+    def _grams(self, text: str, prefix: bool = False, pad: bool = True) -> List[str]:
+        """Trigrams of a word; prefix=True anchors it at the word start only"""
+        if not text:
+            return []
+        if pad:
+            text = '  ' + text + ('' if prefix else ' ')
+        return [text[i:i + 3] for i in range(len(text) - 2)]
+    
+    def _rank(self, grams: List[str], limit: int) -> List[Tuple[str, float]]:
+        """Score docs by the share of query trigrams they contain, shorter names first on ties"""
+        grams = list(dict.fromkeys(grams))
+        if not grams:
+            return []
+        
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._postings.get(gram, ()))
+        
+        threshold = self.min_score * len(grams)
+        candidates = (
+            (count / len(grams), -self._docs[doc][1], self._docs[doc][0])
+            for doc, count in hits.items()
+            if count >= threshold and self._docs[doc] is not None
+        )
+        return [(patient_id, round(score, 3)) for score, _, patient_id in heapq.nlargest(limit, candidates)]
+    
+    def _search_phone(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Phone digits must appear as a substring of the normalized number"""
+        digits = normalize_phone(query)
+        grams = list(dict.fromkeys('p:' + g for g in self._grams(digits, pad=False)))
+        
+        docs: Optional[set] = None
+        for gram in grams:
+            posting = set(self._postings.get(gram, ()))
+            docs = posting if docs is None else docs & posting
+            if not docs:
+                return []
+        
+        matches = []
+        for doc in docs or ():
+            entry = self._docs[doc]
+            if entry is not None and digits in entry[2]:
+                matches.append((1.0 if entry[2] == digits else 0.9, entry[0]))
+        matches.sort(reverse=True)
+        return [(patient_id, score) for score, patient_id in matches[:limit]]
@@ -1,12 +1,42 @@
 import uuid
-from datetime import datetime
-from typing import List, Dict, Optional
+import json
+import base64
+import hashlib
+from datetime import datetime, date
+from decimal import Decimal
+from typing import List, Dict, Optional, Iterator, Tuple
+from sqlalchemy import tuple_, case, func
+from sqlalchemy.orm import undefer_group
 from app import db
-from app.models import Patient
+from app.models import Patient, Appointment, TreatmentPlan, Invoice, Devis
+from app.services.patient_search_service import PatientSearchService
+from app.utils.conditional import table_version
+from app.utils.cache import request_cached
+from app.utils.money import to_money
+
+# Columns a patient list may project; large free-text columns must be asked for explicitly
+LIST_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'birth_date', 'address',
+    'emergency_contact', 'notes', 'created_at', 'updated_at'
+)
+DEFAULT_LIST_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone', 'birth_date')
+
+# Sections of the patient overview and the tables each one reads
+OVERVIEW_SECTIONS = {
+    'appointments': (Appointment,),
+    'treatment_plans': (TreatmentPlan,),
+    'invoices': (Invoice,),
+    'devis': (Devis,),
+    'statistics': (Appointment, TreatmentPlan, Invoice),
+}
 
 class PatientService:
     """Service for managing patient operations"""
     
+    def __init__(self, search_service: Optional[PatientSearchService] = None, purge_service=None):
+        self.search_service = search_service or PatientSearchService()
+        self.purge_service = purge_service
+    
     def create_patient(self, data: Dict) -> Patient:
         """Create a new patient"""
         patient = Patient(
@@ -26,15 +56,73 @@ class PatientService:
         
         db.session.add(patient)
         db.session.commit()
+        self.search_service.mark_dirty()
         return patient
     
-    def get_patient(self, patient_id: str) -> Optional[Patient]:
-        """Get a patient by ID"""
-        return Patient.query.get(patient_id)
+    @request_cached
+    def get_patient(self, patient_id: str, include_sensitive: bool = False) -> Optional[Patient]:
+        """Get a patient by ID (include_sensitive loads the encrypted fields in the same query)"""
+        query = Patient.active().filter(Patient.id == patient_id)
+        if include_sensitive:
+            query = query.options(undefer_group('sensitive'))
+        return query.first()
     
     def get_all_patients(self) -> List[Patient]:
         """Get all patients"""
-        return Patient.query.order_by(Patient.last_name, Patient.first_name).all()
+        return Patient.active().order_by(Patient.last_name, Patient.first_name).all()
+    
+    def iter_patients_page(self, cursor: Optional[str] = None, limit: int = 50,
+                           fields: Optional[List[str]] = None) -> Tuple[Iterator[Dict], Dict]:
+        """Stream one keyset-paginated page of patients ordered by (last_name, first_name, id).
+        
+        Returns an iterator of projected rows and a dict whose 'next_cursor' is
+        filled in once the iterator is exhausted (None on the last page).
+        """
+        fields = list(fields or DEFAULT_LIST_FIELDS)
+        unknown = set(fields) - set(LIST_FIELDS)
+        if unknown:
+            raise ValueError(f"Champs inconnus: {', '.join(sorted(unknown))}")
+        
+        # The keyset columns are always selected, even if not returned
+        selected = list(dict.fromkeys(fields + ['last_name', 'first_name', 'id']))
+        query = db.session.query(*[getattr(Patient, name) for name in selected]).filter(
+            Patient.deleted_at.is_(None)
+        )
+        
+        if cursor:
+            query = query.filter(
+                tuple_(Patient.last_name, Patient.first_name, Patient.id) > tuple(self._decode_cursor(cursor))
+            )
+        
+        query = query.order_by(Patient.last_name, Patient.first_name, Patient.id).limit(limit + 1)
+        page = {'next_cursor': None}
+        
+        def rows():
+            last = None
+            for count, row in enumerate(query.yield_per(500)):
+                if count == limit:
+                    page['next_cursor'] = self._encode_cursor(last)
+                    break
+                record = row._asdict()
+                last = (record['last_name'], record['first_name'], record['id'])
+                yield {
+                    name: value.isoformat() if isinstance(value, (date, datetime)) else value
+                    for name, value in record.items() if name in fields
+                }
+        
+        return rows(), page
+    
+    def _encode_cursor(self, key: Tuple) -> str:
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+    
+    def _decode_cursor(self, cursor: str) -> List:
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Curseur invalide")
+        if not isinstance(key, list) or len(key) != 3:
+            raise ValueError("Curseur invalide")
+        return key
     
     def update_patient(self, patient_id: str, data: Dict) -> Optional[Patient]:
         """Update a patient"""
@@ -54,41 +142,154 @@ class PatientService:
         
         patient.updated_at = datetime.utcnow()
         db.session.commit()
+        self.search_service.mark_dirty()
         return patient
     
     def delete_patient(self, patient_id: str) -> bool:
-        """Delete a patient"""
+        """Soft-delete a patient; its records are removed by the background purge"""
         patient = self.get_patient(patient_id)
         if not patient:
             return False
         
-        db.session.delete(patient)
+        patient.deleted_at = datetime.utcnow()
         db.session.commit()
+        self.search_service.mark_dirty()
+        
+        # Calendar summaries leave out the appointments of deleted patients
+        from app.services import appointment_service
+        if appointment_service is not None:
+            appointment_service.invalidate_calendar_cache()
+        if self.purge_service is not None:
+            self.purge_service.schedule()
         return True
     
-    def search_patients(self, query: str) -> List[Patient]:
-        """Search patients by name"""
-        search_term = f"%{query}%"
-        return Patient.query.filter(
-            db.or_(
-                Patient.first_name.ilike(search_term),
-                Patient.last_name.ilike(search_term),
-                Patient.email.ilike(search_term),
-                Patient.phone.ilike(search_term)
-            )
-        ).order_by(Patient.last_name, Patient.first_name).all()
+    def search_patients(self, query: str, limit: int = 20) -> List[Patient]:
+        """Search patients by name, email or phone, best matches first"""
+        ranked = self.search_service.search(query, limit)
+        if not ranked:
+            return []
+        
+        patients = {p.id: p for p in Patient.active().filter(Patient.id.in_([pid for pid, _ in ranked])).all()}
+        return [patients[pid] for pid, _ in ranked if pid in patients]
     
     def get_patient_statistics(self, patient_id: str) -> Dict:
         """Get statistics for a patient"""
-        patient = self.get_patient(patient_id)
-        if not patient:
+        if not self.get_patient(patient_id):
             return {}
         
+        return self.get_patients_statistics([patient_id])[patient_id]
+    
+    def get_patient_overview(self, patient_id: str, sections: Optional[List[str]] = None,
+                             include_sensitive: bool = False) -> Optional[Dict]:
+        """Patient chart with the requested sections, one query per section"""
+        patient = self.get_patient(patient_id, include_sensitive)
+        if not patient:
+            return None
+        
+        sections = self._overview_sections(sections)
+        overview = {'patient': patient.to_dict(include_sensitive)}
+        
+        # Children resolve .patient from the identity map, so serialization adds no queries
+        if 'appointments' in sections:
+            overview['appointments'] = [a.to_dict() for a in Appointment.query.filter_by(
+                patient_id=patient_id
+            ).order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc())]
+        
+        if 'treatment_plans' in sections:
+            overview['treatment_plans'] = [t.to_dict() for t in TreatmentPlan.query.filter_by(
+                patient_id=patient_id
+            ).order_by(TreatmentPlan.created_at.desc())]
+        
+        if 'invoices' in sections:
+            overview['invoices'] = [i.to_dict() for i in Invoice.query.filter_by(
+                patient_id=patient_id
+            ).order_by(Invoice.issue_date.desc())]
+        
+        if 'devis' in sections:
+            overview['devis'] = [d.to_dict() for d in Devis.query.filter_by(
+                patient_id=patient_id
+            ).order_by(Devis.issue_date.desc())]
+        
+        if 'statistics' in sections:
+            overview['statistics'] = self.get_patients_statistics([patient_id])[patient_id]
+        
+        return overview
+    
+    def get_overview_etag(self, patient_id: str, sections: Optional[List[str]] = None,
+                          include_sensitive: bool = False) -> Optional[str]:
+        """Version of an overview: MAX(updated_at) and COUNT of every included table, in one query.
+        
+        The variant with the decrypted medical fields gets its own ETag.
+        """
+        sections = self._overview_sections(sections)
+        models = []
+        for section in sections:
+            models.extend(m for m in OVERVIEW_SECTIONS[section] if m not in models)
+        
+        columns = table_version(Patient, Patient.id == patient_id, Patient.deleted_at.is_(None))
+        for model in models:
+            columns.extend(table_version(model, model.patient_id == patient_id))
+        
+        version = db.session.query(*columns).one()
+        if not version[0]:
+            return None
+        
+        raw = '|'.join([','.join(sections), 'sensitive' if include_sensitive else ''] + [str(v) for v in version])
+        return hashlib.md5(raw.encode()).hexdigest()
+    
+    def _overview_sections(self, sections: Optional[List[str]]) -> List[str]:
+        if not sections:
+            return list(OVERVIEW_SECTIONS)
+        
+        unknown = set(sections) - set(OVERVIEW_SECTIONS)
+        if unknown:
+            raise ValueError(f"Sections inconnues: {', '.join(sorted(unknown))}")
+        return [section for section in OVERVIEW_SECTIONS if section in sections]
+    
+    def get_patients_statistics(self, patient_ids: List[str]) -> Dict[str, Dict]:
+        """Statistics for many patients at once: one grouped query per table"""
+        stats = {pid: self._empty_statistics() for pid in dict.fromkeys(patient_ids)}
+        ids = list(stats)
+        
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            
+            appointment_rows = db.session.query(
+                Appointment.patient_id,
+                func.count(Appointment.id),
+                func.sum(case((Appointment.status == 'completed', 1), else_=0))
+            ).filter(Appointment.patient_id.in_(chunk)).group_by(Appointment.patient_id)
+            for pid, total, completed in appointment_rows:
+                stats[pid]['total_appointments'] = total
+                stats[pid]['completed_appointments'] = int(completed or 0)
+            
+            plan_rows = db.session.query(
+                TreatmentPlan.patient_id, func.count(TreatmentPlan.id)
+            ).filter(
+                TreatmentPlan.patient_id.in_(chunk), TreatmentPlan.status == 'active'
+            ).group_by(TreatmentPlan.patient_id)
+            for pid, active in plan_rows:
+                stats[pid]['active_treatment_plans'] = active
+            
+            invoice_rows = db.session.query(
+                Invoice.patient_id,
+                func.count(Invoice.id),
+                func.sum(case((Invoice.status == 'pending', 1), else_=0)),
+                func.coalesce(func.sum(Invoice.total_amount), 0)
+            ).filter(Invoice.patient_id.in_(chunk)).group_by(Invoice.patient_id)
+            for pid, total, unpaid, revenue in invoice_rows:
+                stats[pid]['total_invoices'] = total
+                stats[pid]['unpaid_invoices'] = int(unpaid or 0)
+                stats[pid]['total_revenue'] = to_money(revenue)
+        
+        return stats
+    
+    def _empty_statistics(self) -> Dict:
         return {
-            'total_appointments': patient.appointments.count(),
-            'completed_appointments': patient.appointments.filter_by(status='completed').count(),
-            'active_treatment_plans': patient.treatment_plans.filter_by(status='active').count(),
-            'total_invoices': patient.invoices.count(),
-            'unpaid_invoices': patient.invoices.filter_by(status='pending').count(),
-            'total_revenue': sum(invoice.total_amount for invoice in patient.invoices)
-        }
\ No newline at end of file
+            'total_appointments': 0,
+            'completed_appointments': 0,
+            'active_treatment_plans': 0,
+            'total_invoices': 0,
+            'unpaid_invoices': 0,
+            'total_revenue': Decimal('0.00')
+        }
@@ -0,0 +1,385 @@
+import io
+import uuid
+import hashlib
+import logging
+import xml.etree.ElementTree as ElementTree
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import bindparam, case, func, or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Invoice, Payment, UnmatchedPayment, Money
+from app.services.financial_service import OUTSTANDING_STATUSES
+from app.utils.money import from_centimes, to_money
+from app.utils.payment_references import invoice_reference_keys, reference_key
+
+logger = logging.getLogger(__name__)
+
+# Payment method of the payments booked from bank files
+BANK_TRANSFER = 'bank_transfer'
+
+# Ids per IN (...) while applying a file
+RECONCILE_CHUNK = 500
+
+# Unmatched credits listed in a report; the count covers all of them
+MAX_REPORTED_UNMATCHED = 1000
+
+# V11 type 3 records: 100 characters; codes ending in 5 are reversals, 995/999 close the file
+V11_RECORD_LENGTH = 100
+V11_TOTAL_CODES = ('995', '999')
+
+class PaymentReconciliationService:
+    """Books bank credit files against open invoices.
+    
+    Reads ISO 20022 camt.054 notifications or V11 (ESR/QR reference) files
+    as a stream and matches the QR or RF reference of each credit through an
+    in-memory index of the open invoices, whose rows are locked until
+    commit. Every matched payment is then booked in one transaction: one
+    bulk INSERT of the payments and one executemany UPDATE adding to
+    paid_amount, with the status derived in SQL. Credits that cannot be
+    booked as they are go to the unmatched_payments review queue in the same
+    transaction. A credit whose bank reference is already booked or queued
+    is skipped, so importing a file twice is harmless; unique indexes on
+    those references turn a concurrent second import into an error.
+    """
+    
+    def __init__(self, financial_service=None, rollup_service=None):
+        self.financial_service = financial_service
+        self.rollup_service = rollup_service
+    
+    def reconcile(self, stream, fmt: str = 'camt', filename: Optional[str] = None,
+                  dry_run: bool = False) -> Dict:
+        """Reconcile a camt.054 ('camt') or V11 ('v11') file from a text or binary stream; returns a report"""
+        report = {'credits': 0, 'matched': 0, 'applied_amount': Decimal('0.00'), 'duplicates': 0,
+                  'ignored': 0, 'unmatched': 0, 'unmatched_credits': []}
+        credits = list(iter_bank_credits(stream, fmt))
+        booked = self._booked_references({credit['bank_reference'] for credit in credits})
+        
+        new_credits = []
+        for credit in credits:
+            report['credits'] += 1
+            if not credit['booked']:
+                report['ignored'] += 1
+            elif credit['bank_reference'] in booked:
+                report['duplicates'] += 1
+            else:
+                booked.add(credit['bank_reference'])
+                credit['key'] = reference_key(credit['reference'])
+                new_credits.append(credit)
+        
+        index = self._open_invoice_index({credit['key'] for credit in new_credits} - {None}, lock=not dry_run)
+        payments, reviews, deltas = [], [], defaultdict(Decimal)
+        for credit in new_credits:
+            reason, invoice = self._match(credit, index)
+            if reason is not None:
+                reviews.append(self._review_row(credit, reason, invoice, filename))
+                continue
+            
+            invoice['paid_amount'] += credit['amount']
+            deltas[invoice['invoice_id']] += credit['amount']
+            payments.append({
+                'id': str(uuid.uuid4()), 'invoice_id': invoice['invoice_id'],
+                'payment_date': credit['booking_date'] or datetime.utcnow().date(), 'amount': credit['amount'],
+                'payment_method': BANK_TRANSFER, 'reference_number': credit['bank_reference'],
+                'notes': f"Rapprochement {filename}" if filename else 'Rapprochement bancaire'
+            })
+            report['matched'] += 1
+            report['applied_amount'] += credit['amount']
+        
+        report['unmatched'] = len(reviews)
+        report['unmatched_credits'] = [
+            {key: value.isoformat() if isinstance(value, date) else value for key, value in row.items()
+             if key in ('reference', 'amount', 'booking_date', 'bank_reference', 'debtor_name', 'reason',
+                        'invoice_id')}
+            for row in reviews[:MAX_REPORTED_UNMATCHED]
+        ]
+        
+        if not dry_run and (payments or reviews):
+            try:
+                self._apply(payments, deltas, reviews)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                raise ValueError("Des crédits de ce fichier viennent d'être comptabilisés par un autre import, "
+                                 "réessayez")
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        logger.info(f"Reconciled {filename or 'bank file'}{' [dry run]' if dry_run else ''}: "
+                    f"{report['matched']} of {report['credits']} credits booked ({report['applied_amount']} CHF), "
+                    f"{report['unmatched']} to review, {report['duplicates']} already booked")
+        return report
+    
+    def list_unmatched(self, status: Optional[str] = 'open', limit: int = 100, offset: int = 0) -> Dict:
+        """Review queue entries, oldest booking first"""
+        query = UnmatchedPayment.query
+        if status:
+            query = query.filter(UnmatchedPayment.status == status)
+        
+        total = query.count()
+        items = query.order_by(
+            UnmatchedPayment.booking_date, UnmatchedPayment.created_at
+        ).limit(limit).offset(offset).all()
+        return {'total': total, 'items': [item.to_dict() for item in items]}
+    
+    def resolve_unmatched(self, item_id: str, invoice_id: str, amount=None) -> Payment:
+        """Book an unmatched credit on an invoice chosen by hand.
+        
+        Reversals are debits and cannot be booked as payments; a credit in
+        another currency needs the CHF amount actually received.
+        """
+        item = self._open_item(item_id)
+        if item.reason == 'reversal':
+            raise ValueError("Une extourne ne peut pas être comptabilisée comme paiement")
+        if (item.currency or 'CHF') != 'CHF' and amount is None:
+            raise ValueError(f"Montant en CHF requis pour un crédit en {item.currency}")
+        
+        amount = to_money(amount) if amount is not None else item.amount
+        if amount <= 0:
+            raise ValueError("Le montant doit être positif")
+        if Invoice.query.get(invoice_id) is None:
+            raise ValueError("Facture introuvable")
+        
+        item.status = 'resolved'
+        item.invoice_id = invoice_id
+        item.resolved_at = datetime.utcnow()
+        
+        # add_payment commits the entry together with the payment
+        return self.financial_service.add_payment(
+            invoice_id, amount, BANK_TRANSFER, reference_number=item.bank_reference,
+            notes=f"Rapprochement manuel {item.source_file or ''}".strip(), payment_date=item.booking_date
+        )
+    
+    def dismiss_unmatched(self, item_id: str) -> UnmatchedPayment:
+        """Close an unmatched credit without booking it (refunded, not ours, ...)"""
+        item = self._open_item(item_id)
+        item.status = 'dismissed'
+        item.resolved_at = datetime.utcnow()
+        db.session.commit()
+        return item
+    
+    def _open_item(self, item_id: str) -> UnmatchedPayment:
+        item = UnmatchedPayment.query.get(item_id)
+        if item is None:
+            raise ValueError("Paiement à vérifier introuvable")
+        if item.status != 'open':
+            raise ValueError("Ce paiement a déjà été traité")
+        return item
+    
+    def _booked_references(self, references) -> set:
+        """Bank references of the file already booked as payments or queued for review"""
+        references = [reference for reference in references if reference]
+        booked = set()
+        for start in range(0, len(references), RECONCILE_CHUNK):
+            chunk = references[start:start + RECONCILE_CHUNK]
+            booked.update(row[0] for row in db.session.query(Payment.reference_number).filter(
+                Payment.reference_number.in_(chunk), Payment.payment_method == BANK_TRANSFER
+            ))
+            booked.update(row[0] for row in db.session.query(UnmatchedPayment.bank_reference).filter(
+                UnmatchedPayment.bank_reference.in_(chunk)
+            ))
+        return booked
+    
+    def _open_invoice_index(self, keys: set, lock: bool = False) -> Dict[str, List[Dict]]:
+        """{reference key: [open invoice]} for the keys found in a file.
+        
+        The open invoice numbers are scanned alone; amounts are then read
+        for the invoices a key of the file points to, with FOR UPDATE if
+        lock is set so the balances cannot change before commit.
+        """
+        if not keys:
+            return {}
+        
+        keys_by_id = defaultdict(list)
+        for invoice_id, invoice_number in db.session.query(Invoice.id, Invoice.invoice_number).filter(
+            Invoice.status.in_(OUTSTANDING_STATUSES)
+        ).yield_per(5000):
+            for key in invoice_reference_keys(invoice_number) & keys:
+                keys_by_id[invoice_id].append(key)
+        
+        index = defaultdict(list)
+        invoice_ids = list(keys_by_id)
+        for start in range(0, len(invoice_ids), RECONCILE_CHUNK):
+            query = db.session.query(
+                Invoice.id, Invoice.issue_date, Invoice.total_amount, Invoice.paid_amount, Invoice.status
+            ).filter(Invoice.id.in_(invoice_ids[start:start + RECONCILE_CHUNK]))
+            for row in (query.with_for_update() if lock else query):
+                invoice = {
+                    'invoice_id': row.id, 'issue_date': row.issue_date, 'total_amount': row.total_amount or 0,
+                    'paid_amount': row.paid_amount or 0, 'status': row.status
+                }
+                for key in keys_by_id[row.id]:
+                    index[key].append(invoice)
+        return index
+    
+    def _match(self, credit: Dict, index: Dict) -> Tuple[Optional[str], Optional[Dict]]:
+        """(reason to review or None, matched invoice)"""
+        if not credit['credit']:
+            return 'reversal', None
+        if credit['currency'] != 'CHF':
+            return 'currency', None
+        if not credit['reference']:
+            return 'no_reference', None
+        if credit['key'] is None:
+            return 'invalid_reference', None
+        
+        candidates = index.get(credit['key'])
+        if not candidates:
+            return 'no_open_invoice', None
+        if len(candidates) > 1:
+            return 'ambiguous_reference', None
+        
+        invoice = candidates[0]
+        if credit['amount'] > invoice['total_amount'] - invoice['paid_amount']:
+            return 'overpayment', invoice
+        return None, invoice
+    
+    def _review_row(self, credit: Dict, reason: str, invoice: Optional[Dict], filename: Optional[str]) -> Dict:
+        return {
+            'id': str(uuid.uuid4()), 'source_file': filename, 'bank_reference': credit['bank_reference'],
+            'reference': (credit['reference'] or '')[:50] or None, 'amount': credit['amount'],
+            'currency': credit['currency'], 'booking_date': credit['booking_date'],
+            'debtor_name': (credit['debtor_name'] or '')[:200] or None, 'reason': reason,
+            'invoice_id': invoice['invoice_id'] if invoice else None, 'status': 'open'
+        }
+    
+    def _apply(self, payments: List[Dict], deltas: Dict[str, Decimal], reviews: List[Dict]):
+        invoice_ids = list(deltas)
+        chunks = [invoice_ids[start:start + RECONCILE_CHUNK] for start in range(0, len(invoice_ids), RECONCILE_CHUNK)]
+        
+        # Core writes skip the flush hooks that maintain the revenue rollups
+        if self.rollup_service is not None:
+            for chunk in chunks:
+                self.rollup_service.subtract_where(Invoice, Invoice.id.in_(chunk))
+        
+        # Relative to the stored balance, so a payment committed meanwhile is never overwritten
+        table = Invoice.__table__
+        paid = func.coalesce(table.c.paid_amount, 0) + bindparam('delta', type_=Money)
+        if deltas:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('invoice_id')).values(
+                    paid_amount=paid,
+                    # IN (...) cannot expand in an executemany
+                    status=case(
+                        (or_(*(table.c.status == status for status in OUTSTANDING_STATUSES)),
+                         case((paid >= table.c.total_amount, 'paid'), else_='partial')),
+                        else_=table.c.status
+                    ),
+                    updated_at=datetime.utcnow()
+                ),
+                [{'invoice_id': invoice_id, 'delta': delta} for invoice_id, delta in deltas.items()]
+            )
+        
+        if self.rollup_service is not None:
+            for chunk in chunks:
+                self.rollup_service.add_rows(Invoice, [row._asdict() for row in db.session.query(
+                    Invoice.issue_date, Invoice.status, Invoice.total_amount, Invoice.paid_amount
+                ).filter(Invoice.id.in_(chunk))])
+        
+        if payments:
+            db.session.execute(Payment.__table__.insert(), payments)
+            if self.rollup_service is not None:
+                self.rollup_service.add_rows(Payment, payments)
+        
+        if reviews:
+            db.session.execute(UnmatchedPayment.__table__.insert(), reviews)
+
+
+def iter_bank_credits(stream, fmt: str = 'camt') -> Iterator[Dict]:
+    """Yield the bank transactions of a camt.054 or V11 file as dicts.
+    
+    Keys: reference, amount (positive Decimal), currency, credit (False for
+    debits and reversals), booked (False for pending camt entries),
+    booking_date, bank_reference, debtor_name.
+    """
+    if fmt == 'camt':
+        return _iter_camt(stream)
+    if fmt == 'v11':
+        return _iter_v11(stream)
+    raise ValueError(f"Format de fichier bancaire inconnu: {fmt}")
+
+def _iter_camt(stream) -> Iterator[Dict]:
+    """Entries of a camt.054 notification, parsed one <Ntry> at a time whatever the schema version"""
+    namespace = None
+    for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+        if namespace is None:
+            namespace = element.tag[:element.tag.index('}') + 1] if element.tag.startswith('{') else ''
+        if event == 'end' and element.tag == f'{namespace}Ntry':
+            yield from _camt_entry_credits(element, namespace)
+            element.clear()
+
+def _camt_entry_credits(entry, namespace: str) -> Iterator[Dict]:
+    def text(element, *paths):
+        for path in paths:
+            found = element.find('/'.join(namespace + part for part in path.split('/')))
+            if found is not None and found.text and found.text.strip():
+                return found.text.strip()
+        return None
+    
+    def amount(element):
+        for path in ('Amt', 'AmtDtls/TxAmt/Amt'):
+            found = element.find('/'.join(namespace + part for part in path.split('/')))
+            if found is not None and found.text:
+                return to_money(found.text.strip()), found.get('Ccy', 'CHF')
+        return None
+    
+    status = text(entry, 'Sts/Cd', 'Sts')
+    reversal = text(entry, 'RvslInd') == 'true'
+    booked_on = text(entry, 'BookgDt/Dt', 'BookgDt/DtTm', 'ValDt/Dt', 'ValDt/DtTm')
+    entry_reference = text(entry, 'AcctSvcrRef')
+    
+    details = entry.findall(f'{namespace}NtryDtls/{namespace}TxDtls')
+    for position, transaction in enumerate(details or [entry], start=1):
+        # A single transaction may leave its amount on the entry
+        value = amount(transaction) or (amount(entry) if len(details) <= 1 else None)
+        if value is None:
+            continue
+        
+        indicator = text(transaction, 'CdtDbtInd') or text(entry, 'CdtDbtInd')
+        credit = {
+            'reference': text(transaction, 'RmtInf/Strd/CdtrRefInf/Ref'),
+            'amount': value[0],
+            'currency': value[1],
+            'credit': indicator == 'CRDT' and not reversal,
+            'booked': status in (None, 'BOOK'),
+            'booking_date': datetime.strptime(booked_on[:10], '%Y-%m-%d').date() if booked_on else None,
+            'debtor_name': text(transaction, 'RltdPties/Dbtr/Pty/Nm', 'RltdPties/Dbtr/Nm'),
+        }
+        credit['bank_reference'] = (
+            text(transaction, 'Refs/AcctSvcrRef')
+            or (f"{entry_reference}/{position}" if entry_reference else None)
+            or _fingerprint(credit['booking_date'], credit['reference'], credit['amount'], credit['debtor_name'],
+                            position)
+        )
+        yield credit
+
+def _iter_v11(stream) -> Iterator[Dict]:
+    """Credit records (type 3, 100 characters) of a V11 file; the total record is skipped"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='ascii', errors='replace', newline='')
+    
+    for line_number, line in enumerate(stream, start=1):
+        record = line.rstrip('\r\n')
+        if not record.strip() or record[:3] in V11_TOTAL_CODES:
+            continue
+        if len(record) != V11_RECORD_LENGTH or not record[39:49].isdigit():
+            raise ValueError(f"Ligne {line_number}: enregistrement V11 de type 3 attendu")
+        
+        credited_on = record[71:77]
+        yield {
+            'reference': record[12:39],
+            'amount': from_centimes(record[39:49]),
+            'currency': 'CHF',
+            'credit': record[2] != '5',
+            'booked': True,
+            'booking_date': datetime.strptime(credited_on, '%y%m%d').date() if credited_on.isdigit() else None,
+            'debtor_name': None,
+            # Records carry no unique id; the whole record identifies the credit
+            'bank_reference': _fingerprint(record),
+        }
+
+def _fingerprint(*parts) -> str:
+    return 'sha1:' + hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
@@ -1,7 +1,8 @@
 import os
 import tempfile
 from datetime import datetime
-from typing import Dict, Optional
+from decimal import Decimal
+from typing import Dict, List, Optional
 from fpdf import FPDF
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
@@ -50,7 +51,7 @@ class PDFService:
         # Totals
         data.extend([
             ['', '', '', 'Sous-total:', f"{invoice_data['subtotal']:.2f} CHF"],
-            ['', '', '', 'TVA (7.7%):', f"{invoice_data['tax_amount']:.2f} CHF"],
+            *self._tax_rows(invoice_data),
             ['', '', '', 'Total:', f"{invoice_data['total_amount']:.2f} CHF"],
             ['', '', '', 'Payé:', f"{invoice_data['paid_amount']:.2f} CHF"],
             ['', '', '', 'Solde dû:', f"{invoice_data['balance_due']:.2f} CHF"]
@@ -112,7 +113,7 @@ class PDFService:
         # Totals
         data.extend([
             ['', '', '', 'Sous-total:', f"{devis_data['subtotal']:.2f} CHF"],
-            ['', '', '', 'TVA (7.7%):', f"{devis_data['tax_amount']:.2f} CHF"],
+            *self._tax_rows(devis_data),
             ['', '', '', 'Total:', f"{devis_data['total_amount']:.2f} CHF"]
         ])
         
@@ -140,6 +141,17 @@ class PDFService:
         doc.build(story)
         return filepath
     
+    def _tax_rows(self, document_data: Dict) -> List[List[str]]:
+        """VAT row, with the rate when there is a single one (tax_rates, e.g. [0.081]), then any rounding_amount"""
+        rates = document_data.get('tax_rates') or []
+        label = f"TVA ({(Decimal(str(rates[0])) * 100).normalize():f}%):" if len(rates) == 1 else 'TVA:'
+        rows = [['', '', '', label, f"{document_data['tax_amount']:.2f} CHF"]]
+        
+        rounding = document_data.get('rounding_amount') or 0
+        if rounding:
+            rows.append(['', '', '', 'Arrondi:', f"{rounding:.2f} CHF"])
+        return rows
+    
     def generate_treatment_plan_pdf(self, treatment_data: Dict) -> str:
         """Generate PDF for a treatment plan"""
         filename = f"treatment_plan_{treatment_data['patient_name'].replace(' ', '_')}.pdf"
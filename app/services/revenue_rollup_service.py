@@ -0,0 +1,190 @@
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List
+from sqlalchemy import event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import Invoice, Payment, ScheduledPayment, Devis, RevenueRollup, Money
+from app.utils.money import to_money
+
+logger = logging.getLogger(__name__)
+
+# What each model adds to the rollups: its source name, day column, bucket columns and summed amounts
+ROLLUP_SOURCES = {
+    Invoice: {'source': 'invoice', 'day': 'issue_date', 'status': 'status',
+              'amount': 'total_amount', 'paid_amount': 'paid_amount'},
+    Payment: {'source': 'payment', 'day': 'payment_date', 'payment_method': 'payment_method',
+              'amount': 'amount'},
+    ScheduledPayment: {'source': 'scheduled', 'day': 'due_date', 'status': 'status', 'amount': 'amount'},
+    Devis: {'source': 'devis', 'day': 'issue_date', 'status': 'status', 'amount': 'total_amount'},
+}
+
+BUCKET_COLUMNS = ('day', 'source', 'status', 'payment_method')
+TOTAL_COLUMNS = ('count', 'amount', 'paid_amount')
+
+# Old values of changed rows are read back in chunks of this many ids
+LOOKUP_CHUNK = 500
+
+class RevenueRollupService:
+    """Daily revenue rollups, maintained incrementally.
+    
+    Every flush that creates, changes or deletes an invoice, payment,
+    scheduled payment or devis moves its contribution between rollup rows in
+    the same transaction, so the rollups commit and roll back with the data.
+    Writes that bypass the ORM unit of work (bulk inserts, bulk deletes) must
+    report their rows with add_rows / subtract_where; rebuild() recomputes
+    everything from the source tables.
+    """
+    
+    def register(self):
+        """Attach the flush hooks to the application session"""
+        for name, listener in (('before_flush', _capture_previous),
+                               ('after_flush', _apply_flush)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+    
+    def rebuild(self) -> int:
+        """Recompute every rollup row from the source tables in one transaction; returns the row count"""
+        table = RevenueRollup.__table__
+        try:
+            db.session.execute(table.delete())
+            for model in ROLLUP_SOURCES:
+                db.session.execute(table.insert().from_select(
+                    BUCKET_COLUMNS + TOTAL_COLUMNS, _grouped(model)
+                ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        count = db.session.query(func.count(RevenueRollup.id)).scalar()
+        logger.info(f"Rebuilt revenue rollups: {count} rows")
+        return count
+    
+    def add_rows(self, model, rows: Iterable[Dict]):
+        """Account for rows inserted in bulk (dicts of column values), in the current transaction"""
+        deltas = _new_deltas()
+        for row in rows:
+            _accumulate(deltas, model, row.get, 1)
+        _upsert(db.session.connection(), deltas)
+    
+    def subtract_where(self, model, *criteria):
+        """Take out the rows matching criteria before they are deleted in bulk"""
+        deltas = _new_deltas()
+        for row in db.session.execute(_grouped(model).where(*criteria)):
+            key = tuple(row[:len(BUCKET_COLUMNS)])
+            for i, value in enumerate(row[len(BUCKET_COLUMNS):]):
+                deltas[key][i] -= value
+        _upsert(db.session.connection(), deltas)
+
+
+def _new_deltas() -> Dict[tuple, List]:
+    return defaultdict(lambda: [0, 0, 0])
+
+def _accumulate(deltas: Dict, model, get: Callable, sign: int):
+    """Add (sign=1) or remove (sign=-1) one row's contribution, reading its columns with get"""
+    spec = ROLLUP_SOURCES[model]
+    day = get(spec['day'])
+    if day is None:
+        return
+    
+    key = (
+        day,
+        spec['source'],
+        (get(spec['status']) or '') if 'status' in spec else '',
+        (get(spec['payment_method']) or '') if 'payment_method' in spec else ''
+    )
+    totals = deltas[key]
+    totals[0] += sign
+    totals[1] += sign * to_money(get(spec['amount']) or 0)
+    if 'paid_amount' in spec:
+        totals[2] += sign * to_money(get(spec['paid_amount']) or 0)
+
+def _grouped(model):
+    """SELECT of rollup rows (bucket columns, then totals) computed from a source table"""
+    spec = ROLLUP_SOURCES[model]
+    day = getattr(model, spec['day'])
+    status = func.coalesce(getattr(model, spec['status']), '') if 'status' in spec else literal('')
+    method = (func.coalesce(getattr(model, spec['payment_method']), '')
+              if 'payment_method' in spec else literal(''))
+    paid = (func.coalesce(func.sum(getattr(model, spec['paid_amount'])), 0)
+            if 'paid_amount' in spec else literal(0, Money))
+    
+    return select(
+        day, literal(spec['source']), status, method,
+        func.count(), func.coalesce(func.sum(getattr(model, spec['amount'])), 0), paid
+    ).where(day.isnot(None)).group_by(day, status, method)
+
+def _changed(obj) -> bool:
+    """True if a column the rollups depend on was modified"""
+    spec = ROLLUP_SOURCES[type(obj)]
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes()
+               for name, column in spec.items() if name != 'source')
+
+def _upsert(connection, deltas: Dict):
+    """Add deltas to their rollup rows, creating missing rows"""
+    rows = [
+        dict(zip(BUCKET_COLUMNS + TOTAL_COLUMNS, key + tuple(totals)))
+        for key, totals in deltas.items() if any(totals)
+    ]
+    if not rows:
+        return
+    
+    table = RevenueRollup.__table__
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        insert = dialect.insert(table)
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=list(BUCKET_COLUMNS),
+            set_={column: table.c[column] + insert.excluded[column] for column in TOTAL_COLUMNS}
+        ), rows)
+        return
+    
+    for row in rows:
+        result = connection.execute(
+            table.update().where(*(table.c[column] == row[column] for column in BUCKET_COLUMNS)).values(
+                {column: table.c[column] + row[column] for column in TOTAL_COLUMNS}
+            )
+        )
+        if not result.rowcount:
+            connection.execute(table.insert(), row)
+
+def _capture_previous(session, flush_context, instances):
+    """before_flush: take out the stored contribution of changed and deleted rows.
+    
+    Old values are read from the database rather than from attribute
+    history, which is empty for attributes that were expired when assigned.
+    """
+    changed = [obj for obj in session.dirty if type(obj) in ROLLUP_SOURCES and _changed(obj)]
+    deleted = [obj for obj in session.deleted if type(obj) in ROLLUP_SOURCES]
+    
+    deltas = _new_deltas()
+    by_model = defaultdict(list)
+    for obj in changed + deleted:
+        by_model[type(obj)].append(obj.id)
+    
+    for model, ids in by_model.items():
+        table = model.__table__
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            rows = session.connection().execute(
+                select(table).where(table.c.id.in_(ids[start:start + LOOKUP_CHUNK]))
+            ).mappings()
+            for row in rows:
+                _accumulate(deltas, model, row.get, -1)
+    
+    session.info['rollup_deltas'] = deltas
+    session.info['rollup_changed'] = changed
+
+def _apply_flush(session, flush_context):
+    """after_flush: add the new contribution of inserted and changed rows, then write the deltas"""
+    deltas = session.info.pop('rollup_deltas', None)
+    changed = session.info.pop('rollup_changed', [])
+    if deltas is None:
+        return
+    
+    # Column defaults (status, paid_amount) are populated on new objects by now
+    for obj in [*(obj for obj in session.new if type(obj) in ROLLUP_SOURCES), *changed]:
+        _accumulate(deltas, type(obj), lambda column: getattr(obj, column), 1)
+    
+    _upsert(session.connection(), deltas)
@@ -0,0 +1,233 @@
+import bisect
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam
+from app import db
+from app.models import DentalPricing, Invoice, InvoiceItem
+from app.utils.cache import LRUCache
+from app.utils.money import round_to_5_centimes, to_money
+
+logger = logging.getLogger(__name__)
+
+# Swiss standard VAT rates; a rule without valid_to stays in force
+SWISS_VAT_RULES = [
+    {'rate': '0.080', 'valid_from': '2011-01-01', 'valid_to': '2017-12-31'},
+    {'rate': '0.077', 'valid_from': '2018-01-01', 'valid_to': '2023-12-31'},
+    {'rate': '0.081', 'valid_from': '2024-01-01'},
+]
+
+# Invoices recomputed per transaction
+RECOMPUTE_CHUNK = 500
+
+class TaxService:
+    """VAT computation from dated rules, optionally per TARMED category.
+    
+    A rule is {'rate', 'valid_from', 'valid_to' (optional), 'category'
+    (optional)}. Rules without a category set the standard rate; a category
+    rule overrides it for the pricing rows of that category, e.g.
+    {'rate': '0', 'category': 'Hygiène', 'valid_from': '2024-01-01'} for an
+    exempt service. Rules are compiled once into per-category date tables
+    searched with bisect.
+    """
+    
+    def __init__(self, rules: Optional[List[Dict]] = None, category_cache_ttl: int = 300):
+        self.rules = rules or SWISS_VAT_RULES
+        self._table = self._compile(self.rules)
+        self._has_category_rules = any(category is not None for category in self._table)
+        
+        # TARMED code -> pricing category, only needed when category rules exist
+        self._categories = LRUCache(models=(DentalPricing,), maxsize=4096, ttl_seconds=category_cache_ttl)
+    
+    def rate_for(self, on: date, category: Optional[str] = None) -> Decimal:
+        """VAT rate in force on a day for a pricing category"""
+        rate = self._lookup(category, on) if category is not None else None
+        if rate is None:
+            rate = self._lookup(None, on)
+        if rate is None:
+            raise ValueError(f"Aucun taux de TVA défini pour le {on:%d.%m.%Y}")
+        return rate
+    
+    def compute(self, items: List[Dict], on: Optional[date] = None) -> Dict:
+        """Subtotal, tax and total of line items billed on a day (default today).
+        
+        Each item needs 'total_price' and may carry a 'tarmed_code'. Line
+        totals are grouped by rate and taxed once per rate, and tax_amount is
+        the sum of the per-rate taxes. The total payable is rounded to 5
+        centimes; that rounding is returned on its own, so
+        subtotal + tax_amount + rounding == total_amount exactly.
+        """
+        on = on or datetime.utcnow().date()
+        categories = self.categories_for(item.get('tarmed_code') for item in items)
+        
+        taxable = defaultdict(lambda: Decimal('0.00'))
+        for item in items:
+            rate = self.rate_for(on, categories.get(item.get('tarmed_code')))
+            taxable[rate] += to_money(item['total_price'])
+        
+        breakdown = [
+            {'rate': rate, 'taxable_amount': amount, 'tax_amount': to_money(amount * rate)}
+            for rate, amount in sorted(taxable.items(), reverse=True)
+        ]
+        subtotal = sum((line['taxable_amount'] for line in breakdown), Decimal('0.00'))
+        tax = sum((line['tax_amount'] for line in breakdown), Decimal('0.00'))
+        total_amount = round_to_5_centimes(subtotal + tax)
+        
+        return {
+            'subtotal': subtotal,
+            'tax_amount': tax,
+            'total_amount': total_amount,
+            'rounding': total_amount - subtotal - tax,
+            'breakdown': breakdown
+        }
+    
+    def categories_for(self, tarmed_codes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """Pricing category of each code, in one query for the codes not cached yet"""
+        if not self._has_category_rules:
+            return {}
+        
+        categories = {}
+        missing = set()
+        for code in tarmed_codes:
+            if not code or code in categories:
+                continue
+            category = self._categories.get(code)
+            if category is None:
+                missing.add(code)
+            else:
+                categories[code] = category
+        
+        if missing:
+            for code, category in db.session.query(DentalPricing.tarmed_code, DentalPricing.category).filter(
+                DentalPricing.tarmed_code.in_(missing)
+            ):
+                # '' caches "no category" as well
+                self._categories.set(code, category or '')
+                categories[code] = category or ''
+        return {code: category for code, category in categories.items() if category}
+    
+    def recompute_invoices(self, start_date: date, end_date: date, dry_run: bool = False,
+                           rollup_service=None) -> Dict:
+        """Recompute stored totals of invoices issued between two days with the current rules.
+        
+        Works on line totals already stored, chunk by chunk with one UPDATE
+        executemany each. Statuses follow the new totals for pending,
+        partial and paid invoices.
+        """
+        if start_date > end_date:
+            raise ValueError("La date de début doit précéder la date de fin")
+        
+        report = {'invoices': 0, 'changed': 0, 'total_delta': Decimal('0.00')}
+        invoice_ids = [row[0] for row in db.session.query(Invoice.id).filter(
+            Invoice.issue_date.between(start_date, end_date)
+        ).order_by(Invoice.issue_date, Invoice.id)]
+        
+        for start in range(0, len(invoice_ids), RECOMPUTE_CHUNK):
+            try:
+                self._recompute_chunk(invoice_ids[start:start + RECOMPUTE_CHUNK], report, dry_run, rollup_service)
+                if not dry_run:
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        logger.info(f"Recomputed VAT of invoices {start_date} - {end_date}{' [dry run]' if dry_run else ''}: "
+                    f"{report['changed']} of {report['invoices']} changed, delta {report['total_delta']} CHF")
+        return report
+    
+    def _recompute_chunk(self, invoice_ids: List[str], report: Dict, dry_run: bool, rollup_service):
+        items = defaultdict(list)
+        for invoice_id, tarmed_code, total_price in db.session.query(
+            InvoiceItem.invoice_id, InvoiceItem.tarmed_code, InvoiceItem.total_price
+        ).filter(InvoiceItem.invoice_id.in_(invoice_ids)):
+            items[invoice_id].append({'tarmed_code': tarmed_code, 'total_price': total_price})
+        
+        updates = []
+        for invoice in db.session.query(
+            Invoice.id, Invoice.issue_date, Invoice.subtotal, Invoice.tax_amount, Invoice.rounding_amount,
+            Invoice.total_amount, Invoice.paid_amount, Invoice.status
+        ).filter(Invoice.id.in_(invoice_ids)):
+            report['invoices'] += 1
+            if not items[invoice.id]:
+                continue
+            
+            totals = self.compute(items[invoice.id], on=invoice.issue_date)
+            if (totals['subtotal'], totals['tax_amount'], totals['rounding'], totals['total_amount']) == (
+                invoice.subtotal, invoice.tax_amount, invoice.rounding_amount, invoice.total_amount
+            ):
+                continue
+            
+            status = invoice.status
+            if status in ('pending', 'partial', 'paid'):
+                paid = invoice.paid_amount or 0
+                status = 'paid' if paid >= totals['total_amount'] else 'partial' if paid > 0 else 'pending'
+            
+            updates.append({
+                'invoice_id': invoice.id, 'issue_date': invoice.issue_date, 'paid_amount': invoice.paid_amount,
+                'status': status, 'subtotal': totals['subtotal'], 'tax_amount': totals['tax_amount'],
+                'rounding_amount': totals['rounding'], 'total_amount': totals['total_amount'],
+                'tax_breakdown': stored_breakdown(totals['breakdown'])
+            })
+            report['changed'] += 1
+            report['total_delta'] += totals['total_amount'] - (invoice.total_amount or 0)
+        
+        if dry_run or not updates:
+            return
+        
+        # Core updates skip the flush hooks that maintain the revenue rollups
+        if rollup_service is not None:
+            rollup_service.subtract_where(Invoice, Invoice.id.in_([row['invoice_id'] for row in updates]))
+        
+        table = Invoice.__table__
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('invoice_id')).values(
+                subtotal=bindparam('subtotal'), tax_amount=bindparam('tax_amount'),
+                rounding_amount=bindparam('rounding_amount'), total_amount=bindparam('total_amount'),
+                tax_breakdown=bindparam('tax_breakdown'), status=bindparam('status'),
+                updated_at=datetime.utcnow()
+            ),
+            updates
+        )
+        if rollup_service is not None:
+            rollup_service.add_rows(Invoice, updates)
+    
+    def _compile(self, rules: List[Dict]) -> Dict:
+        """{category: (sorted start days, [(start, end, rate)])}; rejects overlapping rules"""
+        by_category = defaultdict(list)
+        for rule in rules:
+            valid_from = _as_date(rule['valid_from'])
+            valid_to = _as_date(rule['valid_to']) if rule.get('valid_to') else date.max
+            if valid_to < valid_from:
+                raise ValueError(f"Règle de TVA invalide: {rule}")
+            by_category[rule.get('category')].append((valid_from, valid_to, Decimal(str(rule['rate']))))
+        
+        table = {}
+        for category, periods in by_category.items():
+            periods.sort()
+            for previous, current in zip(periods, periods[1:]):
+                if current[0] <= previous[1]:
+                    raise ValueError(f"Règles de TVA qui se chevauchent pour {category or 'le taux normal'}")
+            table[category] = ([period[0] for period in periods], periods)
+        return table
+    
+    def _lookup(self, category: Optional[str], on: date) -> Optional[Decimal]:
+        entry = self._table.get(category)
+        if entry is None:
+            return None
+        
+        starts, periods = entry
+        index = bisect.bisect_right(starts, on) - 1
+        if index < 0 or periods[index][1] < on:
+            return None
+        return periods[index][2]
+
+
+def stored_breakdown(breakdown: List[Dict]) -> List[Dict]:
+    """Per-rate breakdown of compute() as JSON-safe strings, for Invoice/Devis.tax_breakdown"""
+    return [{key: str(value) for key, value in line.items()} for line in breakdown]
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else datetime.strptime(value, '%Y-%m-%d').date()
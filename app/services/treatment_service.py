@@ -2,8 +2,10 @@ import uuid
 import json
 from datetime import datetime
 from typing import List, Dict, Optional
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models import TreatmentPlan, Patient, Appointment
+from app.utils.cache import request_cached
 
 class TreatmentService:
     """Service for managing treatment plans"""
@@ -28,13 +30,19 @@ class TreatmentService:
     
     def get_patient_treatment_plans(self, patient_id: str) -> List[TreatmentPlan]:
         """Get all treatment plans for a patient"""
-        return TreatmentPlan.query.filter_by(patient_id=patient_id).order_by(
+        return TreatmentPlan.query.filter(
+            TreatmentPlan.patient_id == patient_id, TreatmentPlan.patient_id.notin_(Patient.deleted_ids())
+        ).order_by(
             TreatmentPlan.created_at.desc()
         ).all()
     
     def get_active_treatment_plans(self) -> List[TreatmentPlan]:
         """Get all active treatment plans"""
-        return TreatmentPlan.query.filter_by(status='active').order_by(
+        return TreatmentPlan.query.options(
+            joinedload(TreatmentPlan.patient).load_only(Patient.first_name, Patient.last_name)
+        ).filter(
+            TreatmentPlan.status == 'active', TreatmentPlan.patient_id.notin_(Patient.deleted_ids())
+        ).order_by(
             TreatmentPlan.created_at.desc()
         ).all()
     
@@ -68,8 +76,9 @@ class TreatmentService:
         db.session.commit()
         return True
     
+    @request_cached
     def parse_treatment_plan(self, plan_id: str) -> Dict:
-        """Parse treatment plan data from JSON"""
+        """Parse treatment plan data from JSON (once per request; treat the result as read-only)"""
         treatment_plan = self.get_treatment_plan(plan_id)
         if not treatment_plan:
             return {}
@@ -1,4 +1,19 @@
 from app.utils.decorators import handle_errors
 from app.utils.validators import validate_email, validate_phone, validate_date
+from app.utils.normalizers import fold_text, normalize_phone, soundex
+from app.utils.conditional import conditional, table_version
+from app.utils.cache import LRUCache, detached_copy, request_cached, register_cache_invalidation
+from app.utils.money import (
+    to_money, round_to_5_centimes, to_centimes, from_centimes, split_amount, MoneyJSONProvider
+)
+from app.utils.payment_references import (
+    qr_reference, creditor_reference, invoice_reference_keys, reference_key
+)
 
-__all__ = ['handle_errors', 'validate_email', 'validate_phone', 'validate_date']
\ No newline at end of file
+__all__ = [
+    'handle_errors', 'validate_email', 'validate_phone', 'validate_date',
+    'fold_text', 'normalize_phone', 'soundex', 'conditional', 'table_version',
+    'LRUCache', 'detached_copy', 'request_cached', 'register_cache_invalidation',
+    'to_money', 'round_to_5_centimes', 'to_centimes', 'from_centimes', 'split_amount', 'MoneyJSONProvider',
+    'qr_reference', 'creditor_reference', 'invoice_reference_keys', 'reference_key'
+]
\ No newline at end of file
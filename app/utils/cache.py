@@ -0,0 +1,108 @@
+import functools
+import threading
+import time as clock
+from collections import OrderedDict
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+
+# Process-level caches, cleared when a commit touches one of their models
+_model_caches = []
+
+class LRUCache:
+    """Thread-safe LRU cache with a TTL, for slow-changing reference rows.
+    
+    Entries are cleared in this worker by commits that write one of `models`;
+    the TTL bounds how long other workers may serve a stale entry.
+    """
+    
+    def __init__(self, models=(), maxsize: int = 1024, ttl_seconds: float = 300):
+        self.models = tuple(models)
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _model_caches.append(self)
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if clock.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (clock.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def detached_copy(instance):
+    """Column-only copy of an ORM instance that can live outside any session.
+    
+    Attach it to the current session with db.session.merge(copy, load=False),
+    which costs no query.
+    """
+    mapper = inspect(instance).mapper
+    copy = mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+def request_cached(method):
+    """Memoize a service method for the rest of the current request.
+    
+    The cache is dropped on every commit and rollback, so it never outlives
+    the data it was read from.
+    """
+    @functools.wraps(method)
+    def decorated_function(self, *args, **kwargs):
+        if not has_request_context():
+            return method(self, *args, **kwargs)
+        
+        cache = g.setdefault('request_cache', {})
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        return cache[key]
+    
+    return decorated_function
+
+def register_cache_invalidation():
+    """Attach the commit/rollback hooks that keep the caches consistent"""
+    for name, listener in (('after_flush', _collect_written_models),
+                           ('after_commit', _invalidate_caches),
+                           ('after_soft_rollback', _drop_request_cache)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+def _collect_written_models(session, flush_context):
+    written = session.info.setdefault('written_models', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        written.add(type(obj))
+
+def _invalidate_caches(session):
+    written = session.info.pop('written_models', set())
+    for cache in _model_caches:
+        if written & set(cache.models):
+            cache.clear()
+    _drop_request_cache(session)
+
+def _drop_request_cache(session, previous_transaction=None):
+    if has_app_context():
+        g.pop('request_cache', None)
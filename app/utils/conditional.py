@@ -0,0 +1,66 @@
+import functools
+import hashlib
+from datetime import datetime
+from flask import Response, request, make_response
+from sqlalchemy import func
+from app import db
+
+def table_version(model, *criteria):
+    """COUNT and MAX(updated_at) of a table (optionally filtered) as scalar subqueries.
+    
+    COUNT catches deletions, which leave MAX(updated_at) unchanged. Filtering
+    on the primary key gives the version of a single row.
+    """
+    return [
+        db.session.query(func.count()).select_from(model).filter(*criteria).scalar_subquery(),
+        db.session.query(func.max(model.updated_at)).filter(*criteria).scalar_subquery(),
+    ]
+
+def private_response(response):
+    """Keep a response (medical data) out of shared caches and tie it to whoever asked for it"""
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.update(('Authorization', 'Cookie'))
+    return response
+
+def conditional(validator, last_modified: bool = False, private=None):
+    """Answer GET requests with 304 Not Modified while the resource is unchanged.
+    
+    validator(**view_kwargs) returns SQL scalar expressions (see table_version)
+    that are evaluated in a single query and hashed, with the request URL,
+    into the ETag. With last_modified=True, If-Modified-Since is honoured as
+    well; only use it for single rows, since a deletion does not move
+    MAX(updated_at). When private() is true for the request, the response
+    and its 304 are marked private (see private_response).
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            
+            versions = db.session.query(*validator(**kwargs)).one()
+            raw = '|'.join([request.full_path] + [str(v) for v in versions])
+            etag = hashlib.md5(raw.encode()).hexdigest()
+            modified = max((v for v in versions if isinstance(v, datetime)), default=None)
+            
+            if etag in request.if_none_match or (
+                last_modified and modified and not request.if_none_match
+                and request.if_modified_since
+                and modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+            ):
+                response = Response(status=304)
+                response.set_etag(etag)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag)
+                    if modified:
+                        response.last_modified = modified
+            
+            if private is not None and private():
+                private_response(response)
+            return response
+        
+        return decorated_function
+    
+    return decorator
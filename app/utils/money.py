@@ -0,0 +1,54 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import List
+from flask.json.provider import DefaultJSONProvider
+
+CENTIME = Decimal('0.01')
+
+# Swiss cash rounding: amounts payable are multiples of 5 centimes
+FIVE_CENTIMES = Decimal('0.05')
+
+def to_money(value) -> Decimal:
+    """CHF amount as a Decimal rounded to the centime (floats are read through their shortest repr)"""
+    if isinstance(value, Decimal):
+        amount = value
+    elif isinstance(value, float):
+        amount = Decimal(repr(value))
+    else:
+        amount = Decimal(value)
+    return amount.quantize(CENTIME, rounding=ROUND_HALF_UP)
+
+def round_to_5_centimes(value) -> Decimal:
+    """Round to the nearest 5 centimes, halves away from zero (12.325 -> 12.35, 12.32 -> 12.30)"""
+    return ((to_money(value) / FIVE_CENTIMES).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+            * FIVE_CENTIMES).quantize(CENTIME)
+
+def to_centimes(value) -> int:
+    return int(to_money(value).scaleb(2))
+
+def from_centimes(centimes) -> Decimal:
+    return Decimal(int(centimes)).scaleb(-2)
+
+def split_amount(total, parts: int) -> List[Decimal]:
+    """Split total into installments rounded down to 5 centimes; the last one takes the remainder.
+    
+    The installments always add up to total exactly, and the last one is never
+    smaller than the others (100.00 in 3 -> 33.30, 33.30, 33.40).
+    """
+    if parts < 1:
+        raise ValueError("Le nombre d'échéances doit être positif")
+    
+    total = to_money(total)
+    installment = ((total / parts / FIVE_CENTIMES).quantize(Decimal('1'), rounding=ROUND_DOWN)
+                   * FIVE_CENTIMES).quantize(CENTIME)
+    if installment <= 0:
+        raise ValueError(f"Montant de {total} CHF trop faible pour {parts} échéances")
+    return [installment] * (parts - 1) + [total - installment * (parts - 1)]
+
+class MoneyJSONProvider(DefaultJSONProvider):
+    """Serialize Decimal amounts as JSON numbers rather than strings"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
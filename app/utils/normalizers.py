@@ -0,0 +1,45 @@
+import re
+import unicodedata
+
+def fold_text(text):
+    """Lowercase and strip accents ("Müller" -> "muller") for matching"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+def normalize_phone(phone):
+    """Reduce a Swiss phone number to national digits (+41 79 ... -> 079...)"""
+    if not phone:
+        return ''
+    digits = re.sub(r'\D', '', phone)
+    
+    # Same formats as validate_phone: +41XXXXXXXXX, 0041..., 0XXXXXXXXX
+    if digits.startswith('0041'):
+        return '0' + digits[4:]
+    if digits.startswith('41') and (phone.lstrip().startswith('+') or len(digits) == 11):
+        return '0' + digits[2:]
+    return digits
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'), 'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'
+}
+
+def soundex(text):
+    """Four-character Soundex of the first word of a name ("Müller", "Muler" -> "M460")"""
+    letters = [c for c in fold_text(text) if c.isalpha()]
+    if not letters:
+        return ''
+    
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
@@ -0,0 +1,57 @@
+import re
+from typing import Optional, Set
+
+# Recursive modulo 10 table of QR (ex-ESR) reference check digits
+MOD10_TABLE = (0, 9, 4, 6, 8, 2, 7, 1, 3, 5)
+
+NON_DIGITS = re.compile(r'\D')
+NON_ALPHANUMERICS = re.compile(r'[^0-9A-Za-z]')
+
+def _mod10_check_digit(digits: str) -> str:
+    carry = 0
+    for digit in digits:
+        carry = MOD10_TABLE[(carry + int(digit)) % 10]
+    return str((10 - carry) % 10)
+
+def _mod97(text: str) -> int:
+    """ISO 7064 MOD 97-10 remainder, letters counting as 10..35"""
+    return int(''.join(str(int(char, 36)) for char in text)) % 97
+
+def qr_reference(invoice_number: str) -> str:
+    """27-digit QR reference of an invoice: the digits of its number, zero-padded, then a check digit"""
+    digits = NON_DIGITS.sub('', invoice_number or '')
+    if not digits or len(digits) > 26:
+        raise ValueError(f"Pas de référence QR possible pour la facture {invoice_number}")
+    digits = digits.zfill(26)
+    return digits + _mod10_check_digit(digits)
+
+def creditor_reference(invoice_number: str) -> str:
+    """ISO 11649 creditor reference (RF..) of an invoice, for bills paid to an IBAN without QR reference"""
+    payload = NON_ALPHANUMERICS.sub('', invoice_number or '').upper()
+    if not payload or len(payload) > 21:
+        raise ValueError(f"Pas de référence RF possible pour la facture {invoice_number}")
+    return f"RF{98 - _mod97(payload + 'RF00'):02d}{payload}"
+
+def invoice_reference_keys(invoice_number: str) -> Set[str]:
+    """Keys under which reference_key finds an invoice, from its QR and RF references"""
+    keys = set()
+    digits = NON_DIGITS.sub('', invoice_number or '').lstrip('0')
+    if digits and len(digits) <= 26:
+        keys.add(digits)
+    payload = NON_ALPHANUMERICS.sub('', invoice_number or '').upper()
+    if payload and len(payload) <= 21:
+        keys.add(payload)
+    return keys
+
+def reference_key(reference: Optional[str]) -> Optional[str]:
+    """Invoice key of a QR or RF reference read from a bank file; None if malformed or the check fails"""
+    reference = re.sub(r'\s', '', reference or '').upper()
+    if re.fullmatch(r'\d{27}', reference):
+        if _mod10_check_digit(reference[:26]) != reference[26]:
+            return None
+        return reference[:26].lstrip('0') or None
+    if re.fullmatch(r'RF\d{2}[0-9A-Z]{1,21}', reference):
+        if _mod97(reference[4:] + reference[:4]) != 1:
+            return None
+        return reference[4:]
+    return None
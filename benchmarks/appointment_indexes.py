@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark the appointment hot queries with and without their indexes.
+
+Seeds a throw-away SQLite database with 100k appointments, then prints the
+query plan and the average latency of each query before and after creating
+the indexes declared on the models.
+
+Usage: python benchmarks/appointment_indexes.py [--appointments 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+import uuid
+from datetime import date, time, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db  # noqa: E402
+from app.models import Appointment, ScheduleBlock  # noqa: E402
+
+appointments = Appointment.__table__
+blocks = ScheduleBlock.__table__
+
+STATUSES = ['scheduled', 'completed', 'cancelled', 'no_show']
+
+
+def seed(engine, num_appointments):
+    """Insert patients, plans, appointments and blocks spread over ~3 years"""
+    num_patients = max(num_appointments // 20, 1)
+    patient_ids = [str(uuid.uuid4()) for _ in range(num_patients)]
+    plan_ids = [str(uuid.uuid4()) for _ in range(num_patients // 2 or 1)]
+    first_day = date.today() - timedelta(days=730)
+
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['patients'].insert(), [
+            {'id': pid, 'first_name': 'Patient', 'last_name': str(i)}
+            for i, pid in enumerate(patient_ids)
+        ])
+        conn.execute(db.metadata.tables['treatment_plans'].insert(), [
+            {'id': plan_id, 'plan_data': '{}', 'status': 'active'} for plan_id in plan_ids
+        ])
+        conn.execute(appointments.insert(), [
+            {
+                'id': str(uuid.uuid4()),
+                'patient_id': random.choice(patient_ids),
+                'appointment_date': first_day + timedelta(days=random.randint(0, 1095)),
+                'appointment_time': time(random.randint(8, 17), random.choice([0, 30])),
+                'duration_minutes': random.choice([30, 60, 90]),
+                'status': random.choice(STATUSES),
+                'treatment_plan_id': random.choice(plan_ids) if random.random() < 0.3 else None,
+            }
+            for _ in range(num_appointments)
+        ])
+        conn.execute(blocks.insert(), [
+            {
+                'id': str(uuid.uuid4()),
+                'block_date': first_day + timedelta(days=day),
+                'start_time': time(12, 0),
+                'end_time': time(13, 0),
+                'block_type': 'unavailable',
+            }
+            for day in range(0, 1095, 2)
+        ])
+
+    return patient_ids, plan_ids
+
+
+def hot_queries(patient_id, plan_id):
+    """The queries issued by AppointmentService and TreatmentService"""
+    day = date.today()
+    return {
+        'get_appointments_by_date': select(appointments)
+            .where(appointments.c.appointment_date == day)
+            .order_by(appointments.c.appointment_time),
+        'get_appointments_range': select(appointments)
+            .where(appointments.c.appointment_date >= day,
+                   appointments.c.appointment_date <= day + timedelta(days=6))
+            .order_by(appointments.c.appointment_date, appointments.c.appointment_time),
+        'get_appointments_by_patient': select(appointments)
+            .where(appointments.c.patient_id == patient_id)
+            .order_by(appointments.c.appointment_date.desc(), appointments.c.appointment_time.desc()),
+        'is_slot_available (blocks)': select(blocks).where(blocks.c.block_date == day),
+        'get_treatment_progress': select(func.count())
+            .select_from(appointments)
+            .where(appointments.c.treatment_plan_id == plan_id,
+                   appointments.c.status == 'completed'),
+    }
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            compiled = query.compile(engine, compile_kwargs={'literal_binds': True})
+            plan = conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).fetchall()
+
+            started = timer.perf_counter()
+            for _ in range(repeat):
+                conn.execute(query).fetchall()
+            elapsed_ms = (timer.perf_counter() - started) * 1000 / repeat
+
+            results[name] = (elapsed_ms, ' | '.join(row[-1] for row in plan))
+    return results
+
+
+def index_names():
+    return [index.name for table in (appointments, blocks) for index in table.indexes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{db_path}')
+    db.metadata.create_all(engine)
+
+    print(f"🌱 Seeding {args.appointments} appointments into {db_path}...")
+    patient_ids, plan_ids = seed(engine, args.appointments)
+    queries = hot_queries(patient_ids[0], plan_ids[0])
+
+    with engine.begin() as conn:
+        for name in index_names():
+            conn.execute(text(f'DROP INDEX {name}'))
+        conn.execute(text('ANALYZE'))
+    before = measure(engine, queries, args.repeat)
+
+    with engine.begin() as conn:
+        for table in (appointments, blocks):
+            for index in table.indexes:
+                index.create(conn)
+        conn.execute(text('ANALYZE'))
+    after = measure(engine, queries, args.repeat)
+
+    for name in queries:
+        print(f"\n📊 {name}")
+        print(f"  before: {before[name][0]:8.3f} ms  {before[name][1]}")
+        print(f"  after:  {after[name][0]:8.3f} ms  {after[name][1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark the financial dashboard aggregates.
+
+Seeds a throw-away SQLite database with 1M invoices (and one payment per
+paid or partial invoice) spread over five years, then prints the latency of
+a monthly and a yearly dashboard, which are summed from the daily revenue
+rollups. With --compare, the result is also checked against the original
+implementation, which loaded every row into Python.
+
+Usage: python benchmarks/financial_dashboard.py [--invoices 1000000] [--compare]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+import uuid
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db  # noqa: E402
+from app.models import Invoice, Payment  # noqa: E402
+from app.services.financial_service import FinancialService  # noqa: E402
+from app.services.revenue_rollup_service import RevenueRollupService  # noqa: E402
+
+STATUSES = ['paid', 'paid', 'paid', 'pending', 'partial', 'cancelled']
+METHODS = ['card', 'cash', 'bank_transfer', 'twint', None]
+FIRST_DAY = date(2021, 1, 1)
+BATCH = 50_000
+
+
+def seed(invoices):
+    now = datetime.utcnow()
+    for offset in range(0, invoices, BATCH):
+        invoice_rows, payment_rows = [], []
+        for i in range(offset, min(offset + BATCH, invoices)):
+            invoice_id = str(uuid.uuid4())
+            issue_date = FIRST_DAY + timedelta(days=random.randint(0, 5 * 365))
+            total = round(random.uniform(80, 2500), 2)
+            status = random.choice(STATUSES)
+            paid = total if status == 'paid' else round(total / 2, 2) if status == 'partial' else 0.0
+            invoice_rows.append({
+                'id': invoice_id, 'invoice_number': f"F{i:08d}", 'issue_date': issue_date,
+                'total_amount': total, 'paid_amount': paid, 'status': status,
+                'created_at': now, 'updated_at': now
+            })
+            if paid:
+                payment_rows.append({
+                    'id': str(uuid.uuid4()), 'invoice_id': invoice_id, 'amount': paid,
+                    'payment_date': issue_date + timedelta(days=random.randint(0, 45)),
+                    'payment_method': random.choice(METHODS), 'created_at': now
+                })
+        db.session.execute(Invoice.__table__.insert(), invoice_rows)
+        db.session.execute(Payment.__table__.insert(), payment_rows)
+        db.session.commit()
+
+
+def legacy_dashboard(start_date, end_date):
+    """The row-loading implementation this benchmark replaced, for --compare"""
+    invoices = Invoice.query.filter(Invoice.issue_date >= start_date, Invoice.issue_date <= end_date).all()
+    payments = Payment.query.filter(Payment.payment_date >= start_date, Payment.payment_date <= end_date).all()
+    by_method = {}
+    for payment in payments:
+        method = by_method.setdefault(payment.payment_method or 'unknown', {'count': 0, 'amount': 0})
+        method['count'] += 1
+        method['amount'] += payment.amount
+    total = sum(inv.total_amount for inv in invoices)
+    paid = sum(inv.paid_amount for inv in invoices)
+    return {
+        'period': {'start': start_date.isoformat(), 'end': end_date.isoformat()},
+        'revenue': {'total': total, 'paid': paid, 'pending': total - paid},
+        'invoices': {
+            'total': len(invoices),
+            'paid': len([inv for inv in invoices if inv.status == 'paid']),
+            'pending': len([inv for inv in invoices if inv.status == 'pending']),
+            'partial': len([inv for inv in invoices if inv.status == 'partial'])
+        },
+        'payments': {'total': len(payments), 'total_amount': sum(p.amount for p in payments), 'by_method': by_method}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', action='store_true', help='also time and check the row-loading version')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {args.invoices} invoices...")
+        started = timer.perf_counter()
+        seed(args.invoices)
+        print(f"   done in {timer.perf_counter() - started:.1f} s")
+
+        # Seeding bypasses the ORM flush, so build the rollups in one pass
+        started = timer.perf_counter()
+        rollups = RevenueRollupService().rebuild()
+        print(f"🔨 {rollups} rollup rows built in {timer.perf_counter() - started:.1f} s")
+
+        service = FinancialService()
+        periods = {
+            'month': (date(2024, 3, 1), date(2024, 3, 31)),
+            'year': (date(2024, 1, 1), date(2024, 12, 31)),
+        }
+        for name, (start_date, end_date) in periods.items():
+            started = timer.perf_counter()
+            for _ in range(args.repeat):
+                dashboard = service.get_financial_dashboard(start_date, end_date)
+            elapsed_ms = (timer.perf_counter() - started) * 1000 / args.repeat
+            print(f"  {name:<6} {elapsed_ms:9.1f} ms  {dashboard['invoices']['total']} invoices, "
+                  f"{dashboard['payments']['total']} payments")
+
+            if args.compare:
+                started = timer.perf_counter()
+                expected = legacy_dashboard(start_date, end_date)
+                elapsed_ms = (timer.perf_counter() - started) * 1000
+                db.session.expunge_all()
+                print(f"  {'legacy':<6} {elapsed_ms:9.1f} ms  identical: {dashboard == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark typeahead latency of the patient search index.
+
+Seeds a throw-away SQLite database with 100k patients and prints the index
+build time and the average latency of name, typo, accent and phone queries.
+
+Usage: python benchmarks/patient_search.py [--patients 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+import uuid
+from datetime import datetime
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db  # noqa: E402
+from app.models import Patient  # noqa: E402
+from app.services.patient_search_service import PatientSearchService  # noqa: E402
+
+FIRST_NAMES = ["Jean", "Marie", "Pierre", "Sophie", "Luc", "Anne", "François", "Céline", "Léa", "Chloé"]
+LAST_NAMES = ["Favre", "Rochat", "Müller", "Schneider", "Weber", "Meyer", "Bühler", "Zimmermann", "Moser", "Graf"]
+
+QUERIES = {
+    'prefix': 'zimm',
+    'full name': 'sophie weber',
+    'typo': 'shcneider',
+    'accent folding': 'muller',
+    'phone': '+41 79 12',
+    'email': 'favre1@',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patients', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {args.patients} patients...")
+        now = datetime.utcnow()
+        db.session.execute(Patient.__table__.insert(), [
+            {
+                'id': str(uuid.uuid4()),
+                'first_name': random.choice(FIRST_NAMES),
+                'last_name': f"{random.choice(LAST_NAMES)}{random.choice(['', 'er', 'i', 'o'])}",
+                'email': f"{random.choice(LAST_NAMES).lower()}{i}@example.ch",
+                'phone': f"+41 7{random.randint(6, 9)} {random.randint(100, 999)} {random.randint(10, 99)} {random.randint(10, 99)}",
+                'created_at': now,
+                'updated_at': now,
+            }
+            for i in range(args.patients)
+        ])
+        db.session.commit()
+
+        search = PatientSearchService()
+        started = timer.perf_counter()
+        search.rebuild()
+        print(f"🔨 Index built in {timer.perf_counter() - started:.2f} s")
+
+        for name, query in QUERIES.items():
+            started = timer.perf_counter()
+            for _ in range(args.repeat):
+                results = search.search(query, limit=20)
+            elapsed_ms = (timer.perf_counter() - started) * 1000 / args.repeat
+            print(f"  {name:<15} {query!r:<16} {elapsed_ms:7.2f} ms  {len(results)} results")
+
+
+if __name__ == '__main__':
+    main()
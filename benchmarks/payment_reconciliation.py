@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark the reconciliation of a bank credit file.
+
+Seeds a throw-away SQLite database with 200k invoices, a fifth of them
+open, and writes a camt.054 notification of 5000 credits: most pay an open
+invoice in full or in part by QR reference, the rest carry unknown, broken
+or missing references. Prints the time to book the file (parse, match,
+one transaction), then imports it again, which must book nothing, and
+checks the open balances against the booked amounts.
+
+Usage: python benchmarks/payment_reconciliation.py [--invoices 200000] [--credits 5000]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time as timer
+import uuid
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db  # noqa: E402
+from app.models import Invoice, Payment, UnmatchedPayment  # noqa: E402
+from app.services.payment_reconciliation_service import PaymentReconciliationService  # noqa: E402
+from app.services.revenue_rollup_service import RevenueRollupService  # noqa: E402
+from app.utils.payment_references import qr_reference  # noqa: E402
+
+STATUSES = ['paid', 'paid', 'paid', 'paid', 'pending']
+FIRST_DAY = date(2024, 1, 1)
+BOOKING_DAY = date(2026, 2, 10)
+BATCH = 50_000
+
+
+def seed(invoices):
+    now = datetime.utcnow()
+    open_invoices = []
+    for offset in range(0, invoices, BATCH):
+        rows = []
+        for i in range(offset, min(offset + BATCH, invoices)):
+            total = round(random.uniform(80, 2500), 2)
+            status = random.choice(STATUSES)
+            number = f"{2024 + i % 3}-{i:06d}"
+            rows.append({
+                'id': str(uuid.uuid4()), 'invoice_number': number,
+                'issue_date': FIRST_DAY + timedelta(days=random.randint(0, 2 * 365)),
+                'total_amount': total, 'paid_amount': total if status == 'paid' else 0, 'status': status,
+                'created_at': now, 'updated_at': now
+            })
+            if status == 'pending':
+                open_invoices.append((number, total))
+        db.session.execute(Invoice.__table__.insert(), rows)
+        db.session.commit()
+    return open_invoices
+
+
+def camt_file(open_invoices, credits):
+    """camt.054 with one entry per 100 credits; about 90% of them match an open invoice"""
+    transactions = []
+    for position, (number, total) in enumerate(random.sample(open_invoices, credits)):
+        roll = random.random()
+        if roll < 0.03:
+            reference = qr_reference(f"9999-{position:06d}")
+        elif roll < 0.06:
+            reference = qr_reference(number)[:-1] + '0'
+        elif roll < 0.08:
+            reference = None
+        else:
+            reference = qr_reference(number)
+        amount = total if random.random() < 0.8 else round(total / 2, 2)
+        remittance = (f"<RmtInf><Strd><CdtrRefInf><Ref>{reference}</Ref></CdtrRefInf></Strd></RmtInf>"
+                      if reference else '')
+        transactions.append(
+            f"<TxDtls><Refs><AcctSvcrRef>BNK{position:08d}</AcctSvcrRef></Refs>"
+            f"<Amt Ccy=\"CHF\">{amount:.2f}</Amt><CdtDbtInd>CRDT</CdtDbtInd>"
+            f"<RltdPties><Dbtr><Pty><Nm>Patient {position}</Nm></Pty></Dbtr></RltdPties>{remittance}</TxDtls>"
+        )
+
+    entries = ''.join(
+        f"<Ntry><CdtDbtInd>CRDT</CdtDbtInd><Sts><Cd>BOOK</Cd></Sts>"
+        f"<BookgDt><Dt>{BOOKING_DAY.isoformat()}</Dt></BookgDt>"
+        f"<NtryDtls>{''.join(transactions[start:start + 100])}</NtryDtls></Ntry>"
+        for start in range(0, len(transactions), 100)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.054.001.08">'
+        f"<BkToCstmrDbtCdtNtfctn><Ntfctn>{entries}</Ntfctn></BkToCstmrDbtCdtNtfctn></Document>"
+    ).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=200_000)
+    parser.add_argument('--credits', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {args.invoices} invoices...")
+        open_invoices = seed(args.invoices)
+        content = camt_file(open_invoices, min(args.credits, len(open_invoices)))
+        print(f"   {len(open_invoices)} open, camt.054 of {len(content) // 1024} KiB")
+
+        rollup_service = RevenueRollupService()
+        rollup_service.rebuild()
+        service = PaymentReconciliationService(rollup_service=rollup_service)
+        started = timer.perf_counter()
+        report = service.reconcile(io.BytesIO(content), filename='bench.xml')
+        elapsed_ms = (timer.perf_counter() - started) * 1000
+        print(f"  reconcile {elapsed_ms:9.1f} ms  {report['matched']} booked ({report['applied_amount']} CHF), "
+              f"{report['unmatched']} to review")
+
+        started = timer.perf_counter()
+        again = service.reconcile(io.BytesIO(content), filename='bench.xml')
+        elapsed_ms = (timer.perf_counter() - started) * 1000
+        print(f"  re-import {elapsed_ms:9.1f} ms  {again['matched']} booked, {again['duplicates']} already known")
+
+        booked = db.session.query(func.coalesce(func.sum(Payment.amount), 0)).scalar()
+        queued = db.session.query(func.count(UnmatchedPayment.id)).scalar()
+        # Paid invoices were seeded without payments, so only the booked ones have any
+        paid = db.session.query(func.coalesce(func.sum(Invoice.paid_amount), 0)).filter(
+            Invoice.id.in_(db.session.query(Payment.invoice_id))
+        ).scalar()
+        print(f"  payments match invoices: {booked == paid == report['applied_amount']}, "
+              f"review queue: {queued == report['unmatched']}")
+
+
+if __name__ == '__main__':
+    main()
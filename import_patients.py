@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Bulk import patients from a CSV or JSON Lines file
+
+Usage: python import_patients.py patients.csv [--format csv|jsonl] [--dry-run]
+
+CSV files need a header row with the patient column names (first_name,
+last_name, email, phone, birth_date, address, ...); ',' and ';' separators
+are both accepted. Patients already in the database (same name and birth
+date, email or phone) are skipped.
+"""
+import argparse
+import sys
+from app import create_app
+from app.services.patient_import_service import PatientImportService
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import patients from CSV or JSON Lines')
+    parser.add_argument('path', help='File to import')
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='File format (default: from the file extension)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and dedupe without inserting')
+    args = parser.parse_args()
+    
+    fmt = args.format or ('jsonl' if args.path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    
+    app = create_app('development')
+    with app.app_context():
+        service = PatientImportService(chunk_size=args.chunk_size)
+        
+        def progress(report):
+            print(f"  {report['total']} lignes lues, {report['imported']} importées, "
+                  f"{report['duplicates']} doublons, {report['rejected']} rejetées", end='\r')
+        
+        print(f"📥 Import de {args.path} ({fmt}){' [dry run]' if args.dry_run else ''}...")
+        with open(args.path, 'rb') as stream:
+            report = service.import_stream(stream, fmt, dry_run=args.dry_run, progress=progress)
+        print()
+        
+        for rejected in report['rejected_rows']:
+            print(f"  ❌ ligne {rejected['line']} {rejected['name']}: {'; '.join(rejected['errors'])}")
+        if report['rejected'] > len(report['rejected_rows']):
+            print(f"  ... et {report['rejected'] - len(report['rejected_rows'])} autres lignes rejetées")
+        
+        print(f"✅ {report['imported']} patients importés, {report['duplicates']} doublons ignorés, "
+              f"{report['rejected']} lignes rejetées sur {report['total']}")
+    
+    return 0 if not report['rejected'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
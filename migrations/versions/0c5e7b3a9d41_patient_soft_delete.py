@@ -0,0 +1,31 @@
+"""Add patients.deleted_at for soft delete
+
+Revision ID: 0c5e7b3a9d41
+Revises: f3a9c6d2e815
+Create Date: 2026-10-19 18:52:16.044718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5e7b3a9d41'
+down_revision = 'f3a9c6d2e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'deleted_at' not in {column['name'] for column in inspector.get_columns('patients')}:
+        with op.batch_alter_table('patients') as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_patients_deleted_at', ['deleted_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('patients') as batch_op:
+        batch_op.drop_index('ix_patients_deleted_at')
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,51 @@
+"""Add unmatched_payments review queue and index payments by bank reference
+
+Revision ID: 1e6b9d4f2a87
+Revises: 8c3f5a1d7e26
+Create Date: 2026-10-20 09:41:05.182734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e6b9d4f2a87'
+down_revision = '8c3f5a1d7e26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Amounts in centimes, as the other money columns
+    if 'unmatched_payments' not in inspector.get_table_names():
+        op.create_table(
+            'unmatched_payments',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('source_file', sa.String(length=255)),
+            sa.Column('bank_reference', sa.String(length=100)),
+            sa.Column('reference', sa.String(length=50)),
+            sa.Column('amount', sa.BigInteger(), nullable=False),
+            sa.Column('currency', sa.String(length=3)),
+            sa.Column('booking_date', sa.Date()),
+            sa.Column('debtor_name', sa.String(length=200)),
+            sa.Column('reason', sa.String(length=50), nullable=False),
+            sa.Column('invoice_id', sa.String(length=36), sa.ForeignKey('invoices.id')),
+            sa.Column('status', sa.String(length=20)),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('resolved_at', sa.DateTime()),
+        )
+        op.create_index(
+            'ix_unmatched_payments_status_booking_date', 'unmatched_payments', ['status', 'booking_date']
+        )
+
+    # Re-imported bank files are recognized by the bank reference of each credit
+    if 'ix_payments_reference_number' not in {index['name'] for index in inspector.get_indexes('payments')}:
+        op.create_index('ix_payments_reference_number', 'payments', ['reference_number'])
+
+
+def downgrade():
+    op.drop_index('ix_payments_reference_number', table_name='payments')
+    op.drop_table('unmatched_payments')
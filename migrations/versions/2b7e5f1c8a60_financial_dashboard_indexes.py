@@ -0,0 +1,34 @@
+"""Index invoices and payments by date for the financial dashboard aggregates
+
+Revision ID: 2b7e5f1c8a60
+Revises: 0c5e7b3a9d41
+Create Date: 2026-10-19 19:41:07.512936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e5f1c8a60'
+down_revision = '0c5e7b3a9d41'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'invoices': ('ix_invoices_issue_date', ['issue_date']),
+    'payments': ('ix_payments_payment_date', ['payment_date']),
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table, (name, columns) in INDEXES.items():
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, (name, _) in INDEXES.items():
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,32 @@
+"""Mark approved devis that were already turned into an invoice as invoiced
+
+Revision ID: 2c6e8a4d1f37
+Revises: 7e3b9f1a6c52
+Create Date: 2026-10-20 16:48:27.552103
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6e8a4d1f37'
+down_revision = '7e3b9f1a6c52'
+branch_labels = None
+depends_on = None
+
+# Invoices created from a devis only point back to it through this note
+INVOICE_NOTE = "'Facture créée depuis le devis ' || devis.devis_number"
+
+
+def upgrade():
+    op.execute(
+        "UPDATE devis SET status = 'invoiced' WHERE status = 'approved' AND EXISTS ("
+        f"SELECT 1 FROM invoices WHERE invoices.notes = {INVOICE_NOTE})"
+    )
+
+
+def downgrade():
+    op.execute(
+        "UPDATE devis SET status = 'approved' WHERE status = 'invoiced' AND EXISTS ("
+        f"SELECT 1 FROM invoices WHERE invoices.notes = {INVOICE_NOTE})"
+    )
@@ -0,0 +1,41 @@
+"""Index the appointment and schedule block hot queries
+
+Revision ID: 3f1c2a9d7b10
+Revises:
+Create Date: 2026-10-19 09:12:44.381027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_appointments_date_time', 'appointments', ['appointment_date', 'appointment_time']),
+    ('ix_appointments_patient_date', 'appointments', ['patient_id', 'appointment_date']),
+    ('ix_appointments_plan_status', 'appointments', ['treatment_plan_id', 'status']),
+    ('ix_schedule_blocks_block_date', 'schedule_blocks', ['block_date']),
+]
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""Index scheduled payments by (status, due_date) for the revenue forecast
+
+Revision ID: 4e8b1d7a2c59
+Revises: 9d4a6c2e7f15
+Create Date: 2026-10-19 21:05:33.876204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b1d7a2c59'
+down_revision = '9d4a6c2e7f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'ix_scheduled_payments_status_due_date' not in {
+        index['name'] for index in inspector.get_indexes('scheduled_payments')
+    }:
+        op.create_index('ix_scheduled_payments_status_due_date', 'scheduled_payments', ['status', 'due_date'])
+
+
+def downgrade():
+    op.drop_index('ix_scheduled_payments_status_due_date', table_name='scheduled_payments')
@@ -0,0 +1,41 @@
+"""Unique indexes on the bank references of reconciled and queued credits
+
+Revision ID: 5a8d2c7e4f91
+Revises: 1e6b9d4f2a87
+Create Date: 2026-10-20 14:22:36.905418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8d2c7e4f91'
+down_revision = '1e6b9d4f2a87'
+branch_labels = None
+depends_on = None
+
+BANK_TRANSFERS = "payment_method = 'bank_transfer'"
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Only bank transfers: other payments may repeat a slip or receipt number
+    if 'uq_payments_bank_reference' not in {index['name'] for index in inspector.get_indexes('payments')}:
+        op.create_index(
+            'uq_payments_bank_reference', 'payments', ['reference_number'], unique=True,
+            sqlite_where=sa.text(BANK_TRANSFERS), postgresql_where=sa.text(BANK_TRANSFERS)
+        )
+
+    if 'uq_unmatched_payments_bank_reference' not in {
+        index['name'] for index in inspector.get_indexes('unmatched_payments')
+    }:
+        op.create_index(
+            'uq_unmatched_payments_bank_reference', 'unmatched_payments', ['bank_reference'], unique=True
+        )
+
+
+def downgrade():
+    op.drop_index('uq_unmatched_payments_bank_reference', table_name='unmatched_payments')
+    op.drop_index('uq_payments_bank_reference', table_name='payments')
@@ -0,0 +1,26 @@
+"""Index the keyset order of the patient list
+
+Revision ID: 5d93b0c7e2a4
+Revises: c47a9e2b5d18
+Create Date: 2026-10-19 14:22:10.670431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d93b0c7e2a4'
+down_revision = 'c47a9e2b5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('patients')}
+    if 'ix_patients_name_id' not in indexes:
+        op.create_index('ix_patients_name_id', 'patients', ['last_name', 'first_name', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_patients_name_id', table_name='patients')
@@ -0,0 +1,33 @@
+"""Add document_sequences, per-year counters for invoice and devis numbers
+
+Revision ID: 6f2c9a4e1b83
+Revises: 4e8b1d7a2c59
+Create Date: 2026-10-19 21:38:12.407615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2c9a4e1b83'
+down_revision = '4e8b1d7a2c59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Counters start after the highest existing number the first time a year is used
+    if 'document_sequences' not in inspector.get_table_names():
+        op.create_table(
+            'document_sequences',
+            sa.Column('name', sa.String(length=20), primary_key=True),
+            sa.Column('year', sa.Integer(), primary_key=True),
+            sa.Column('last_value', sa.Integer(), nullable=False, server_default='0'),
+        )
+
+
+def downgrade():
+    op.drop_table('document_sequences')
@@ -0,0 +1,34 @@
+"""Index invoices and treatment plans by patient for the statistics aggregates
+
+Revision ID: 7a4c1e9f3b26
+Revises: e1f8a3c5b972
+Create Date: 2026-10-19 16:12:54.308817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c1e9f3b26'
+down_revision = 'e1f8a3c5b972'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'invoices': ('ix_invoices_patient_status', ['patient_id', 'status']),
+    'treatment_plans': ('ix_treatment_plans_patient_status', ['patient_id', 'status']),
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table, (name, columns) in INDEXES.items():
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, (name, _) in INDEXES.items():
+        op.drop_index(name, table_name=table)
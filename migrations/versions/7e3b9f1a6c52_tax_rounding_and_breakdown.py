@@ -0,0 +1,39 @@
+"""Add rounding_amount and tax_breakdown to invoices and devis
+
+Revision ID: 7e3b9f1a6c52
+Revises: 5a8d2c7e4f91
+Create Date: 2026-10-20 16:05:12.318940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3b9f1a6c52'
+down_revision = '5a8d2c7e4f91'
+branch_labels = None
+depends_on = None
+
+TABLES = ('invoices', 'devis')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # Existing rows keep their rounding inside tax_amount until their VAT is recomputed
+    for table in TABLES:
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        with op.batch_alter_table(table) as batch_op:
+            if 'rounding_amount' not in columns:
+                batch_op.add_column(sa.Column('rounding_amount', sa.BigInteger(), nullable=True,
+                                              server_default='0'))
+            if 'tax_breakdown' not in columns:
+                batch_op.add_column(sa.Column('tax_breakdown', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('tax_breakdown')
+            batch_op.drop_column('rounding_amount')
@@ -0,0 +1,69 @@
+"""Add recurring appointment series
+
+Revision ID: 8b2e4d6f1a35
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-19 10:41:07.512604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a35'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # db.create_all() at startup may already have created the new table
+    if 'appointment_series' not in inspector.get_table_names():
+        op.create_table(
+            'appointment_series',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('patient_id', sa.String(length=36), nullable=True),
+            sa.Column('start_date', sa.Date(), nullable=False),
+            sa.Column('appointment_time', sa.Time(), nullable=False),
+            sa.Column('duration_minutes', sa.Integer(), nullable=True),
+            sa.Column('treatment_type', sa.String(length=200), nullable=True),
+            sa.Column('doctor', sa.String(length=100), nullable=True),
+            sa.Column('room', sa.String(length=50), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('treatment_plan_id', sa.String(length=36), nullable=True),
+            sa.Column('frequency', sa.String(length=20), nullable=False),
+            sa.Column('interval', sa.Integer(), nullable=False),
+            sa.Column('occurrence_count', sa.Integer(), nullable=True),
+            sa.Column('until_date', sa.Date(), nullable=True),
+            sa.Column('last_date', sa.Date(), nullable=True),
+            sa.Column('exception_dates', sa.Text(), nullable=True),
+            sa.Column('status', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['patient_id'], ['patients.id']),
+            sa.ForeignKeyConstraint(['treatment_plan_id'], ['treatment_plans.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_appointment_series_window', 'appointment_series', ['start_date', 'last_date'])
+
+    if 'series_id' not in {column['name'] for column in inspector.get_columns('appointments')}:
+        with op.batch_alter_table('appointments') as batch_op:
+            batch_op.add_column(sa.Column('series_id', sa.String(length=36), nullable=True))
+            batch_op.add_column(sa.Column('series_date', sa.Date(), nullable=True))
+            batch_op.create_foreign_key(
+                'fk_appointments_series_id', 'appointment_series', ['series_id'], ['id']
+            )
+            batch_op.create_index('ix_appointments_series_date', ['series_id', 'series_date'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_index('ix_appointments_series_date')
+        batch_op.drop_constraint('fk_appointments_series_id', type_='foreignkey')
+        batch_op.drop_column('series_date')
+        batch_op.drop_column('series_id')
+
+    op.drop_index('ix_appointment_series_window', table_name='appointment_series')
+    op.drop_table('appointment_series')
@@ -0,0 +1,30 @@
+"""Index invoices by (status, due_date), covering the receivables aging report
+
+Revision ID: 8c3f5a1d7e26
+Revises: d5b1f7c3a942
+Create Date: 2026-10-20 00:12:47.519360
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f5a1d7e26'
+down_revision = 'd5b1f7c3a942'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'ix_invoices_status_due_date' not in {index['name'] for index in inspector.get_indexes('invoices')}:
+        op.create_index(
+            'ix_invoices_status_due_date', 'invoices',
+            ['status', 'due_date', 'patient_id', 'total_amount', 'paid_amount']
+        )
+
+
+def downgrade():
+    op.drop_index('ix_invoices_status_due_date', table_name='invoices')
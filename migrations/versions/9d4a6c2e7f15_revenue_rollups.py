@@ -0,0 +1,67 @@
+"""Add revenue_rollups, daily totals maintained from the financial tables
+
+Revision ID: 9d4a6c2e7f15
+Revises: 2b7e5f1c8a60
+Create Date: 2026-10-19 20:27:45.130592
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a6c2e7f15'
+down_revision = '2b7e5f1c8a60'
+branch_labels = None
+depends_on = None
+
+# (source, table, day column, status column, payment method column, amount column, paid amount column)
+SOURCES = [
+    ('invoice', 'invoices', 'issue_date', 'status', None, 'total_amount', 'paid_amount'),
+    ('payment', 'payments', 'payment_date', None, 'payment_method', 'amount', None),
+    ('scheduled', 'scheduled_payments', 'due_date', 'status', None, 'amount', None),
+    ('devis', 'devis', 'issue_date', 'status', None, 'total_amount', None),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'revenue_rollups' not in inspector.get_table_names():
+        _create_table()
+
+    # db.create_all() may have created the table empty before this ran
+    if bind.execute(sa.text("SELECT COUNT(*) FROM revenue_rollups")).scalar():
+        return
+
+    # Same totals as RevenueRollupService.rebuild()
+    for source, table, day, status, method, amount, paid in SOURCES:
+        status_sql = f"COALESCE({status}, '')" if status else "''"
+        method_sql = f"COALESCE({method}, '')" if method else "''"
+        paid_sql = f"COALESCE(SUM({paid}), 0)" if paid else "0"
+        op.execute(
+            "INSERT INTO revenue_rollups (day, source, status, payment_method, count, amount, paid_amount) "
+            f"SELECT {day}, '{source}', {status_sql}, {method_sql}, COUNT(*), COALESCE(SUM({amount}), 0), {paid_sql} "
+            f"FROM {table} WHERE {day} IS NOT NULL GROUP BY {day}, {status_sql}, {method_sql}"
+        )
+
+
+def _create_table():
+    op.create_table(
+        'revenue_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False, server_default=''),
+        sa.Column('payment_method', sa.String(length=50), nullable=False, server_default=''),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('paid_amount', sa.Float(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('day', 'source', 'status', 'payment_method', name='uq_revenue_rollups_bucket'),
+    )
+    op.create_index('ix_revenue_rollups_source_day', 'revenue_rollups', ['source', 'day'])
+
+
+def downgrade():
+    op.drop_index('ix_revenue_rollups_source_day', table_name='revenue_rollups')
+    op.drop_table('revenue_rollups')
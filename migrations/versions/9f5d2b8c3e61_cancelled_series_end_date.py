@@ -0,0 +1,42 @@
+"""End cancelled appointment series the day before their cancellation
+
+Revision ID: 9f5d2b8c3e61
+Revises: 2c6e8a4d1f37
+Create Date: 2026-10-20 17:12:40.884256
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f5d2b8c3e61'
+down_revision = '2c6e8a4d1f37'
+branch_labels = None
+depends_on = None
+
+series = sa.table(
+    'appointment_series', sa.column('id', sa.String), sa.column('until_date', sa.Date),
+    sa.column('last_date', sa.Date), sa.column('status', sa.String), sa.column('updated_at', sa.DateTime)
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Cancelled series now expand up to their end; updated_at is when they were cancelled
+    rows = bind.execute(sa.select(series.c.id, series.c.until_date, series.c.last_date, series.c.updated_at).where(
+        series.c.status == 'cancelled'
+    )).all()
+    for series_id, until_date, last_date, updated_at in rows:
+        end = (updated_at or datetime.utcnow()).date() - timedelta(days=1)
+        bind.execute(series.update().where(series.c.id == series_id).values(
+            until_date=min(until_date or end, end), last_date=min(last_date or end, end)
+        ))
+
+
+def downgrade():
+    # The original end dates are not kept; they only matter while the series is active
+    pass
@@ -0,0 +1,33 @@
+"""Add appointments.invoice_id, set when the billing run invoices an appointment
+
+Revision ID: a3e7c5b9d204
+Revises: 6f2c9a4e1b83
+Create Date: 2026-10-19 22:14:51.663028
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e7c5b9d204'
+down_revision = '6f2c9a4e1b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'invoice_id' not in {column['name'] for column in inspector.get_columns('appointments')}:
+        with op.batch_alter_table('appointments') as batch_op:
+            batch_op.add_column(sa.Column('invoice_id', sa.String(length=36), nullable=True))
+            batch_op.create_foreign_key('fk_appointments_invoice_id', 'invoices', ['invoice_id'], ['id'])
+            batch_op.create_index('ix_appointments_invoice_id', ['invoice_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_index('ix_appointments_invoice_id')
+        batch_op.drop_constraint('fk_appointments_invoice_id', type_='foreignkey')
+        batch_op.drop_column('invoice_id')
@@ -0,0 +1,26 @@
+"""Index devis by patient for the patient overview
+
+Revision ID: b6d2f8a41c93
+Revises: 7a4c1e9f3b26
+Create Date: 2026-10-19 16:47:19.554102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f8a41c93'
+down_revision = '7a4c1e9f3b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('devis')}
+    if 'ix_devis_patient_id' not in indexes:
+        op.create_index('ix_devis_patient_id', 'devis', ['patient_id'])
+
+
+def downgrade():
+    op.drop_index('ix_devis_patient_id', table_name='devis')
@@ -0,0 +1,39 @@
+"""Add the schedule change feed journal
+
+Revision ID: c47a9e2b5d18
+Revises: 8b2e4d6f1a35
+Create Date: 2026-10-19 13:05:52.104318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a9e2b5d18'
+down_revision = '8b2e4d6f1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() at startup may already have created the table
+    if 'schedule_changes' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'schedule_changes',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('entity', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.String(length=100), nullable=False),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_schedule_changes_created_at', 'schedule_changes', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_schedule_changes_created_at', table_name='schedule_changes')
+    op.drop_table('schedule_changes')
@@ -0,0 +1,84 @@
+"""Store CHF amounts as integer centimes instead of floats
+
+Revision ID: d5b1f7c3a942
+Revises: a3e7c5b9d204
+Create Date: 2026-10-19 23:41:08.204517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b1f7c3a942'
+down_revision = 'a3e7c5b9d204'
+branch_labels = None
+depends_on = None
+
+AMOUNT_COLUMNS = {
+    'invoices': ('subtotal', 'tax_amount', 'total_amount', 'paid_amount'),
+    'invoice_items': ('unit_price', 'total_price'),
+    'payments': ('amount',),
+    'devis': ('subtotal', 'tax_amount', 'total_amount'),
+    'devis_items': ('unit_price', 'total_price'),
+    'payment_plans': ('total_amount',),
+    'scheduled_payments': ('amount',),
+    'dental_pricing': ('base_price',),
+    'revenue_rollups': ('amount', 'paid_amount'),
+}
+
+# Same totals as RevenueRollupService.rebuild(), recomputed from the converted amounts
+ROLLUP_SOURCES = [
+    ('invoice', 'invoices', 'issue_date', 'status', None, 'total_amount', 'paid_amount'),
+    ('payment', 'payments', 'payment_date', None, 'payment_method', 'amount', None),
+    ('scheduled', 'scheduled_payments', 'due_date', 'status', None, 'amount', None),
+    ('devis', 'devis', 'issue_date', 'status', None, 'total_amount', None),
+]
+
+
+def _float_columns(inspector, table):
+    if table not in inspector.get_table_names():
+        return []
+    types = {column['name']: column['type'] for column in inspector.get_columns(table)}
+    return [name for name in AMOUNT_COLUMNS[table]
+            if name in types and not isinstance(types[name], sa.Integer)]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table in AMOUNT_COLUMNS:
+        columns = _float_columns(inspector, table)
+        if not columns:
+            continue
+
+        # Round to the centime while the column still holds floats
+        op.execute(f"UPDATE {table} SET " + ", ".join(f"{name} = ROUND({name} * 100)" for name in columns))
+        with op.batch_alter_table(table) as batch_op:
+            for name in columns:
+                batch_op.alter_column(name, type_=sa.BigInteger(), existing_type=sa.Float(),
+                                      postgresql_using=f'{name}::bigint')
+
+    _rebuild_rollups()
+
+
+def _rebuild_rollups():
+    """Rollup sums are recomputed from the rounded rows so they reconcile exactly"""
+    op.execute("DELETE FROM revenue_rollups")
+    for source, table, day, status, method, amount, paid in ROLLUP_SOURCES:
+        status_sql = f"COALESCE({status}, '')" if status else "''"
+        method_sql = f"COALESCE({method}, '')" if method else "''"
+        paid_sql = f"COALESCE(SUM({paid}), 0)" if paid else "0"
+        op.execute(
+            "INSERT INTO revenue_rollups (day, source, status, payment_method, count, amount, paid_amount) "
+            f"SELECT {day}, '{source}', {status_sql}, {method_sql}, COUNT(*), COALESCE(SUM({amount}), 0), {paid_sql} "
+            f"FROM {table} WHERE {day} IS NOT NULL GROUP BY {day}, {status_sql}, {method_sql}"
+        )
+
+
+def downgrade():
+    for table, columns in AMOUNT_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for name in columns:
+                batch_op.alter_column(name, type_=sa.Float(), existing_type=sa.BigInteger())
+        op.execute(f"UPDATE {table} SET " + ", ".join(f"{name} = {name} / 100.0" for name in columns))
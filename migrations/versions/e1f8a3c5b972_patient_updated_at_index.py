@@ -0,0 +1,26 @@
+"""Index patients.updated_at for the search index freshness check
+
+Revision ID: e1f8a3c5b972
+Revises: 5d93b0c7e2a4
+Create Date: 2026-10-19 15:48:31.226903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f8a3c5b972'
+down_revision = '5d93b0c7e2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('patients')}
+    if 'ix_patients_updated_at' not in indexes:
+        op.create_index('ix_patients_updated_at', 'patients', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_patients_updated_at', table_name='patients')
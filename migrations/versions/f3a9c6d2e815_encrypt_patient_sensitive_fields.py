@@ -0,0 +1,64 @@
+"""Encrypt existing medical_history, allergies and insurance_info values
+
+Revision ID: f3a9c6d2e815
+Revises: b6d2f8a41c93
+Create Date: 2026-10-19 18:05:42.917330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.types import ENCRYPTED_PREFIX, field_cipher
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c6d2e815'
+down_revision = 'b6d2f8a41c93'
+branch_labels = None
+depends_on = None
+
+FIELDS = ('medical_history', 'allergies', 'insurance_info')
+
+patients = sa.table('patients', sa.column('id', sa.String), *[sa.column(f, sa.Text) for f in FIELDS])
+
+
+def _rewrite(transform):
+    """Apply transform to every non-empty sensitive value, 500 rows per UPDATE batch"""
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(patients).where(sa.or_(*[patients.c[f].isnot(None) for f in FIELDS]))
+    ).fetchall()
+
+    updates = []
+    for row in rows:
+        values = {f: transform(row._mapping[f]) for f in FIELDS}
+        if any(values[f] != row._mapping[f] for f in FIELDS):
+            updates.append({'row_id': row.id, **values})
+
+    statement = patients.update().where(patients.c.id == sa.bindparam('row_id')).values(
+        **{f: sa.bindparam(f) for f in FIELDS}
+    )
+    for start in range(0, len(updates), 500):
+        bind.execute(statement, updates[start:start + 500])
+
+
+def upgrade():
+    cipher = field_cipher()
+
+    def encrypt(value):
+        if not value or value.startswith(ENCRYPTED_PREFIX):
+            return value
+        return ENCRYPTED_PREFIX + cipher.encrypt(value.encode()).decode()
+
+    _rewrite(encrypt)
+
+
+def downgrade():
+    cipher = field_cipher()
+
+    def decrypt(value):
+        if not value or not value.startswith(ENCRYPTED_PREFIX):
+            return value
+        return cipher.decrypt(value[len(ENCRYPTED_PREFIX):].encode()).decode()
+
+    _rewrite(decrypt)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+"""
+Recompute the daily revenue rollups from invoices, payments, scheduled
+payments and devis
+
+Usage: python rebuild_revenue_rollups.py
+
+The rollups are kept current on every write; run this after loading data
+with raw SQL or if the dashboard totals ever disagree with the invoices.
+"""
+import sys
+import time as timer
+from app import create_app
+from app.services.revenue_rollup_service import RevenueRollupService
+
+def main():
+    app = create_app('development')
+    with app.app_context():
+        print("🔄 Recalcul des agrégats de chiffre d'affaires...")
+        started = timer.perf_counter()
+        count = RevenueRollupService().rebuild()
+        print(f"✅ {count} lignes d'agrégats en {timer.perf_counter() - started:.1f} s")
+    
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
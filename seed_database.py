@@ -14,6 +14,7 @@ from app.models.financial import Invoice, InvoiceItem, Payment, Devis, DevisItem
 from app.models.pricing import DentalPricing
 from app.models.schedule import ScheduleBlock
 from app.models.education import PatientEducation
+from app.utils.money import split_amount, to_money
 
 # Swiss sample data
 SWISS_FIRST_NAMES = [
@@ -350,8 +351,8 @@ def create_financial_data(patients, pricing):
             db.session.add(payment)
             
         elif invoice.status == 'partial':
-            paid = invoice.total_amount * random.uniform(0.3, 0.7)
-            invoice.paid_amount = round(paid, 2)
+            paid = float(invoice.total_amount) * random.uniform(0.3, 0.7)
+            invoice.paid_amount = to_money(paid)
             payment = Payment(
                 id=str(uuid4()),
                 invoice_id=invoice.id,
@@ -422,13 +423,13 @@ def create_financial_data(patients, pricing):
         db.session.add(payment_plan)
         
         # Create scheduled payments
-        monthly_amount = payment_plan.total_amount / payment_plan.installments
+        monthly_amounts = split_amount(payment_plan.total_amount, payment_plan.installments)
         for i in range(payment_plan.installments):
             scheduled = ScheduledPayment(
                 id=str(uuid4()),
                 payment_plan_id=payment_plan.id,
                 due_date=date.today() + timedelta(days=30 * (i + 1)),
-                amount=round(monthly_amount, 2),
+                amount=monthly_amounts[i],
                 status='pending' if i > 0 else 'paid'
             )
             db.session.add(scheduled)
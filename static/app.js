@@ -3167,7 +3167,7 @@ class DentalAISuite {
             const [invoicesResponse, devisResponse, revenueResponse] = await Promise.all([
                 fetch('/api/financial/invoices'),
                 fetch('/api/financial/devis'),
-                fetch('/api/financial/revenue-forecast')
+                fetch('/api/financial/revenue-forecast?months=12')
             ]);
             
             const invoicesData = await invoicesResponse.json();
@@ -4195,9 +4195,22 @@ class PracticeManager {
         this.loadPatients(term);
     }
 
-    showPatientModal(patientId = null) {
+    async showPatientModal(patientId = null) {
         const isEdit = patientId !== null;
-        const patient = isEdit ? this.patients.find(p => p.id === patientId) : null;
+        let patient = isEdit ? this.patients.find(p => p.id === patientId) : null;
+
+        if (isEdit) {
+            // The list omits the encrypted medical fields; load them so saving does not clear them
+            try {
+                const response = await fetch(`/api/patients/${patientId}?include=sensitive`);
+                const data = await response.json();
+                if (data.patient) {
+                    patient = data.patient;
+                }
+            } catch (error) {
+                console.error('Error loading patient details:', error);
+            }
+        }
         
         const modal = this.createModal(`
             <div class="modal-header">